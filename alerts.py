@@ -0,0 +1,260 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import time
+from collections import namedtuple
+
+# Import utility functions
+from utils import db_insert, db_query, db_execute_with_retry, db_executemany_with_retry
+from clock import SystemClock, format_time, parse_time
+
+# One rule breach raised while evaluating a reading
+Alert = namedtuple("Alert", ["sensor", "rule", "message", "value"])
+
+# Episode columns added to the original (id, timestamp, alert_message) alerts table
+EPISODE_COLUMNS = {
+    "sensor": "TEXT",
+    "rule": "TEXT",
+    "severity": "TEXT",
+    "status": "TEXT",
+    "first_seen": "TEXT",
+    "last_seen": "TEXT",
+    "count": "INTEGER DEFAULT 1"
+}
+
+OPEN = "open"
+CLEARED = "cleared"
+
+# Indexes backing the keyset-paginated history queries; every one ends in (timestamp, id)
+ALERT_INDEXES = {
+    "idx_alerts_timestamp": "timestamp, id",
+    "idx_alerts_sensor_timestamp": "sensor, timestamp, id",
+    "idx_alerts_severity_timestamp": "severity, timestamp, id"
+}
+
+# Columns returned by query_alerts
+ALERT_FIELDS = ["id", "timestamp", "last_seen", "sensor", "rule", "severity", "status", "count", "alert_message"]
+
+def ensure_alert_columns(db_name="scada_alerts.db"):
+    """Add the episode columns to an alerts table created by an older version"""
+    result = db_query(db_name, "PRAGMA table_info(alerts)")
+    if result is None:
+        return False
+    existing = {row[1] for row in result[1]}
+    for column, column_type in EPISODE_COLUMNS.items():
+        if column not in existing:
+            if not db_execute_with_retry(db_name, f"ALTER TABLE alerts ADD COLUMN {column} {column_type}"):
+                return False
+    return True
+
+def ensure_alert_indexes(db_name="scada_alerts.db"):
+    """Create the indexes used by query_alerts"""
+    statements = [f"CREATE INDEX IF NOT EXISTS {name} ON alerts ({columns})" for name, columns in ALERT_INDEXES.items()]
+    return all(db_execute_with_retry(db_name, statement) for statement in statements)
+
+def query_alerts(db_name="scada_alerts.db", limit=50, after=None, sensor=None, severity=None, start=None, end=None):
+    """Return one page of alert history, newest first, as (rows, next_cursor).
+
+    Pages are keyset-paginated on (timestamp, id): pass the returned
+    next_cursor as after to get the following page, so each page costs one
+    index range scan however deep it is. next_cursor is None on the last page.
+    start/end bound timestamp as 'YYYY-MM-DD[ HH:MM:SS]' strings (end exclusive).
+    """
+    clauses, params = [], []
+    for column, value in (("sensor", sensor), ("severity", severity)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    if after:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(after)
+
+    query = f"SELECT {', '.join(ALERT_FIELDS)} FROM alerts"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    result = db_query(db_name, query, tuple(params))
+    if result is None:
+        return [], None
+    columns, rows = result
+    # One extra row tells us whether another page exists
+    records = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = (records[-1]["timestamp"], records[-1]["id"])
+    return records, next_cursor
+
+def alert_sensors(db_name="scada_alerts.db"):
+    """Sensors that have alert episodes, for filter drop-downs"""
+    result = db_query(db_name, "SELECT DISTINCT sensor FROM alerts WHERE sensor IS NOT NULL ORDER BY sensor")
+    return [row[0] for row in result[1]] if result else []
+
+class Episode:
+    """A run of breaches of one rule on one sensor, stored as a single alerts row"""
+
+    __slots__ = ("row_id", "sensor", "rule", "severity", "message", "first_seen", "last_seen",
+                 "count", "status", "quiet", "dirty")
+
+    def __init__(self, sensor, rule, severity, message, timestamp, row_id=None, count=1, status=OPEN):
+        self.row_id = row_id
+        self.sensor = sensor
+        self.rule = rule
+        self.severity = severity
+        self.message = message
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.count = count
+        self.status = status
+        self.quiet = 0
+        self.dirty = False
+
+class AlertEngine:
+    """Deduplicates rule breaches into alert episodes per (sensor, rule).
+
+    The first breach opens an episode: one row is inserted into the alerts
+    table and the caller is told to notify. Further breaches only bump the
+    episode's count and last_seen, which are written back in batches every
+    flush_interval seconds. An episode clears after clear_after consecutive
+    evaluations without a breach (hysteresis). A breach within cooldown seconds
+    of clearing reopens the same episode instead of starting a new one.
+
+    Episode times and the cooldown follow the clock (see clock.py), so replayed
+    data behaves as it did live; write-backs are paced in wall-clock time.
+    With a channel (shm_channel.SensorChannel), every episode state written to
+    the database is also published there for the dashboard.
+    """
+
+    def __init__(self, db_name="scada_alerts.db", clear_after=5, cooldown=300, flush_interval=5, severities=None, clock=None,
+                 channel=None):
+        self.db_name = db_name
+        self.clear_after = clear_after
+        self.cooldown = cooldown
+        self.flush_interval = flush_interval
+        self.severities = severities or {}
+        self.clock = clock or SystemClock()
+        self.channel = channel
+        self.episodes = {}
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_config(cls, alerting_config, db_name="scada_alerts.db", clock=None, channel=None):
+        alerting_config = alerting_config or {}
+        return cls(
+            db_name,
+            clear_after=alerting_config.get("clear_after", 5),
+            cooldown=alerting_config.get("cooldown", 300),
+            flush_interval=alerting_config.get("flush_interval", 5),
+            severities=alerting_config.get("severity", {}),
+            clock=clock,
+            channel=channel
+        )
+
+    def load_open_episodes(self):
+        """Resume episodes left open by a previous run so a restart does not duplicate them"""
+        result = db_query(self.db_name,
+                          "SELECT id, sensor, rule, severity, alert_message, first_seen, last_seen, count "
+                          "FROM alerts WHERE status = ?", (OPEN,))
+        if result is None:
+            return 0
+        for row_id, sensor, rule, severity, message, first_seen, last_seen, count in result[1]:
+            episode = Episode(sensor, rule, severity, message, parse_time(first_seen), row_id=row_id, count=count or 1)
+            episode.last_seen = parse_time(last_seen)
+            self.episodes[(sensor, rule)] = episode
+        return len(result[1])
+
+    def process(self, alerts, evaluated=(), timestamp=None):
+        """Fold one reading's breaches into the episodes; returns the newly opened episodes.
+
+        evaluated lists the (sensor, rule) pairs that were checked for this
+        reading, so rules that passed count towards clearing their episode.
+        """
+        if timestamp is None:
+            timestamp = self.clock.now()
+        opened = []
+        status_changed = False
+        breached = set()
+
+        for alert in alerts:
+            key = (alert.sensor, alert.rule)
+            if key in breached:
+                continue
+            breached.add(key)
+            episode = self.episodes.get(key)
+
+            if episode is None or (episode.status == CLEARED and timestamp - episode.last_seen > self.cooldown):
+                episode = self._open(alert, timestamp)
+                if episode is not None:
+                    opened.append(episode)
+                continue
+
+            if episode.status == CLEARED:
+                # Flapping within the cooldown continues the earlier episode
+                episode.status = OPEN
+                status_changed = True
+            episode.count += 1
+            episode.last_seen = timestamp
+            episode.quiet = 0
+            episode.dirty = True
+
+        for key in evaluated:
+            if key in breached:
+                continue
+            episode = self.episodes.get(key)
+            if episode is None or episode.status != OPEN:
+                continue
+            episode.quiet += 1
+            if episode.quiet >= self.clear_after:
+                episode.status = CLEARED
+                episode.dirty = True
+                status_changed = True
+
+        if status_changed or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush(timestamp)
+        return opened
+
+    def _open(self, alert, timestamp):
+        severity = self.severities.get(alert.rule, "warning")
+        when = format_time(timestamp)
+        row_id = db_insert(
+            self.db_name,
+            "INSERT INTO alerts (timestamp, alert_message, sensor, rule, severity, status, first_seen, last_seen, count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (when, alert.message, alert.sensor, alert.rule, severity, OPEN, when, when, 1)
+        )
+        if row_id is None:
+            return None
+        episode = Episode(alert.sensor, alert.rule, severity, alert.message, timestamp, row_id=row_id)
+        self.episodes[(alert.sensor, alert.rule)] = episode
+        if self.channel is not None:
+            self.channel.record_alert(episode)
+        print(f"ALERT OPENED: {alert.message}")
+        return episode
+
+    def flush(self, now=None):
+        """Write pending count/last_seen/status changes and forget long-cleared episodes"""
+        if now is None:
+            now = self.clock.now()
+        dirty = [episode for episode in self.episodes.values() if episode.dirty]
+        params = [(episode.count, format_time(episode.last_seen), episode.status, episode.row_id) for episode in dirty]
+        if db_executemany_with_retry(self.db_name, "UPDATE alerts SET count = ?, last_seen = ?, status = ? WHERE id = ?", params):
+            for episode in dirty:
+                episode.dirty = False
+                if self.channel is not None:
+                    self.channel.record_alert(episode)
+
+        expired = [key for key, episode in self.episodes.items()
+                   if episode.status == CLEARED and not episode.dirty and now - episode.last_seen > self.cooldown]
+        for key in expired:
+            del self.episodes[key]
+        self._last_flush = time.monotonic()
@@ -0,0 +1,100 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# As-of alignment for sensors sampled at their own rates.
+#
+# Series are kept at their native rate as {sensor: (times, values)} with
+# times sorted ascending (epoch seconds, or datetime64 in the dashboard's
+# ring buffers). Nothing is resampled up front: a time window is aligned on
+# demand by binary search (np.searchsorted), taking each sensor's latest
+# sample at or before every grid time, so the cost is O(log n) per series
+# plus the size of the window.
+
+import numpy as np
+
+def asof(times, values, targets, tolerance=None):
+    """Values as of the target times: the latest sample at or before each one.
+
+    Targets before the first sample, or more than tolerance after the sample
+    they would use, get NaN.
+    """
+    times = np.asarray(times)
+    targets = np.asarray(targets)
+    if not len(times):
+        return np.full(targets.shape, np.nan)
+    positions = np.searchsorted(times, targets, side="right") - 1
+    found = np.maximum(positions, 0)
+    aligned = np.asarray(values, dtype=np.float64)[found]
+    aligned[positions < 0] = np.nan
+    if tolerance is not None:
+        aligned[targets - times[found] > tolerance] = np.nan
+    return aligned
+
+def window_bounds(times, start=None, end=None):
+    """(lo, hi) positions of the samples in [start, end], widened by one sample before start for carry-in"""
+    lo = 0 if start is None else max(int(np.searchsorted(times, start, side="left")) - 1, 0)
+    hi = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+    return lo, hi
+
+def align_window(series, start=None, end=None, step=None, tolerance=None):
+    """Align several series onto one time grid covering [start, end].
+
+    The grid is every sample time of any of the series inside the window
+    (step None), or start, start + step, ... up to end. Returns (grid, names,
+    values) with values shaped (grid points x sensors). Only the part of each
+    series inside the window is read.
+    """
+    names = list(series)
+    windows = {}
+    for name in names:
+        times, values = series[name]
+        lo, hi = window_bounds(times, start, end)
+        windows[name] = (times[lo:hi], values[lo:hi])
+
+    if step is None:
+        # Drop the carried-in sample before start; it is not a grid point
+        inside = [times if start is None else times[np.searchsorted(times, start, side="left"):]
+                  for times, _ in windows.values()]
+        grid = np.unique(np.concatenate(inside)) if inside else np.array([])
+    else:
+        if start is None:
+            start = min(times[0] for times, _ in windows.values() if len(times))
+        if end is None:
+            end = max(times[-1] for times, _ in windows.values() if len(times))
+        grid = start + np.arange(int((end - start) // step) + 1) * step
+
+    values = np.empty((len(grid), len(names)))
+    for column, name in enumerate(names):
+        times, window_values = windows[name]
+        values[:, column] = asof(times, window_values, grid, tolerance)
+    return grid, names, values
+
+def rule_onsets(series, thresholds, start=None, end=None):
+    """Times at which every sensor in thresholds ({sensor: above}) first exceeds its threshold at once.
+
+    The rule is judged as of each sample time of its sensors, so a fast sensor
+    is compared against the latest reading of a slow one. A rule naming a
+    sensor that has no series never fires.
+    """
+    if not thresholds or any(name not in series for name in thresholds):
+        return np.array([])
+    grid, names, values = align_window({name: series[name] for name in thresholds}, start, end)
+    with np.errstate(invalid="ignore"):
+        met = (values > np.array([thresholds[name] for name in names])).all(axis=1)
+    onsets = met & ~np.concatenate([[False], met[:-1]])
+    return grid[onsets]
+
+def group_long(times, sensors, values):
+    """{sensor: (times, values)} from long-format columns, each series sorted by time"""
+    times = np.asarray(times)
+    sensors = np.asarray(sensors)
+    values = np.asarray(values, dtype=np.float64)
+    series = {}
+    for name in dict.fromkeys(sensors.tolist()):
+        rows = np.flatnonzero(sensors == name)
+        order = np.argsort(times[rows], kind="stable")
+        series[name] = (times[rows][order], values[rows][order])
+    return series
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Detection latency, false alarm rate and CPU cost of the drift detectors
+#     python bench_detectors.py [--trials 200] [--shifts 0.5,1,2,3] [--points 1000000]
+
+import sys
+import time
+import argparse
+import numpy as np
+
+from detectors import create_detector, detect_batch
+from drift_analysis import detect_drift
+
+# The rolling-average rule is included as the baseline it replaces
+DETECTOR_SPECS = {
+    "rolling": {"rate_of_change": float("inf"), "deviation_factor": 1.1, "window_size": 50},
+    "ewma": {"type": "ewma"},
+    "cusum": {"type": "cusum"},
+    "page_hinkley": {"type": "page_hinkley"},
+}
+
+def batch_alarms(name, spec, values):
+    if name == "rolling":
+        drift, _, _, _ = detect_drift(values, spec)
+        return drift
+    return detect_batch(values, spec)[0]
+
+def latency(name, spec, shift, trials, mean, sigma, rng, before=1000, after=3000):
+    """Median readings from a step of `shift` sigma to the first alarm, and the share of trials that never alarmed"""
+    delays = []
+    for _ in range(trials):
+        values = rng.normal(mean, sigma, before + after)
+        values[before:] += shift * sigma
+        alarms = np.flatnonzero(batch_alarms(name, spec, values)[before:])
+        delays.append(alarms[0] + 1 if len(alarms) else np.inf)
+    delays = np.array(delays)
+    return np.median(delays), np.mean(np.isinf(delays))
+
+def streaming_cost(name, spec, values):
+    """Microseconds per reading through the streaming detector"""
+    values = values.tolist()
+    if name == "rolling":
+        import scada_monitor
+        scada_monitor.sensor_history = {}
+        conditions = {"sensor": spec}
+        start = time.perf_counter()
+        for value in values:
+            scada_monitor.evaluate_drift({"sensor": value}, conditions)
+        return (time.perf_counter() - start) / len(values) * 1e6
+    detector = create_detector(spec)
+    start = time.perf_counter()
+    for value in values:
+        detector.update(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the drift detectors")
+    parser.add_argument("--trials", type=int, default=200, help="Simulated step changes per shift size")
+    parser.add_argument("--shifts", default="0.5,1,2,3", help="Comma-separated step sizes in sigma")
+    parser.add_argument("--points", type=int, default=1000000, help="In-control readings for false alarm rate and CPU cost")
+    parser.add_argument("--mean", type=float, default=100.0, help="Signal mean")
+    parser.add_argument("--sigma", type=float, default=2.0, help="Signal noise standard deviation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    shifts = [float(shift) for shift in args.shifts.split(",")]
+    in_control = rng.normal(args.mean, args.sigma, args.points)
+
+    header = f"{'detector':<14}" + "".join(f"{f'delay@{shift:g}σ':>12}" for shift in shifts)
+    print(header + f"{'FA/10k':>9}{'stream µs':>11}{'batch ns':>10}")
+    for name, spec in DETECTOR_SPECS.items():
+        cells = []
+        for shift in shifts:
+            delay, missed = latency(name, spec, shift, args.trials, args.mean, args.sigma, rng)
+            cells.append("missed" if np.isinf(delay) else f"{delay:.0f}" + ("*" if missed else ""))
+
+        start = time.perf_counter()
+        alarms = batch_alarms(name, spec, in_control)
+        batch_ns = (time.perf_counter() - start) / args.points * 1e9
+        # Count alarm onsets: the EWMA chart stays in alarm for several readings per excursion
+        false_alarms = np.count_nonzero(alarms[1:] & ~alarms[:-1]) + int(alarms[0])
+        stream_us = streaming_cost(name, spec, in_control[:min(args.points, 200000)])
+        print(f"{name:<14}" + "".join(f"{cell:>12}" for cell in cells)
+              + f"{false_alarms / args.points * 1e4:>9.2f}{stream_us:>11.2f}{batch_ns:>10.1f}")
+
+    print("\ndelay: median readings from the step to the first alarm (* some trials never alarmed)")
+    print("FA/10k: alarm onsets per 10,000 in-control readings")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
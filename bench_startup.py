@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Cold-start benchmark: how long each entry point takes to import in a fresh interpreter
+#     python bench_startup.py [--runs 5] [--top 8] [module ...]
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ENTRY_POINTS = [
+    "scada_monitor",
+    "sim_scada_sensor_publish",
+    "scada_data_generator",
+    "scada_dashboard",
+    "dashboard_ingest",
+    "fleet_generator",
+    "drift_analysis",
+    "export",
+]
+
+def time_import(module, runs):
+    """Median wall time of `python -c "import module"` in fresh interpreters, in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def heaviest_imports(module, top):
+    """Top-level packages with the largest cumulative import time, from python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not cumulative.isdigit():
+            continue
+        # Only the outermost entry of each package carries its full cumulative time
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    packages.pop(module, None)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of each component")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Modules to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports to list per module")
+    args = parser.parse_args(argv)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    baseline = time_import("sys", args.runs)
+    print(f"Interpreter start: {baseline:.0f} ms\n")
+    print(f"{'entry point':<28}{'import (ms)':>12}  heaviest imports (cumulative ms)")
+    for module in args.modules:
+        try:
+            elapsed = time_import(module, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{module:<28}{'failed':>12}")
+            continue
+        heavy = ", ".join(f"{name} {us / 1000:.0f}" for name, us in heaviest_imports(module, args.top))
+        print(f"{module:<28}{elapsed - baseline:>12.0f}  {heavy}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import sys
+import time
+import zlib
+import struct
+import sqlite3
+import argparse
+import numpy as np
+
+# Block header: version, value encoding, sample count, first timestamp (ms),
+# first delta (ms), first value word, compressed control stream length
+HEADER = struct.Struct("<BBIqqQI")
+VERSION = 1
+
+# Value encoding byte: XOR_VALUES, or the number of decimal places (0..MAX_DECIMALS)
+# when every value in the block is a decimal with that many places
+XOR_VALUES = 0xFF
+MAX_DECIMALS = 6
+
+# Readings per block; a block is the unit of compression and of decompression on reads
+DEFAULT_BLOCK_SIZE = 1024
+
+_BYTE_INDEX = np.arange(8)
+
+def _byte_matrix(words):
+    """uint64 words as an (n, 8) little-endian byte matrix"""
+    return words.astype("<u8").view(np.uint8).reshape(-1, 8)
+
+def _pack_varwidth(words):
+    """Low-byte-first variable-width packing: (widths, payload) with widths in bytes"""
+    matrix = _byte_matrix(words)
+    nonzero = matrix != 0
+    # Index of the highest non-zero byte + 1 (0 for zero words)
+    widths = np.where(nonzero.any(axis=1), 8 - np.argmax(nonzero[:, ::-1], axis=1), 0).astype(np.uint8)
+    payload = matrix[_BYTE_INDEX < widths[:, None]]
+    return widths, payload
+
+def _unpack_varwidth(widths, payload):
+    matrix = np.zeros((len(widths), 8), dtype=np.uint8)
+    matrix[_BYTE_INDEX < widths[:, None]] = payload
+    return matrix.view("<u8").ravel()
+
+def _pack_xor(words):
+    """Gorilla-style XOR packing at byte granularity: keep only the meaningful middle bytes.
+
+    Returns (controls, payload); each control byte holds the number of
+    trailing zero bytes (low nibble) and meaningful bytes (high nibble).
+    """
+    matrix = _byte_matrix(words)
+    nonzero = matrix != 0
+    any_set = nonzero.any(axis=1)
+    trailing = np.where(any_set, np.argmax(nonzero, axis=1), 0)
+    top = np.where(any_set, 8 - np.argmax(nonzero[:, ::-1], axis=1), 0)
+    meaningful = top - trailing
+    mask = (_BYTE_INDEX >= trailing[:, None]) & (_BYTE_INDEX < top[:, None])
+    controls = (trailing | (meaningful << 4)).astype(np.uint8)
+    return controls, matrix[mask]
+
+def _unpack_xor(controls, payload):
+    trailing = (controls & 0x0F).astype(np.int64)
+    top = trailing + (controls >> 4)
+    matrix = np.zeros((len(controls), 8), dtype=np.uint8)
+    matrix[(_BYTE_INDEX >= trailing[:, None]) & (_BYTE_INDEX < top[:, None])] = payload
+    return matrix.view("<u8").ravel()
+
+def _zigzag(ints):
+    return ((ints << 1) ^ (ints >> 63)).view(np.uint64)
+
+def _unzigzag(words):
+    return (words >> np.uint64(1)).view(np.int64) ^ -(words & np.uint64(1)).view(np.int64)
+
+def _decimal_places(values):
+    """Fewest decimal places (up to MAX_DECIMALS) that represent every value exactly, or None"""
+    if not np.isfinite(values).all() or np.abs(values).max(initial=0) >= 2 ** 52 / 10 ** MAX_DECIMALS:
+        return None
+    # -0.0 would come back as +0.0 from the integer path
+    if (np.signbit(values) & (values == 0)).any():
+        return None
+    for places in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** places
+        scaled = np.rint(values * scale)
+        if np.array_equal((scaled / scale).view(np.uint64), values.view(np.uint64)):
+            return places
+    return None
+
+def encode_block(times_ms, values):
+    """Compress one block of (int64 epoch-ms timestamps, float64 values).
+
+    Timestamps are delta-of-delta encoded (zigzag, variable byte width), so a
+    regular sampling interval costs nothing beyond the header. Values are XORed
+    with their predecessor, Gorilla-style, and only the non-zero middle bytes
+    are kept, so repeated or slowly changing values shrink to a few bytes.
+    Blocks whose values are all short decimals (the publisher rounds readings
+    to two places) are instead stored as deltas of the scaled integers, which
+    is exact and far denser than XOR on such values. The per-sample control bytes of both streams are stored separately and
+    deflated; keeping them apart from the payload is what lets decoding run as
+    whole-array NumPy operations instead of a bit-by-bit loop.
+    """
+    times_ms = np.asarray(times_ms, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(times_ms)
+    if n == 0 or n != len(values):
+        raise ValueError("A block needs the same, non-zero number of timestamps and values")
+
+    deltas = np.diff(times_ms)
+    first_delta = int(deltas[0]) if n > 1 else 0
+    time_widths, time_payload = _pack_varwidth(_zigzag(np.diff(deltas)))
+
+    places = _decimal_places(values)
+    if places is None:
+        encoding = XOR_VALUES
+        words = values.view(np.uint64)
+        value_controls, value_payload = _pack_xor(words[1:] ^ words[:-1])
+    else:
+        encoding = places
+        words = np.rint(values * 10.0 ** places).astype(np.int64)
+        value_controls, value_payload = _pack_varwidth(_zigzag(np.diff(words)))
+
+    controls = zlib.compress(time_widths.tobytes() + value_controls.tobytes(), 6)
+    header = HEADER.pack(VERSION, encoding, n, int(times_ms[0]), first_delta,
+                         int(words[0]) & 0xFFFFFFFFFFFFFFFF, len(controls))
+    return header + controls + time_payload.tobytes() + value_payload.tobytes()
+
+def decode_block(data):
+    """Decompress a block produced by encode_block into (times_ms, values)"""
+    version, encoding, n, t0, first_delta, first_word, controls_len = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported block version {version}")
+    offset = HEADER.size
+    controls = np.frombuffer(zlib.decompress(data[offset:offset + controls_len]), dtype=np.uint8)
+    offset += controls_len
+
+    num_dod = max(n - 2, 0)
+    time_widths = controls[:num_dod]
+    value_controls = controls[num_dod:]
+    time_bytes = int(time_widths.sum(dtype=np.int64))
+    payload = np.frombuffer(data, dtype=np.uint8, offset=offset)
+
+    dod = _unzigzag(_unpack_varwidth(time_widths, payload[:time_bytes]))
+    deltas = np.empty(max(n - 1, 0), dtype=np.int64)
+    if n > 1:
+        deltas[0] = first_delta
+        deltas[1:] = first_delta + np.cumsum(dod)
+    times_ms = np.empty(n, dtype=np.int64)
+    times_ms[0] = t0
+    times_ms[1:] = t0 + np.cumsum(deltas)
+
+    words = np.empty(n, dtype=np.uint64)
+    words[0] = first_word
+    if encoding == XOR_VALUES:
+        words[1:] = _unpack_xor(value_controls, payload[time_bytes:])
+        np.bitwise_xor.accumulate(words, out=words)
+        return times_ms, words.view(np.float64)
+    scaled = words.view(np.int64)
+    scaled[1:] = _unzigzag(_unpack_varwidth(value_controls, payload[time_bytes:]))
+    np.cumsum(scaled, out=scaled)
+    return times_ms, scaled / 10.0 ** encoding
+
+class BlockStore:
+    """Per-sensor compressed blocks in a SQLite file.
+
+    The blocks table doubles as the index: it is indexed on (sensor, start_ms)
+    and every row records the time range it covers, so a range read only
+    fetches and decompresses the blocks that overlap the range. Appended
+    readings are buffered per sensor until a block is full; flush() writes
+    partial blocks too (e.g. at shutdown).
+    """
+
+    def __init__(self, path="sensor_blocks.db", block_size=DEFAULT_BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self._pending = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                sensor TEXT NOT NULL,
+                start_ms INTEGER NOT NULL,
+                end_ms INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        # A separate index keeps the blobs out of the index b-tree
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_blocks_sensor_start ON blocks (sensor, start_ms)")
+        self._conn.commit()
+
+    def append(self, sensor, times_ms, values):
+        """Buffer readings for sensor (time order) and write out every block that fills up"""
+        times_list, values_list = self._pending.setdefault(sensor, ([], []))
+        times_list.extend(np.asarray(times_ms, dtype=np.int64).tolist())
+        values_list.extend(np.asarray(values, dtype=np.float64).tolist())
+        if len(times_list) >= self.block_size:
+            self._write(sensor, full_only=True)
+
+    def append_reading(self, payload, timestamp=None):
+        """Buffer one {sensor: value} reading taken at timestamp (epoch seconds)"""
+        if timestamp is None:
+            timestamp = time.time()
+        time_ms = int(round(timestamp * 1000))
+        for sensor, value in payload.items():
+            if isinstance(value, (int, float)):
+                self.append(sensor, [time_ms], [value])
+
+    def _write(self, sensor, full_only=False):
+        times_list, values_list = self._pending.get(sensor, ([], []))
+        size = self.block_size
+        count = len(times_list) // size * size if full_only else len(times_list)
+        if count == 0:
+            return
+        times = np.array(times_list[:count], dtype=np.int64)
+        values = np.array(values_list[:count], dtype=np.float64)
+        rows = []
+        for start in range(0, count, size):
+            block_times = times[start:start + size]
+            rows.append((sensor, int(block_times[0]), int(block_times[-1]), len(block_times),
+                         encode_block(block_times, values[start:start + size])))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)", rows)
+        del times_list[:count]
+        del values_list[:count]
+
+    def flush(self):
+        """Write every buffered reading, including partial blocks"""
+        for sensor in list(self._pending):
+            self._write(sensor)
+
+    def sensors(self):
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT sensor FROM blocks ORDER BY sensor")]
+
+    def read(self, sensor, start_ms=None, end_ms=None):
+        """Return (times datetime64[ms], values) for sensor within [start_ms, end_ms)"""
+        query = "SELECT data FROM blocks WHERE sensor = ?"
+        params = [sensor]
+        if start_ms is not None:
+            query += " AND end_ms >= ?"
+            params.append(int(start_ms))
+        if end_ms is not None:
+            query += " AND start_ms < ?"
+            params.append(int(end_ms))
+        query += " ORDER BY start_ms"
+
+        decoded = [decode_block(row[0]) for row in self._conn.execute(query, params)]
+        if not decoded:
+            return np.array([], dtype="datetime64[ms]"), np.array([], dtype=np.float64)
+        times = np.concatenate([block[0] for block in decoded])
+        values = np.concatenate([block[1] for block in decoded])
+        # Only the first and last blocks can extend past the range
+        keep = np.ones(len(times), dtype=bool)
+        if start_ms is not None:
+            keep &= times >= start_ms
+        if end_ms is not None:
+            keep &= times < end_ms
+        return times[keep].view("datetime64[ms]"), values[keep]
+
+    def stats(self):
+        """{sensor: (blocks, readings, compressed bytes)}"""
+        return {row[0]: row[1:] for row in self._conn.execute(
+            "SELECT sensor, COUNT(*), SUM(count), SUM(LENGTH(data)) FROM blocks GROUP BY sensor ORDER BY sensor")}
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+def import_sensor_db(db_name, store, table="sensor_data"):
+    """Copy the monitor's sensor_data table (or per-sensor topic sensor_readings) into a BlockStore"""
+    from export import iter_rows
+    from topic_router import sensor_key
+
+    def parse_times(rows):
+        return np.array([time.mktime(time.strptime(row[0], '%Y-%m-%d %H:%M:%S')) * 1000 for row in rows], dtype=np.int64)
+
+    written = 0
+    for columns, rows in iter_rows(db_name, table=table):
+        if table == "sensor_readings":
+            # One series per site/sensor; flagged readings are stored as gaps, as in sensor_data
+            series = {}
+            for timestamp, site, sensor, value, quality in rows:
+                series.setdefault(sensor_key(site, sensor), []).append((timestamp, np.nan if value is None or quality else value))
+            for key, readings in series.items():
+                store.append(key, parse_times(readings), [value for _, value in readings])
+        else:
+            times = parse_times(rows)
+            for i, sensor in enumerate(columns[1:], start=1):
+                values = np.array([np.nan if row[i] is None else row[i] for row in rows], dtype=np.float64)
+                store.append(sensor, times, values)
+        written += len(rows)
+    store.flush()
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed block storage for sensor readings")
+    parser.add_argument("--store", default="sensor_blocks.db", help="Block store file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import the monitor's stored readings")
+    import_parser.add_argument("--db", default="sensor_data.db", help="SQLite database written by the monitor")
+    import_parser.add_argument("--table", choices=["sensor_data", "sensor_readings"], default="sensor_data",
+                               help="sensor_data (combined topic) or sensor_readings (per-sensor topics)")
+    import_parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="Readings per block")
+    subparsers.add_parser("stats", help="Show blocks, readings and compressed size per sensor")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "import":
+            store = BlockStore(args.store, block_size=args.block_size)
+            written = import_sensor_db(args.db, store, args.table)
+            store.close()
+            print(f"Imported {written} reading(s) from {args.db} into {args.store}")
+            return 0
+
+        store = BlockStore(args.store)
+        for sensor, (blocks, readings, size) in store.stats().items():
+            print(f"{sensor}: {readings} reading(s) in {blocks} block(s), {size} bytes ({size / max(readings, 1):.2f} bytes/reading)")
+        print(f"File size: {os.path.getsize(args.store)} bytes")
+        store.close()
+        return 0
+    except Exception as e:
+        print(f"Error in block store: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import sqlite3
+import numpy as np
+
+# Pragmas for a one-off bulk load. Durability is traded for speed while the
+# table is being (re)built; the database is switched back to WAL afterwards.
+# An in-memory journal costs about the same as OFF here but keeps ROLLBACK working.
+LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": -262144,  # 256 MB (negative = KiB)
+    "temp_store": "MEMORY",
+    "locking_mode": "EXCLUSIVE",
+}
+
+# Rows per executemany call
+CHUNK_SIZE = 100000
+
+# Upper bound on bound parameters per multi-row INSERT (SQLite's historic default limit)
+MAX_VARIABLES = 999
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _sql_type(dtype):
+    if np.issubdtype(dtype, np.floating):
+        return "REAL"
+    if np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.bool_):
+        return "INTEGER"
+    return "TEXT"
+
+def _python_column(values):
+    """Column as a list of SQLite-bindable Python objects"""
+    if values.dtype.kind in "fiub":
+        # tolist() converts to Python floats/ints in C; NaN is stored as NULL by SQLite
+        return values.tolist()
+    return [None if value is None else str(value) for value in values.tolist()]
+
+def _rows(array, start, stop):
+    # Lazy columns (e.g. an implicit time axis) are only materialized a chunk at a time
+    if hasattr(array, "materialize"):
+        return array.materialize(start, stop)
+    return array[start:stop]
+
+def _row_blocks(arrays, start, stop, rows_per_statement):
+    """Split rows [start, stop) into flat parameter lists of rows_per_statement rows, plus leftover rows"""
+    if all(array.dtype.kind == "f" for array in arrays):
+        # Row-major flattening in NumPy is far cheaper than zipping Python lists
+        flat = np.column_stack([_rows(array, start, stop) for array in arrays])
+        whole = len(flat) // rows_per_statement * rows_per_statement
+        blocks = flat[:whole].reshape(-1, rows_per_statement * len(arrays)).tolist()
+        return blocks, flat[whole:].tolist()
+
+    rows = list(zip(*(_python_column(_rows(array, start, stop)) for array in arrays)))
+    whole = len(rows) // rows_per_statement * rows_per_statement
+    blocks = [[value for row in rows[i:i + rows_per_statement] for value in row]
+              for i in range(0, whole, rows_per_statement)]
+    return blocks, rows[whole:]
+
+def bulk_load(db_path, table, columns, index_columns=(), chunk_size=CHUNK_SIZE, pragmas=None):
+    """Replace table in db_path with the given columns as fast as SQLite allows.
+
+    columns maps column name to a 1-D array, or to a lazy column with len(),
+    dtype and materialize(start, stop); all must have the same length. The
+    typed table is created up front, rows are inserted with executemany in
+    chunks inside a single transaction, and index_columns (names, or tuples
+    of names for a composite index) are indexed only after the data is in.
+    Each statement inserts many rows (INSERT ... VALUES (...), (...), ...)
+    to cut per-row interpreter and VDBE overhead. Returns the number of rows
+    written.
+    """
+    names = list(columns)
+    arrays = [columns[name] if hasattr(columns[name], "materialize") else np.asarray(columns[name]) for name in names]
+    num_rows = len(arrays[0]) if arrays else 0
+    if any(len(array) != num_rows for array in arrays):
+        raise ValueError("All columns must have the same length")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for pragma, value in {**LOAD_PRAGMAS, **(pragmas or {})}.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+
+        definition = ", ".join(f"{_quote(name)} {_sql_type(array.dtype)}" for name, array in zip(names, arrays))
+        row_placeholder = f"({', '.join('?' * len(names))})"
+        rows_per_statement = max(1, min(100, MAX_VARIABLES // max(1, len(names))))
+        insert_sql = f"INSERT INTO {_quote(table)} VALUES {row_placeholder}"
+        insert_many_sql = f"INSERT INTO {_quote(table)} VALUES {', '.join([row_placeholder] * rows_per_statement)}"
+
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(f"CREATE TABLE {_quote(table)} ({definition})")
+        for start in range(0, num_rows, chunk_size):
+            blocks, leftover = _row_blocks(arrays, start, min(start + chunk_size, num_rows), rows_per_statement)
+            conn.executemany(insert_many_sql, blocks)
+            conn.executemany(insert_sql, leftover)
+        # Building the index once over sorted data is much cheaper than maintaining it per insert
+        for column in index_columns:
+            # A tuple of column names builds one composite index
+            parts = (column,) if isinstance(column, str) else tuple(column)
+            index_name = _quote(f"idx_{table}_{'_'.join(parts)}")
+            conn.execute(f"CREATE INDEX {index_name} ON {_quote(table)} ({', '.join(map(_quote, parts))})")
+        conn.execute("COMMIT")
+
+        # Leave the database ready for concurrent readers and writers
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        return num_rows
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def bulk_load_dataframe(db_path, table, df, index_columns=(), chunk_size=CHUNK_SIZE, pragmas=None):
+    """bulk_load for a pandas DataFrame"""
+    return bulk_load(db_path, table, {name: df[name].to_numpy() for name in df.columns},
+                     index_columns=index_columns, chunk_size=chunk_size, pragmas=pragmas)
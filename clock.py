@@ -0,0 +1,78 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Time sources for the monitor pipeline.
+#
+# Storage, alert episodes and alert messages ask a clock for the time instead
+# of reading the wall clock, so recorded data replayed faster than real time
+# (replay.py) is stamped, deduplicated and cleared exactly as it was live.
+# observe() is called with each reading's payload timestamp (None if it has
+# none) and returns the time to stamp the reading with.
+
+import time
+
+class SystemClock:
+    """Wall-clock time; readings that carry a timestamp keep it"""
+
+    __slots__ = ()
+
+    def now(self):
+        return time.time()
+
+    def observe(self, timestamp=None):
+        return self.now() if timestamp is None else timestamp
+
+class EventClock:
+    """Event time: the newest payload timestamp seen so far (wall-clock time until the first one)"""
+
+    __slots__ = ("_latest",)
+
+    def __init__(self):
+        self._latest = None
+
+    def now(self):
+        return time.time() if self._latest is None else self._latest
+
+    def observe(self, timestamp=None):
+        if timestamp is None:
+            # Readings without a timestamp are stamped with the current event time
+            return self.now()
+        if self._latest is None or timestamp > self._latest:
+            self._latest = timestamp
+        return timestamp
+
+class SimulatedClock(EventClock):
+    """Virtual time for replay and tests: moved only by events, set() and advance(), never by the wall clock"""
+
+    __slots__ = ()
+
+    def __init__(self, start=0.0):
+        self._latest = float(start)
+
+    def set(self, timestamp):
+        self._latest = float(timestamp)
+
+    def advance(self, seconds):
+        self._latest += seconds
+
+CLOCKS = {
+    "system": SystemClock,
+    "event": EventClock,
+    "simulated": SimulatedClock
+}
+
+def create_clock(mode="event"):
+    """Build a clock from the config's clock.mode"""
+    if mode not in CLOCKS:
+        raise ValueError(f"Unknown clock mode: {mode}")
+    return CLOCKS[mode]()
+
+def format_time(timestamp):
+    """Stored timestamp text for epoch seconds (local time)"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+def parse_time(text):
+    return time.mktime(time.strptime(text, '%Y-%m-%d %H:%M:%S'))
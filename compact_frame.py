@@ -0,0 +1,201 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Compact in-memory layout for generated datasets.
+#
+# Every sensor lives in one preallocated (samples x sensors) buffer of
+# float64, float32 or scaled int16, and the time axis is implicit
+# (start + i * interval). Nothing is copied into a DataFrame: the writers
+# materialize times and decode values one chunk of rows at a time, so peak
+# memory is the buffer plus a chunk.
+
+import numpy as np
+
+# Import utility functions
+from signal_model import CORRUPTED_VALUE
+
+DTYPES = ("float64", "float32", "int16")
+
+# Reserved int16 codes; every other code is offset + code * resolution
+INT16_MISSING = -32768   # NaN
+INT16_CORRUPTED = 32767  # The generator's 9999 placeholder, or a value the scale cannot represent
+INT16_LIMIT = 32766
+
+# Rows materialized per chunk by the writers
+CHUNK_SIZE = 100000
+
+class TimeAxis:
+    """Implicit, evenly spaced time axis; values exist only when sliced"""
+
+    __slots__ = ("start", "interval", "length")
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, length, interval, start=0.0):
+        self.length = length
+        self.interval = interval
+        self.start = start
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.materialize(*index.indices(self.length)[:2])
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("time axis index out of range")
+        return self.start + index * self.interval
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.materialize(), dtype=dtype)
+
+    def materialize(self, start=0, stop=None):
+        stop = self.length if stop is None else min(stop, self.length)
+        return self.start + np.arange(start, stop, dtype=np.float64) * self.interval
+
+class ScaledColumn:
+    """One int16 sensor column of a CompactFrame, decoded to float64 when sliced"""
+
+    __slots__ = ("codes", "resolution", "offset", "decimals")
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, codes, resolution, offset):
+        self.codes = codes
+        self.resolution = resolution
+        self.offset = offset
+        self.decimals = resolution_decimals(resolution)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.materialize(), dtype=dtype)
+
+    def materialize(self, start=0, stop=None):
+        return decode_int16(self.codes[start:stop], self.resolution, self.offset, self.decimals)
+
+def resolution_decimals(resolution):
+    """Decimal places that show every step of the resolution; decoded values are rounded to them so they print cleanly"""
+    places = [len(f"{step:.10f}".rstrip("0").split(".")[1]) for step in np.atleast_1d(resolution).tolist()]
+    return max(places)
+
+def decode_int16(codes, resolution, offset, decimals=None):
+    """float64 values for int16 codes (scalars or arrays broadcasting along the last axis)"""
+    values = np.asarray(offset) + codes * np.asarray(resolution)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    values[codes == INT16_CORRUPTED] = CORRUPTED_VALUE
+    values[codes == INT16_MISSING] = np.nan
+    return values
+
+class CompactFrame:
+    """Generated dataset held as one (samples x sensors) buffer plus an implicit time axis.
+
+    For int16, each sensor is stored as round((value - offset) / resolution),
+    with offset the sensor's base_value and resolution from the sampling
+    config (default 0.01). NaN and the 9999 placeholder get reserved codes;
+    values outside the representable range are stored as the placeholder and
+    counted in `saturated`.
+    """
+
+    __slots__ = ("names", "time", "data", "resolution", "offset", "saturated")
+
+    def __init__(self, names, num_points, time_interval, dtype="float32", start_time=0.0,
+                 resolution=None, offset=None):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported compact dtype: {dtype} (use one of {', '.join(DTYPES)})")
+        self.names = list(names)
+        self.time = TimeAxis(num_points, time_interval, start_time)
+        self.data = np.empty((num_points, len(self.names)), dtype=dtype)
+        self.saturated = dict.fromkeys(self.names, 0)
+        if dtype == "int16":
+            resolution = resolution or {}
+            offset = offset or {}
+            self.resolution = np.array([float(resolution.get(name, 0.01)) for name in self.names])
+            self.offset = np.array([float(offset.get(name, 0.0)) for name in self.names])
+        else:
+            self.resolution = self.offset = None
+
+    def __len__(self):
+        return len(self.time)
+
+    def __contains__(self, name):
+        return name == "Time" or name in self.names
+
+    def __getitem__(self, name):
+        """The Time axis or one sensor column (a strided view into the buffer, or a ScaledColumn)"""
+        if name == "Time":
+            return self.time
+        column = self.names.index(name)
+        if self.resolution is None:
+            return self.data[:, column]
+        return ScaledColumn(self.data[:, column], self.resolution[column], self.offset[column])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def write(self, row, block):
+        """Store a float64 (sensors x n) block from the signal model at rows [row, row + n)"""
+        target = self.data[row:row + block.shape[1]]
+        if self.resolution is None:
+            target[...] = block.T
+            return
+
+        values = block.T
+        missing = np.isnan(values)
+        corrupted = values == CORRUPTED_VALUE
+        with np.errstate(invalid="ignore"):
+            codes = np.rint((values - self.offset) / self.resolution)
+            saturated = ~missing & ~corrupted & (np.abs(codes) > INT16_LIMIT)
+        codes[missing] = INT16_MISSING
+        codes[corrupted | saturated] = INT16_CORRUPTED
+        target[...] = codes
+        for name, count in zip(self.names, saturated.sum(axis=0).tolist()):
+            self.saturated[name] += count
+
+    def rows(self, start, stop):
+        """Decoded float64 (rows x sensors) block for rows [start, stop)"""
+        if self.resolution is None:
+            return self.data[start:stop]
+        return decode_int16(self.data[start:stop], self.resolution, self.offset, resolution_decimals(self.resolution))
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """(times, values) for successive row chunks"""
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield self.time.materialize(start, stop), self.rows(start, stop)
+
+    def columns(self):
+        """{column: array or lazy column} in output order, for bulk_writer.bulk_load"""
+        return {name: self[name] for name in ("Time", *self.names)}
+
+    def write_csv(self, path, chunk_size=CHUNK_SIZE):
+        import pandas as pd
+
+        with open(path, "w", newline="") as handle:
+            for index, (times, values) in enumerate(self.chunks(chunk_size)):
+                chunk = pd.DataFrame(values, columns=self.names, copy=False)
+                chunk.insert(0, "Time", times)
+                chunk.to_csv(handle, index=False, header=index == 0)
+
+    def write_json(self, path, chunk_size=CHUNK_SIZE):
+        """Same layout as DataFrame.to_json(orient="records"), written a chunk at a time"""
+        import pandas as pd
+
+        with open(path, "w") as handle:
+            handle.write("[")
+            for index, (times, values) in enumerate(self.chunks(chunk_size)):
+                chunk = pd.DataFrame(values, columns=self.names, copy=False)
+                chunk.insert(0, "Time", times)
+                if index:
+                    handle.write(",")
+                # Drop each chunk's own brackets so the file is a single array
+                handle.write(chunk.to_json(orient="records")[1:-1])
+            handle.write("]")
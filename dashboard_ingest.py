@@ -0,0 +1,82 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import json
+import sys
+
+# Import utility functions
+from utils import load_config, validate_config
+from mqtt_transport import MQTTTransport
+from shm_channel import SensorChannel
+from settings import channel_settings
+from topic_router import TopicRouter, decode_reading, per_sensor_layout, sensor_filter, sensor_key
+
+# MQTT Callback - Appends readings to the shared channel
+def on_message(client, userdata, message):
+    try:
+        payload = json.loads(message.payload.decode("utf-8"))
+        userdata["channel"].record(payload, carry_forward=userdata.get("carry_forward", False))
+    except Exception as e:
+        print(f"Error processing MQTT message: {str(e)}")
+
+# MQTT Callback for per-sensor topics - one sensor of one site per message
+def on_sensor_message(client, userdata, message, sensor, site=None):
+    try:
+        value, timestamp = decode_reading(message.payload)
+        userdata["channel"].record({"timestamp": timestamp, sensor_key(site, sensor): value})
+    except Exception as e:
+        print(f"Error processing MQTT message: {str(e)}")
+
+def build_router(mqtt_config):
+    """Combined topic plus, with the per_sensor layout, every sensor of every site"""
+    router = TopicRouter()
+    router.add(mqtt_config["topic"], on_message)
+    if per_sensor_layout(mqtt_config):
+        router.add(sensor_filter(mqtt_config), on_sensor_message)
+    return router
+
+# Single MQTT subscriber feeding every dashboard worker through shared memory
+def main(config_file="config.json"):
+    try:
+        # Load configuration
+        config = load_config(config_file)
+
+        # Validate configuration
+        if not validate_config(config):
+            print("Configuration validation failed. Exiting.")
+            return 1
+
+        settings = channel_settings(config)
+        if settings["source"] != "ingest":
+            print(f"The {settings['source']} writes the shared sensor channel (dashboard.shared_memory.source); nothing to do.")
+            return 0
+        channel = SensorChannel.create(settings["name"], settings["max_sensors"], settings["capacity"])
+        print(f"Shared sensor channel {settings['name']} created")
+
+        mqtt_config = config.get("mqtt", {})
+        router = build_router(mqtt_config)
+        try:
+            transport = MQTTTransport(
+                mqtt_config,
+                role="dashboard-ingest",
+                subscriptions=router.filters(),
+                on_message=router.on_message,
+                userdata={"channel": channel,
+                          "carry_forward": config.get("publisher", {}).get("report_by_exception", False)}
+            )
+            transport.run_forever()
+            return 0
+        except KeyboardInterrupt:
+            print("Dashboard ingest stopped by user")
+            return 0
+        finally:
+            channel.close()
+    except Exception as e:
+        print(f"Error in dashboard ingest: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
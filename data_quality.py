@@ -0,0 +1,143 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Ingest-time data quality checks.
+#
+# Every reading gets a quality code before it is stored or reaches drift
+# detection. Limits come from each sensor's settings (valid_min, valid_max,
+# sentinels, stuck_limit) and are read from the live Settings, so config
+# reloads apply to the next batch. Live messages are screened on arrival
+# with scalar checks (screen), so a reading is never held back from storage
+# or alerting; stored history is checked as a vectorized (readings x
+# sensors) batch (assess, good_positions). Both keep the same stuck-value
+# run lengths, which carry over between messages and batches.
+
+import math
+
+GOOD = 0
+MISSING = 1       # NaN or null
+SENTINEL = 2      # Placeholder value such as the generator's 9999
+OUT_OF_RANGE = 3  # Outside [valid_min, valid_max], or infinite
+STUCK = 4         # Same value stuck_limit or more times in a row
+
+QUALITY_NAMES = {
+    GOOD: "good",
+    MISSING: "missing",
+    SENTINEL: "sentinel",
+    OUT_OF_RANGE: "out_of_range",
+    STUCK: "stuck"
+}
+
+class QualityGate:
+    """Flags NaN, sentinel, out-of-range and stuck readings using per-sensor limits"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        # Stuck-value state per series: {key: (last value, run length)}
+        self._runs = {}
+        self._limits_key = None
+        self._limits = None
+
+    def _sensor_limits(self, names):
+        """(valid_min, valid_max, stuck_limit, sentinels) arrays for the given sensors, cached per config version"""
+        import numpy as np
+
+        key = (tuple(names), self.settings.mtime_ns)
+        if key == self._limits_key:
+            return self._limits
+        sensors = [self.settings.sensors.get(name) for name in names]
+        low = np.array([-np.inf if s is None else s.valid_min for s in sensors], dtype=np.float64)
+        high = np.array([np.inf if s is None else s.valid_max for s in sensors], dtype=np.float64)
+        stuck = np.array([0 if s is None else s.stuck_limit for s in sensors], dtype=np.int64)
+        # One row per sentinel slot, padded with NaN (which never compares equal)
+        lists = [() if s is None else tuple(s.sentinels or ()) for s in sensors]
+        sentinels = np.full((max((len(values) for values in lists), default=0), len(names)), np.nan)
+        for column, values in enumerate(lists):
+            sentinels[:len(values), column] = values
+        self._limits_key, self._limits = key, (low, high, stuck, sentinels)
+        return self._limits
+
+    def assess(self, names, values, keys=None):
+        """Quality codes for a (readings x sensors) batch in arrival order.
+
+        names are the sensors whose limits apply to each column; keys name the
+        series for the stuck-value state (default: names), e.g. "site/sensor".
+        None in values counts as missing.
+        """
+        import numpy as np
+
+        values = np.array(values, dtype=np.float64).reshape(-1, len(names))
+        keys = list(names if keys is None else keys)
+        low, high, stuck_limit, sentinels = self._sensor_limits(names)
+
+        missing = np.isnan(values)
+        sentinel = (values[:, None, :] == sentinels[None, :, :]).any(axis=1)
+        with np.errstate(invalid="ignore"):
+            out_of_range = np.isinf(values) | (values < low) | (values > high)
+
+        # Run length of equal consecutive values, continuing the previous batch's run
+        previous = np.array([self._runs.get(key, (np.nan, 0)) for key in keys], dtype=np.float64).reshape(-1, 2)
+        before = np.vstack([previous[:, 0], values[:-1]])
+        rows = np.arange(len(values))[:, None]
+        changed = np.where(values != before, rows, -1)
+        last_change = np.maximum.accumulate(changed, axis=0)
+        runs = np.where(last_change >= 0, rows - last_change + 1, rows + 1 + previous[:, 1])
+        stuck = (stuck_limit > 0) & (runs >= stuck_limit)
+        if len(values):
+            self._runs.update(zip(keys, zip(values[-1].tolist(), runs[-1].tolist())))
+
+        # The most specific problem wins
+        codes = np.zeros(values.shape, dtype=np.int8)
+        codes[stuck] = STUCK
+        codes[out_of_range] = OUT_OF_RANGE
+        codes[sentinel] = SENTINEL
+        codes[missing] = MISSING
+        return codes
+
+    def check(self, name, value, key=None):
+        """Quality code for one reading of sensor name; the scalar twin of assess() for live messages"""
+        value = float("nan") if value is None else float(value)
+        key = name if key is None else key
+        last, run = self._runs.get(key, (float("nan"), 0))
+        run = run + 1 if value == last else 1
+        self._runs[key] = (value, run)
+
+        sensor = self.settings.sensors.get(name)
+        if math.isnan(value):
+            return MISSING
+        if sensor is None:
+            return GOOD
+        if value in (sensor.sentinels or ()):
+            return SENTINEL
+        if math.isinf(value) or value < sensor.valid_min or value > sensor.valid_max:
+            return OUT_OF_RANGE
+        if sensor.stuck_limit > 0 and run >= sensor.stuck_limit:
+            return STUCK
+        return GOOD
+
+    def screen(self, payload, keys=None):
+        """Split one {sensor: value} reading into (good readings, {sensor: (value, code)} flagged).
+
+        A live message is a handful of values, so each is checked with plain
+        scalar comparisons; building arrays for a one-row batch costs more
+        than the checks themselves.
+        """
+        good = dict(payload)
+        flagged = {}
+        for name, value in payload.items():
+            if value is not None and not isinstance(value, (int, float)):
+                continue
+            code = self.check(name, value, None if keys is None else keys[name])
+            if code != GOOD:
+                flagged[name] = (good.pop(name), code)
+        return good, flagged
+
+def good_positions(values, sensor, settings):
+    """Indices of one sensor's raw readings that pass the quality checks (backtesting unscreened data such as a generated CSV)"""
+    import numpy as np
+
+    codes = QualityGate(settings).assess([sensor], np.asarray(values, dtype=np.float64)[:, None])[:, 0]
+    return np.flatnonzero(codes == GOOD)
@@ -0,0 +1,88 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import math
+
+def _is_nan(value):
+    return isinstance(value, float) and math.isnan(value)
+
+class DeadbandFilter:
+    """Report-by-exception state for the publisher.
+
+    A sensor is published when its value moves outside its deadband around the
+    last published value, or when it has been silent for max_silence seconds
+    (heartbeat). Deadbands are read from the live Settings (SensorSettings
+    deadband, deadband_mode, max_silence), so config reloads apply to the next
+    reading. A deadband of 0 publishes every change.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._last = {}
+
+    def _exceeds(self, sensor, value, timestamp):
+        last = self._last.get(sensor.name)
+        if last is None:
+            return True
+        last_time, last_value = last
+        if sensor.max_silence > 0 and timestamp - last_time >= sensor.max_silence:
+            return True
+        if _is_nan(value) or _is_nan(last_value):
+            # Entering or leaving a NaN run is always reported
+            return not (_is_nan(value) and _is_nan(last_value))
+        band = sensor.deadband
+        if sensor.deadband_mode == "percent":
+            band = abs(last_value) * sensor.deadband / 100
+        if band <= 0:
+            return value != last_value
+        return abs(value - last_value) > band
+
+    def filter(self, timestamp, readings):
+        """Return the subset of {sensor: value} readings that must be published at timestamp"""
+        sensors = self.settings.sensors
+        changed = {}
+        for name, value in readings.items():
+            sensor = sensors.get(name)
+            if sensor is None or self._exceeds(sensor, value, timestamp):
+                changed[name] = value
+                self._last[name] = (timestamp, value)
+        return changed
+
+class CarryForward:
+    """Rebuilds the full, regularly sampled stream from report-by-exception payloads.
+
+    Sensors missing from a payload keep their last reported value. When a
+    payload arrives more than one publishing interval after the previous one,
+    the skipped ticks are filled with the carried-forward values, so drift
+    windows still span the same stretch of time as with full publishing and
+    rates of change are measured between consecutive ticks. Suppressed
+    readings were within the deadband of the carried value by construction.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.values = {}
+        self._last_time = None
+
+    def fill(self, payload, timestamp=None, max_gap=None):
+        """Return (gap_readings, reading) for one payload.
+
+        gap_readings is a list of (timestamp, reading) for the skipped ticks,
+        at most max_gap of them (the newest); reading is the payload merged
+        with the carried-forward values.
+        """
+        gap_readings = []
+        if timestamp is not None and self._last_time is not None and self.values:
+            ticks = int(round((timestamp - self._last_time) / self.interval))
+            gaps = ticks - 1 if max_gap is None else min(ticks - 1, max_gap)
+            if gaps > 0:
+                carried = dict(self.values)
+                gap_readings = [(timestamp - (gaps - i) * self.interval, carried) for i in range(gaps)]
+
+        self.values.update(payload)
+        if timestamp is not None and (self._last_time is None or timestamp > self._last_time):
+            self._last_time = timestamp
+        return gap_readings, dict(self.values)
@@ -0,0 +1,186 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+from collections import namedtuple
+import numpy as np
+
+# Import utility functions
+from asof import asof
+
+# Transfer functions applied to a parent signal before weighting
+TRANSFER_FUNCTIONS = {
+    "linear": lambda x: x,
+    "square": np.square,
+    "sqrt": lambda x: np.sign(x) * np.sqrt(np.abs(x)),
+    "log1p": lambda x: np.sign(x) * np.log1p(np.abs(x)),
+    "tanh": np.tanh,
+}
+
+# One weighted influence of a parent sensor on a dependent sensor
+Edge = namedtuple("Edge", ["parent", "child", "factor", "lag", "transfer"])
+
+class DependencyCycleError(ValueError):
+    """Raised when sensor_dependencies contains a cycle"""
+
+def parse_dependencies(dependencies):
+    """Turn the sensor_dependencies config section into a list of Edges.
+
+    Supports the original single-parent form
+        {"pressure": {"depends_on": "flow_rate", "correlation_factor": 0.5}}
+    and a multi-parent form with lags (in samples) and transfer functions
+        {"pressure": {"parents": [{"sensor": "flow_rate", "factor": 0.5, "lag": 2, "transfer": "tanh"}]}}
+    """
+    edges = []
+    for child, info in dependencies.items():
+        if child.startswith("_"):
+            continue
+        parents = info.get("parents")
+        if parents is None:
+            parents = [{"sensor": info["depends_on"], "factor": info["correlation_factor"]}]
+        for parent in parents:
+            transfer = parent.get("transfer", "linear")
+            if transfer not in TRANSFER_FUNCTIONS:
+                raise ValueError(f"Unknown transfer function '{transfer}' for {parent['sensor']} -> {child}")
+            lag = int(parent.get("lag", 0))
+            if lag < 0:
+                raise ValueError(f"Negative lag for {parent['sensor']} -> {child}")
+            edges.append(Edge(parent["sensor"], child, float(parent["factor"]), lag, transfer))
+    return edges
+
+def topological_levels(edges):
+    """Group dependent sensors into levels that only depend on earlier levels (Kahn's algorithm)"""
+    parents_of = {}
+    children_of = {}
+    for edge in edges:
+        parents_of.setdefault(edge.child, set()).add(edge.parent)
+        parents_of.setdefault(edge.parent, set())
+        children_of.setdefault(edge.parent, set()).add(edge.child)
+
+    remaining = {node: len(parents) for node, parents in parents_of.items()}
+    current = sorted(node for node, count in remaining.items() if count == 0)
+    levels = []
+    visited = 0
+    while current:
+        visited += len(current)
+        levels.append(current)
+        following = set()
+        for node in current:
+            for child in children_of.get(node, ()):
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    following.add(child)
+        current = sorted(following)
+
+    if visited != len(remaining):
+        cycle = sorted(node for node, count in remaining.items() if count > 0)
+        raise DependencyCycleError(f"Cyclic sensor dependencies involving: {', '.join(cycle)}")
+
+    # Level 0 holds the independent sensors; only later levels need evaluating
+    return levels[1:]
+
+class DependencyGraph:
+    """Compiled DAG of sensor dependencies evaluated level by level with NumPy.
+
+    Within a level every dependent only reads sensors from earlier levels, so
+    all edges sharing a (lag, transfer) pair are evaluated as one matrix
+    multiply: contributions = W @ transfer(parents).
+    """
+
+    def __init__(self, dependencies):
+        self.edges = parse_dependencies(dependencies)
+        self.levels = topological_levels(self.edges)
+        self.max_lag = max((edge.lag for edge in self.edges), default=0)
+        self.sensors = {edge.parent for edge in self.edges} | {edge.child for edge in self.edges}
+        self._plans = {}
+
+    def _plan(self, names):
+        """Build (and cache) the per-level matrices for a given sensor row order"""
+        key = tuple(names)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        index = {name: i for i, name in enumerate(names)}
+        usable = [edge for edge in self.edges if edge.parent in index and edge.child in index]
+        plan = []
+        for level in self.levels:
+            level_set = set(level)
+            groups = {}
+            for edge in usable:
+                if edge.child in level_set:
+                    groups.setdefault((edge.lag, edge.transfer), []).append(edge)
+            for (lag, transfer), group in sorted(groups.items()):
+                children = sorted({edge.child for edge in group})
+                parents = sorted({edge.parent for edge in group})
+                weights = np.zeros((len(children), len(parents)))
+                for edge in group:
+                    weights[children.index(edge.child), parents.index(edge.parent)] += edge.factor
+                plan.append((
+                    np.array([index[c] for c in children]),
+                    np.array([index[p] for p in parents]),
+                    weights,
+                    weights != 0,
+                    lag,
+                    TRANSFER_FUNCTIONS[transfer],
+                ))
+        self._plans[key] = plan
+        return plan
+
+    def apply_array(self, data, names, history=None):
+        """Propagate dependencies through a (sensors x samples) float array in place.
+
+        history, if given, holds the preceding max_lag samples (already
+        propagated) so lagged parents are continuous across blocks; otherwise
+        lagged parents are padded with their first value.
+        """
+        for children, parents, weights, nonzero, lag, transfer in self._plan(names):
+            source = data[parents]
+            if lag:
+                if history is not None and history.shape[1] >= lag:
+                    before = history[parents, history.shape[1] - lag:]
+                else:
+                    before = np.repeat(source[:, :1], lag, axis=1)
+                source = np.concatenate([before, source[:, :-lag]], axis=1)[:, :data.shape[1]]
+            transformed = transfer(source)
+
+            # NaNs (missing readings) only poison the dependents that actually use that parent
+            missing = np.isnan(transformed)
+            contributions = weights @ np.where(missing, 0.0, transformed)
+            if missing.any():
+                contributions[(nonzero.astype(np.int64) @ missing.astype(np.int64)) > 0] = np.nan
+            data[children] += contributions
+        return data
+
+    def apply_series(self, series):
+        """Propagate dependencies between sensors sampled at different rates; {name: (times, values)}, updated in place.
+
+        Each parent is taken as of the child's sample times (its latest sample
+        at or before each one), and lags count the child's samples.
+        """
+        for level in self.levels:
+            level_set = set(level)
+            for edge in self.edges:
+                if edge.child not in level_set or edge.parent not in series or edge.child not in series:
+                    continue
+                child_times, child_values = series[edge.child]
+                source = asof(*series[edge.parent], child_times)
+                if edge.lag:
+                    before = np.repeat(source[:1], edge.lag)
+                    source = np.concatenate([before, source[:-edge.lag]])[:len(child_times)]
+                # A missing parent reading makes the dependent reading missing too
+                child_values += edge.factor * TRANSFER_FUNCTIONS[edge.transfer](source)
+        return series
+
+    def apply(self, sensor_data):
+        """Propagate dependencies through a {sensor_name: array} mapping; returns the mapping"""
+        names = [name for name in sensor_data if name in self.sensors]
+        if not names:
+            return sensor_data
+        data = np.vstack([np.asarray(sensor_data[name], dtype=np.float64) for name in names])
+        self.apply_array(data, names)
+        for i, name in enumerate(names):
+            sensor_data[name] = data[i]
+        return sensor_data
@@ -0,0 +1,343 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Sequential change detectors for the monitor's drift_conditions.
+#
+# Every detector standardises readings against a baseline mean and standard
+# deviation (configured as target/sigma, or estimated from the first `warmup`
+# finite readings), so thresholds are in units of sigma and work the same for
+# negative, near-zero and large signals. Streaming detectors keep O(1) state
+# and update in O(1) per reading; detect_batch() runs the same detector over a
+# whole array with NumPy for backtesting. Batch results match the streaming
+# alarms except where a statistic lands within rounding error of its threshold.
+# Non-finite readings are skipped by both.
+
+import math
+
+class Detector:
+    """Baseline estimation shared by all detectors"""
+
+    __slots__ = ("warmup", "target", "sigma", "statistic", "_n", "_sum", "_sum_sq", "_fixed_target", "_fixed_sigma")
+
+    label = "change"
+
+    def __init__(self, warmup=200, target=None, sigma=None):
+        self.warmup = max(int(warmup), 2)
+        self._fixed_target = target
+        self._fixed_sigma = sigma
+        self.target = target
+        self.sigma = sigma
+        self.statistic = 0.0
+        self._n = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    @property
+    def ready(self):
+        return self.target is not None and self.sigma is not None
+
+    def _learn(self, value):
+        """Accumulate the baseline; returns True once it is known"""
+        self._n += 1
+        self._sum += value
+        self._sum_sq += value * value
+        if self._n < self.warmup:
+            return False
+        self.target, self.sigma = _baseline(self._n, self._sum, self._sum_sq, self._fixed_target, self._fixed_sigma)
+        self._start()
+        return True
+
+    def _start(self):
+        """Reset the detector statistic once the baseline is known"""
+
+    def update(self, value):
+        """Feed one reading; returns True if it raises an alarm"""
+        if value is None or not math.isfinite(value):
+            return False
+        if not self.ready:
+            self._learn(value)
+            return False
+        return self._step((value - self.target) / self.sigma)
+
+def _baseline(n, total, total_sq, target=None, sigma=None):
+    """Mean and sample standard deviation from running sums, unless configured"""
+    mean = total / n
+    if target is None:
+        target = mean
+    if sigma is None:
+        variance = max(total_sq - total * total / n, 0.0) / (n - 1)
+        # A perfectly flat baseline makes any movement an alarm rather than a division by zero
+        sigma = max(math.sqrt(variance), 1e-9 * max(1.0, abs(target)))
+    return target, sigma
+
+class EWMADetector(Detector):
+    """EWMA control chart: alarm while the smoothed reading is more than L sigma_ewma from the target"""
+
+    __slots__ = ("lam", "L", "_z", "_scale")
+
+    label = "EWMA shift"
+
+    def __init__(self, lam=0.1, L=3.5, warmup=200, target=None, sigma=None):
+        self.lam = float(lam)
+        self.L = float(L)
+        self._z = 0.0
+        # Asymptotic standard deviation of the EWMA of standardised readings
+        self._scale = math.sqrt(self.lam / (2 - self.lam))
+        super().__init__(warmup, target, sigma)
+        if self.ready:
+            self._start()
+
+    def _start(self):
+        self._z = 0.0
+        self.statistic = 0.0
+
+    def _step(self, x):
+        self._z = (1 - self.lam) * self._z + self.lam * x
+        self.statistic = self._z / self._scale
+        return abs(self.statistic) > self.L
+
+class CUSUMDetector(Detector):
+    """Two-sided tabular CUSUM with reference value k and decision interval h (both in sigma); resets on alarm"""
+
+    __slots__ = ("k", "h", "_high", "_low")
+
+    label = "CUSUM shift"
+
+    def __init__(self, k=0.5, h=8.0, warmup=200, target=None, sigma=None):
+        self.k = float(k)
+        self.h = float(h)
+        self._high = 0.0
+        self._low = 0.0
+        super().__init__(warmup, target, sigma)
+
+    @property
+    def limit(self):
+        return self.h
+
+    def _start(self):
+        self._reset()
+        self.statistic = 0.0
+
+    def _reset(self):
+        self._high = self._low = 0.0
+
+    def _step(self, x):
+        self._high = max(0.0, self._high + x - self.k)
+        self._low = max(0.0, self._low - x - self.k)
+        # Signed: positive for an upward shift, negative for a downward one
+        self.statistic = self._high if self._high >= self._low else -self._low
+        if self._high > self.h or self._low > self.h:
+            self._reset()
+            return True
+        return False
+
+    def _segment(self, x):
+        """Vectorized _step over x without resets (Lindley form); returns (high, low, keep)"""
+        import numpy as np
+
+        up = np.cumsum(x - self.k)
+        down = np.cumsum(-x - self.k)
+        high = up - np.minimum(np.minimum.accumulate(up), -self._high)
+        low = down - np.minimum(np.minimum.accumulate(down), -self._low)
+
+        def keep(j):
+            self._high, self._low = float(high[j]), float(low[j])
+        return high, low, keep
+
+class PageHinkleyDetector(Detector):
+    """Two-sided Page-Hinkley test against the running mean, tolerance delta and threshold (in sigma); resets on alarm"""
+
+    __slots__ = ("delta", "threshold", "_count", "_total", "_up", "_up_min", "_down", "_down_max")
+
+    label = "Page-Hinkley change"
+
+    def __init__(self, delta=0.25, threshold=20.0, warmup=200, target=None, sigma=None):
+        self.delta = float(delta)
+        self.threshold = float(threshold)
+        super().__init__(warmup, target, sigma)
+        self._start()
+
+    @property
+    def limit(self):
+        return self.threshold
+
+    def _start(self):
+        self._reset()
+        self.statistic = 0.0
+
+    def _reset(self):
+        self._count = 0
+        self._total = 0.0
+        self._up = self._up_min = 0.0
+        self._down = self._down_max = 0.0
+
+    def _step(self, x):
+        self._count += 1
+        self._total += x
+        mean = self._total / self._count
+        self._up += x - mean - self.delta
+        self._down += x - mean + self.delta
+        self._up_min = min(self._up_min, self._up)
+        self._down_max = max(self._down_max, self._down)
+        rise = self._up - self._up_min
+        fall = self._down_max - self._down
+        self.statistic = rise if rise >= fall else -fall
+        if rise > self.threshold or fall > self.threshold:
+            self._reset()
+            return True
+        return False
+
+    def _segment(self, x):
+        """Vectorized _step over x without resets; returns (rise, fall, keep)"""
+        import numpy as np
+
+        def running(start, increments):
+            # Seeded cumulative sum: same left-to-right additions as the streaming update
+            return np.cumsum(np.concatenate(([start], increments)))[1:]
+
+        counts = self._count + np.arange(1, len(x) + 1)
+        totals = running(self._total, x)
+        mean = totals / counts
+        up = running(self._up, x - mean - self.delta)
+        down = running(self._down, x - mean + self.delta)
+        up_min = np.minimum(np.minimum.accumulate(up), self._up_min)
+        down_max = np.maximum(np.maximum.accumulate(down), self._down_max)
+
+        def keep(j):
+            self._count = int(counts[j])
+            self._total, self._up, self._down = float(totals[j]), float(up[j]), float(down[j])
+            self._up_min, self._down_max = float(up_min[j]), float(down_max[j])
+        return up - up_min, down_max - down, keep
+
+DETECTORS = {
+    "ewma": EWMADetector,
+    "cusum": CUSUMDetector,
+    "page_hinkley": PageHinkleyDetector
+}
+
+def _parameters(spec):
+    return {key: value for key, value in spec.items() if key != "type" and not key.startswith("_")}
+
+def create_detector(spec):
+    """Build a streaming detector from a drift_conditions "detector" block ({"type": ..., params})"""
+    detector_type = spec.get("type")
+    if detector_type not in DETECTORS:
+        raise ValueError(f"Unknown detector type: {detector_type}")
+    return DETECTORS[detector_type](**_parameters(spec))
+
+# ---------------------------------------------------------------------------
+# Batch (backtesting) versions
+# ---------------------------------------------------------------------------
+
+def _ewma_batch(x, lam):
+    """z_t = (1 - lam) z_{t-1} + lam x_t with z_{-1} = 0, in closed form per block.
+
+    Within a block z_j = a^(j+1) z_start + lam a^j sum_i a^-i x_i with a = 1 - lam.
+    Blocks are short enough that a^-i stays finite; the rounding error of the
+    scaled prefix sum is still only ~eps * |x| / lam once multiplied back.
+    """
+    import numpy as np
+
+    a = 1.0 - lam
+    if a <= 0.0:
+        return lam * x
+    block = max(1, min(len(x), int(250 / -math.log10(a)) if a < 1.0 else len(x)))
+    z = np.empty_like(x)
+    previous = 0.0
+    powers = a ** np.arange(block + 1)
+    inverse = a ** -np.arange(block, dtype=np.float64)
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        n = len(chunk)
+        scaled = np.cumsum(chunk * inverse[:n])
+        z[start:start + n] = powers[1:n + 1] * previous + lam * powers[:n] * scaled
+        previous = z[start + n - 1]
+    return z
+
+# After an alarm this close to the previous one, the next few readings run through plain _step calls
+DENSE_ALARMS = 32
+
+def _scan_with_resets(detector, x):
+    """Run a resetting detector (CUSUM, Page-Hinkley) over standardised readings x.
+
+    Stretches between alarms are evaluated with the detector's vectorized
+    _segment, doubling the look-ahead while no alarm occurs. Where alarms come
+    every few readings, restarting NumPy after each reset costs more than the
+    reset itself, so up to DENSE_ALARMS readings after such an alarm go
+    through the streaming _step instead; both share the detector state.
+    """
+    import numpy as np
+
+    n = len(x)
+    alarms = np.zeros(n, dtype=bool)
+    statistic = np.zeros(n)
+    position = 0
+    lookahead = 256
+    while position < n:
+        end = min(n, position + lookahead)
+        positive, negative, keep = detector._segment(x[position:end])
+        hits = np.flatnonzero((positive > detector.limit) | (negative > detector.limit))
+        stop = hits[0] + 1 if len(hits) else end - position
+        statistic[position:position + stop] = np.where(positive[:stop] >= negative[:stop], positive[:stop], -negative[:stop])
+        keep(stop - 1)
+        position += stop
+        if not len(hits):
+            lookahead *= 2
+            continue
+
+        alarms[position - 1] = True
+        detector._reset()
+        lookahead = max(256, 4 * stop)
+        while stop < DENSE_ALARMS and position < n:
+            end = min(n, position + DENSE_ALARMS)
+            stop = DENSE_ALARMS
+            for i, value in enumerate(x[position:end].tolist(), start=position):
+                alarms[i] = detector._step(value)
+                statistic[i] = detector.statistic
+                if alarms[i]:
+                    stop = i + 1 - position
+                    break
+            position += stop
+    return alarms, statistic
+
+def detect_batch(values, spec):
+    """Batch counterpart of create_detector(spec).update over an array of readings.
+
+    Returns (alarms, statistic): a boolean mask of the readings that raise an
+    alarm and the detector statistic after each reading (NaN during warmup and
+    for non-finite readings).
+    """
+    import numpy as np
+
+    detector = create_detector(spec)
+    values = np.asarray(values, dtype=np.float64)
+    alarms = np.zeros(len(values), dtype=bool)
+    statistic = np.full(len(values), np.nan)
+
+    finite_index = np.flatnonzero(np.isfinite(values))
+    finite = values[finite_index]
+    skip = 0
+    target, sigma = detector.target, detector.sigma
+    if not detector.ready:
+        if len(finite) < detector.warmup:
+            return alarms, statistic
+        skip = detector.warmup
+        # Sequential sums, identical to the streaming accumulation
+        total = np.cumsum(finite[:skip])[-1]
+        total_sq = np.cumsum(finite[:skip] * finite[:skip])[-1]
+        target, sigma = _baseline(skip, float(total), float(total_sq), detector._fixed_target, detector._fixed_sigma)
+
+    detector.target, detector.sigma = target, sigma
+    x = (finite[skip:] - target) / sigma
+    if isinstance(detector, EWMADetector):
+        stat = _ewma_batch(x, detector.lam) / detector._scale
+        hits = np.abs(stat) > detector.L
+    else:
+        hits, stat = _scan_with_resets(detector, x)
+
+    alarms[finite_index[skip:]] = hits
+    statistic[finite_index[skip:]] = stat
+    return alarms, statistic
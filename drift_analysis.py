@@ -0,0 +1,234 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Import utility functions
+from utils import db_query
+from settings import DriftSettings, compile_drift_conditions, load_settings
+from detectors import detect_batch
+from data_quality import good_positions
+
+# Positions processed per prefix-sum chunk; keeps the fast window sums accurate to ~1e-11 relative
+CHUNK_SIZE = 1 << 16
+
+_EPS = np.finfo(np.float64).eps
+
+def _sequential_window_sums(values, window, positions):
+    """Window sums accumulated left to right, bit-identical to Python's sum() over the deque"""
+    windows = sliding_window_view(values, window)[positions - window + 1]
+    sums = np.zeros(len(positions))
+    for k in range(window):
+        sums += windows[:, k]
+    return sums
+
+def _drift_mask(values, window, deviation_factor):
+    """abs(value) > deviation_factor * rolling_avg for every full window, plus the rolling averages"""
+    n = len(values)
+    drift = np.zeros(n, dtype=bool)
+    averages = np.full(n, np.nan)
+    if n < window:
+        return drift, averages
+
+    finite = np.isfinite(values)
+    filled = np.where(finite, values, 0.0)
+    magnitude = np.abs(filled)
+    threshold_slack = 4 * _EPS * np.abs(values)
+
+    for start in range(window - 1, n, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, n)
+        lo = start - window + 1
+        # Prefix sums restarted per chunk, so the rounding error bound stays small
+        prefix = np.concatenate(([0.0], np.cumsum(filled[lo:end])))
+        prefix_abs = np.concatenate(([0.0], np.cumsum(magnitude[lo:end])))
+        bad = np.concatenate(([0], np.cumsum(~finite[lo:end])))
+
+        sums = prefix[window:] - prefix[:-window]
+        nonfinite = (bad[window:] - bad[:-window]) > 0
+        # Error of the prefix-sum difference plus the error of the sequential sum it stands in for
+        error = (2 * (end - lo) + window) * _EPS * prefix_abs[window:]
+
+        current = values[start:end]
+        avg = sums / window
+        margin = np.abs(current) - deviation_factor * avg
+        tolerance = deviation_factor * error / window + threshold_slack[start:end]
+        uncertain = nonfinite | (np.abs(margin) <= tolerance)
+
+        chunk_avg = np.where(nonfinite, np.nan, avg)
+        chunk_drift = (margin > 0) & ~nonfinite
+
+        # Re-evaluate near-threshold and non-finite windows exactly as the streaming detector does
+        if uncertain.any():
+            positions = np.flatnonzero(uncertain) + start
+            exact = _sequential_window_sums(values, window, positions) / window
+            chunk_avg[uncertain] = exact
+            with np.errstate(invalid="ignore"):
+                chunk_drift[uncertain] = np.abs(values[positions]) > deviation_factor * exact
+
+        averages[start:end] = chunk_avg
+        drift[start:end] = chunk_drift
+
+    return drift, averages
+
+def detect_drift(values, conditions):
+    """Batch equivalent of check_drift_conditions for one sensor's readings in arrival order.
+
+    Returns (drift, rate_alert, rolling_avg, rate): boolean masks of the readings
+    that would have raised a drift or rate-of-change warning in the live monitor,
+    and the rolling average and absolute rate of change at each reading.
+    Missing readings (NaN) occupy a window slot, as they do when published live.
+    """
+    if isinstance(conditions, dict):
+        conditions = compile_drift_conditions({"sensor": conditions})["sensor"]
+    values = np.asarray(values, dtype=np.float64)
+    window = conditions.window_size
+
+    drift, rolling_avg = _drift_mask(values, window, conditions.deviation_factor)
+    rate_alert, rate = _rate_of_change(values, conditions)
+    return drift, rate_alert, rolling_avg, rate
+
+def _rate_of_change(values, conditions):
+    """Rate-of-change alerts and absolute rates, checked once the window is full as in the live monitor"""
+    window = conditions.window_size
+    rate = np.full(len(values), np.nan)
+    rate[1:] = np.abs(np.diff(values))
+    rate_alert = np.zeros(len(values), dtype=bool)
+    if window > 1:
+        with np.errstate(invalid="ignore"):
+            rate_alert[window - 1:] = rate[window - 1:] > conditions.rate_of_change
+    return rate_alert, rate
+
+def analyze_drift(data, drift_conditions, timestamp_column="timestamp", quality=None, screened=False):
+    """Run detect_drift over every configured sensor column of a DataFrame.
+
+    Returns a DataFrame with one row per alert: timestamp, sensor, type
+    ("drift", the detector type, or "rate_of_change"), value and the rolling
+    average, detector statistic or rate that triggered it, in the same order
+    the live monitor would have raised them. With quality (a Settings object),
+    readings that fail the data quality checks are skipped, as the monitor's
+    quality gate skips them. With screened, data is the gated monitor's
+    sensor_data: its verdicts are already stored (flagged readings are NULL),
+    so those are skipped instead of re-running the checks, which would flag
+    stuck runs in carried-forward values the live gate never screened.
+    """
+    if drift_conditions and not isinstance(next(iter(drift_conditions.values())), DriftSettings):
+        drift_conditions = compile_drift_conditions(drift_conditions)
+
+    frames = []
+    for sensor, conditions in drift_conditions.items():
+        if sensor not in data:
+            continue
+        values = data[sensor].to_numpy(dtype=np.float64)
+        rows = np.arange(len(values))
+        if quality is not None:
+            rows = np.flatnonzero(~np.isnan(values)) if screened else good_positions(values, sensor, quality)
+            values = values[rows]
+        if conditions.detector is None:
+            drift, rate_alert, metric, rate = detect_drift(values, conditions)
+            kind = "drift"
+        else:
+            # Detector statistic in place of the rolling average
+            drift, metric = detect_batch(values, conditions.detector)
+            rate_alert, rate = _rate_of_change(values, conditions)
+            kind = conditions.detector["type"]
+        timestamps = data[timestamp_column].to_numpy()[rows] if timestamp_column in data else rows
+
+        for kind, mask, metric in ((kind, drift, metric), ("rate_of_change", rate_alert, rate)):
+            index = np.flatnonzero(mask)
+            frames.append(pd.DataFrame({
+                "row": rows[index],
+                "timestamp": timestamps[index],
+                "sensor": sensor,
+                "type": kind,
+                "value": values[index],
+                "metric": metric[index]
+            }))
+
+    columns = ["timestamp", "sensor", "type", "value", "metric"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    alerts = pd.concat(frames, ignore_index=True)
+    alerts = alerts.sort_values("row", kind="stable").reset_index(drop=True)
+    return alerts[columns]
+
+def load_sensor_history(db_name="sensor_data.db", start=None, end=None):
+    """Load stored readings from the monitor's sensor_data table in arrival order.
+
+    Readings from per-sensor topics (sensor_readings) have no payload rows to
+    replay in arrival order, so a database holding only those raises ValueError.
+    """
+    tables = db_query(db_name, "SELECT name FROM sqlite_master WHERE type = 'table'")
+    names = {row[0] for row in tables[1]} if tables else set()
+    if "sensor_data" not in names:
+        if "sensor_readings" in names:
+            raise ValueError(f"{db_name} only holds per-sensor topic readings (sensor_readings); backtests and "
+                             "replays need the combined topic's sensor_data table")
+        return None
+    query = "SELECT * FROM sensor_data"
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY id"
+
+    result = db_query(db_name, query, tuple(params))
+    if result is None:
+        return None
+    columns, rows = result
+    return pd.DataFrame.from_records(rows, columns=columns).drop(columns=["id"], errors="ignore")
+
+def main(config_file="config.json", argv=None):
+    parser = argparse.ArgumentParser(description="Run the drift detector over stored sensor history")
+    parser.add_argument("--db", default="sensor_data.db", help="SQLite database written by the monitor")
+    parser.add_argument("--csv", help="Analyze a generated CSV dataset instead of the database")
+    parser.add_argument("--start", help="Only readings at or after this timestamp")
+    parser.add_argument("--end", help="Only readings before this timestamp")
+    parser.add_argument("--output", help="Write the alerts to this CSV file")
+    args = parser.parse_args(argv)
+
+    try:
+        # Load and compile configuration
+        settings = load_settings(config_file)
+        if settings is None:
+            print("Configuration validation failed. Exiting.")
+            return 1
+
+        if args.csv:
+            data = pd.read_csv(args.csv)
+            timestamp_column = "Time"
+        else:
+            data = load_sensor_history(args.db, args.start, args.end)
+            timestamp_column = "timestamp"
+        if data is None or data.empty:
+            print("No sensor data to analyze.")
+            return 1
+
+        # Skip the readings the monitor's quality gate flagged (stored as NULL), or would flag in a raw CSV
+        quality = settings if settings.raw.get("data_quality", {}).get("enabled", False) else None
+        alerts = analyze_drift(data, settings.drift_conditions, timestamp_column, quality, screened=not args.csv)
+        print(f"Analyzed {len(data)} reading(s): {len(alerts)} alert(s)")
+        if not alerts.empty:
+            print(alerts.groupby(["sensor", "type"]).size().to_string())
+
+        if args.output:
+            alerts.to_csv(args.output, index=False)
+            print(f"Alerts written to {args.output}")
+        return 0
+    except Exception as e:
+        print(f"Error in drift analysis: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import io
+import sys
+import csv
+import json
+import argparse
+
+# Import utility functions
+from utils import get_db_connection, db_query
+
+# Rows fetched from the cursor per chunk; memory use is bounded by this, not by the export size
+CHUNK_SIZE = 10000
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Tables the monitor stores readings in: one row per payload with a column per sensor (combined
+# topic), or one row per reading keyed by site and sensor (per-sensor topics)
+TABLES = ("sensor_data", "sensor_readings")
+
+# Parquet types of the non-float columns
+TEXT_COLUMNS = ("timestamp", "site", "sensor")
+INTEGER_COLUMNS = ("quality",)
+
+# Series name of a sensor_readings row, as topic_router.sensor_key builds it
+READING_KEY = "CASE WHEN site IS NULL THEN sensor ELSE site || '/' || sensor END"
+
+def sensor_columns(db_name="sensor_data.db"):
+    """Sensor columns of the sensor_data table"""
+    result = db_query(db_name, "PRAGMA table_info(sensor_data)")
+    if result is None:
+        return []
+    return [row[1] for row in result[1] if row[1] not in ("id", "timestamp")]
+
+def reading_keys(db_name="sensor_data.db"):
+    """Series names ("site/sensor") in the sensor_readings table"""
+    exists = db_query(db_name, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sensor_readings'")
+    if not exists or not exists[1]:
+        return []
+    result = db_query(db_name, f"SELECT DISTINCT {READING_KEY} FROM sensor_readings")
+    if result is None:
+        return []
+    return sorted(row[0] for row in result[1])
+
+def _time_clauses(start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    return clauses, params
+
+def _cursor_chunks(db_name, query, params, columns, chunk_size):
+    cursor = get_db_connection(db_name).cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+
+def iter_rows(db_name="sensor_data.db", sensors=None, start=None, end=None, chunk_size=CHUNK_SIZE, table="sensor_data"):
+    """Yield (columns, rows) chunks of stored readings in time order, straight from the cursor.
+
+    sensors restricts the export to those columns (unknown names raise
+    ValueError); start/end bound the timestamp (end exclusive). Read-only:
+    the monitor creates the timestamp index these range reads use. With
+    table="sensor_readings" the rows are the per-sensor topic readings
+    (timestamp, site, sensor, value, quality) and sensors are "site/sensor"
+    names.
+    """
+    if table == "sensor_readings":
+        yield from iter_readings(db_name, sensors, start, end, chunk_size)
+        return
+    if table != "sensor_data":
+        raise ValueError(f"Unknown table: {table} (use {' or '.join(TABLES)})")
+
+    available = sensor_columns(db_name)
+    if not available:
+        hint = " (per-sensor topic readings are in sensor_readings)" if reading_keys(db_name) else ""
+        raise ValueError(f"No sensor_data table in {db_name}{hint}")
+    if sensors:
+        unknown = [sensor for sensor in sensors if sensor not in available]
+        if unknown:
+            raise ValueError(f"Unknown sensor(s): {', '.join(unknown)}")
+    else:
+        sensors = available
+
+    clauses, params = _time_clauses(start, end)
+    columns = ["timestamp"] + list(sensors)
+    query = f"SELECT {', '.join(columns)} FROM sensor_data"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY timestamp, id"
+    yield from _cursor_chunks(db_name, query, params, columns, chunk_size)
+
+def iter_readings(db_name="sensor_data.db", sensors=None, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Yield (columns, rows) chunks of the long-format sensor_readings table in time order"""
+    available = reading_keys(db_name)
+    if not available:
+        raise ValueError(f"No sensor_readings table in {db_name}")
+    clauses, params = _time_clauses(start, end)
+    if sensors:
+        unknown = [sensor for sensor in sensors if sensor not in available]
+        if unknown:
+            raise ValueError(f"Unknown sensor(s): {', '.join(unknown)}")
+        clauses.append(f"{READING_KEY} IN ({', '.join('?' * len(sensors))})")
+        params.extend(sensors)
+
+    columns = ["timestamp", "site", "sensor", "value", "quality"]
+    query = f"SELECT {', '.join(columns)} FROM sensor_readings"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY timestamp, id"
+    yield from _cursor_chunks(db_name, query, params, columns, chunk_size)
+
+def _csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in chunks:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _jsonl_chunks(chunks):
+    for columns, rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+def _parquet_chunks(chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    sink = _ByteSink()
+    writer = None
+    try:
+        for columns, rows in chunks:
+            # One row group per chunk
+            types = [pa.string() if name in TEXT_COLUMNS else pa.int64() if name in INTEGER_COLUMNS else pa.float64()
+                     for name in columns]
+            arrays = [pa.array([row[i] for row in rows], type=types[i]) for i in range(len(columns))]
+            table = pa.Table.from_arrays(arrays, names=columns)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+def export_chunks(db_name="sensor_data.db", file_format="csv", sensors=None, start=None, end=None, chunk_size=CHUNK_SIZE,
+                  table="sensor_data"):
+    """Yield the export as str (csv, jsonl) or bytes (parquet) chunks"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    chunks = iter_rows(db_name, sensors, start, end, chunk_size, table)
+    if file_format == "csv":
+        return _csv_chunks(chunks)
+    if file_format == "jsonl":
+        return _jsonl_chunks(chunks)
+    return _parquet_chunks(chunks)
+
+def register_export_route(server, db_name="sensor_data.db"):
+    """Add GET /export?format=&sensors=a,b&start=&end=&table= to a Flask server, streaming the response"""
+    from flask import Response, request, stream_with_context
+
+    @server.route("/export")
+    def export_sensor_data():
+        file_format = request.args.get("format", "csv")
+        sensors = [s for s in request.args.get("sensors", "").split(",") if s] or None
+        table = request.args.get("table", "sensor_data")
+        try:
+            chunks = export_chunks(db_name, file_format, sensors, request.args.get("start"), request.args.get("end"),
+                                   table=table)
+            # Pull the first chunk now so bad parameters become a 400 instead of a broken stream
+            first = next(chunks, None)
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype="text/plain")
+
+        def body():
+            if first is not None:
+                yield first
+            yield from chunks
+
+        return Response(stream_with_context(body()), mimetype=FORMATS[file_format],
+                        headers={"Content-Disposition": f"attachment; filename={table}.{file_format}"})
+
+    return export_sensor_data
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored sensor readings")
+    parser.add_argument("--db", default="sensor_data.db", help="SQLite database written by the monitor")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="Output format")
+    parser.add_argument("--sensors", help="Comma-separated sensors to export (default: all; site/sensor for sensor_readings)")
+    parser.add_argument("--table", choices=TABLES, default="sensor_data",
+                        help="sensor_data (combined topic) or sensor_readings (per-sensor topics)")
+    parser.add_argument("--start", help="Only readings at or after this timestamp")
+    parser.add_argument("--end", help="Only readings before this timestamp")
+    parser.add_argument("--output", help="Output file (default: stdout; required for parquet)")
+    args = parser.parse_args(argv)
+
+    sensors = args.sensors.split(",") if args.sensors else None
+    try:
+        chunks = export_chunks(args.db, args.format, sensors, args.start, args.end, table=args.table)
+        if args.format == "parquet":
+            if not args.output:
+                print("Parquet export requires --output", file=sys.stderr)
+                return 1
+            output = open(args.output, "wb")
+        else:
+            output = open(args.output, "w", newline="") if args.output else sys.stdout
+
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return 0
+    except Exception as e:
+        print(f"Error exporting sensor data: {str(e)}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Import utility functions
+from utils import load_config, validate_config
+from signal_model import StreamingGenerator
+
+# Sensor parameters that receive per-site jitter unless configured otherwise
+DEFAULT_JITTER = {"base_value": 0.05, "drift_rate": 0.2, "noise_std": 0.1}
+
+# Ticks drawn from one random stream. Each block's stream is keyed on (seed, site, block), so
+# any partition can regenerate exactly the samples its neighbours wrote
+NOISE_BLOCK = 4096
+
+def site_name(index, prefix="site"):
+    return f"{prefix}_{index:05d}"
+
+def site_sensors(template_sensors, site_index, jitter, seed):
+    """Instantiate the site template with multiplicative parameter jitter, reproducible per site"""
+    rng = np.random.default_rng([seed, site_index])
+    sensors = []
+    for sensor in template_sensors:
+        sensor = {key: value for key, value in sensor.items() if not key.startswith("_")}
+        for param, fraction in jitter.items():
+            if param in sensor:
+                sensor[param] = sensor[param] * (1 + rng.uniform(-fraction, fraction))
+        sensors.append(sensor)
+    return sensors
+
+def partition_path(output_dir, site, part, file_format):
+    # Hive-style layout so query engines can prune by site
+    return os.path.join(output_dir, f"site={site}", f"part-{part:05d}.{file_format}")
+
+def site_ticks(generator, seed, site_index, start_tick, num_points):
+    """(times, values) for ticks [start_tick, start_tick + num_points) of one site, identical however the site is partitioned.
+
+    Whole NOISE_BLOCKs are generated, each from its own keyed stream, and
+    generation starts early enough to replay every lagged sample (through
+    chains of lagged dependencies) that the requested ticks depend on.
+    """
+    lookback = generator.graph.max_lag * len(generator.graph.levels) if generator.graph is not None else 0
+    first = max(start_tick - lookback, 0) // NOISE_BLOCK * NOISE_BLOCK
+    stop = start_tick + num_points
+    generator.tick = first
+    times, values = [], []
+    for block in range(first // NOISE_BLOCK, -(-stop // NOISE_BLOCK)):
+        generator.rng = np.random.default_rng([seed, site_index, block])
+        block_times, block_values = generator.next_block(NOISE_BLOCK)
+        # Keep only the part of the block inside the requested range
+        lo = max(start_tick - block * NOISE_BLOCK, 0)
+        hi = min(stop - block * NOISE_BLOCK, NOISE_BLOCK)
+        if lo < hi:
+            times.append(block_times[lo:hi])
+            values.append(block_values[:, lo:hi])
+    return np.concatenate(times), np.concatenate(values, axis=1)
+
+def generate_partition(task):
+    """Generate and write one (site, time range) partition. Runs in a worker process"""
+    (site_index, part, template, dependencies, jitter, seed, start_tick, num_points,
+     time_interval, output_dir, file_format, prefix, overwrite) = task
+    site = site_name(site_index, prefix)
+    path = partition_path(output_dir, site, part, file_format)
+    if not overwrite and os.path.exists(path):
+        return path, 0
+
+    sensors = site_sensors(template, site_index, jitter, seed)
+    generator = StreamingGenerator(sensors, dependencies, time_interval=time_interval)
+    times, values = site_ticks(generator, seed, site_index, start_tick, num_points)
+    df = pd.DataFrame(values.T, columns=generator.names)
+    df.insert(0, "Time", times)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if file_format == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    # Only complete partitions ever appear under their final name, so interrupted runs can resume
+    os.replace(tmp_path, path)
+    return path, num_points
+
+def build_tasks(config, fleet_config):
+    """List every (site, partition) work item for the fleet"""
+    template = fleet_config.get("site_template", {})
+    template_sensors = template.get("sensors", config["sensors"])
+    dependencies = template.get("sensor_dependencies", config.get("sensor_dependencies", {}))
+    jitter = fleet_config.get("jitter", DEFAULT_JITTER)
+    seed = fleet_config.get("seed", 0)
+    points_per_site = fleet_config.get("points_per_site", config.get("sampling", {}).get("num_points", 1000))
+    partition_points = fleet_config.get("partition_points", 100000)
+    time_interval = fleet_config.get("time_interval", config.get("sampling", {}).get("time_interval", 0.1))
+    output_dir = fleet_config.get("output_dir", "output_data/fleet")
+    file_format = fleet_config.get("format", "csv")
+    prefix = fleet_config.get("site_prefix", "site")
+    overwrite = fleet_config.get("overwrite", False)
+
+    tasks = []
+    for site_index in range(fleet_config.get("sites", 1)):
+        for part, start_tick in enumerate(range(0, points_per_site, partition_points)):
+            num_points = min(partition_points, points_per_site - start_tick)
+            tasks.append((site_index, part, template_sensors, dependencies, jitter, seed, start_tick,
+                          num_points, time_interval, output_dir, file_format, prefix, overwrite))
+    return tasks
+
+def generate_fleet(config, fleet_config):
+    """Generate every partition of the fleet in parallel; returns the number of rows written"""
+    tasks = build_tasks(config, fleet_config)
+    workers = fleet_config.get("workers") or os.cpu_count()
+    print(f"Generating {len(tasks)} partition(s) for {fleet_config.get('sites', 1)} site(s) with {workers} worker(s)")
+
+    if workers == 1:
+        counts = [count for _, count in map(generate_partition, tasks)]
+    else:
+        # Each worker generates and writes its own partitions; only (path, rows) comes back
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(tasks) // (workers * 8))
+            counts = [count for _, count in executor.map(generate_partition, tasks, chunksize=chunksize)]
+
+    rows = sum(counts)
+    written = sum(1 for count in counts if count)
+
+    print(f"Wrote {rows} row(s) in {written} partition(s) ({len(tasks) - written} already present)")
+    return rows
+
+def main(config_file="config.json", argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic data for a fleet of sites")
+    parser.add_argument("--sites", type=int, help="Number of sites (overrides fleet.sites)")
+    parser.add_argument("--points", type=int, help="Readings per sensor per site (overrides fleet.points_per_site)")
+    parser.add_argument("--workers", type=int, help="Worker processes (overrides fleet.workers)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Output format (overrides fleet.format)")
+    parser.add_argument("--output-dir", help="Output directory (overrides fleet.output_dir)")
+    args = parser.parse_args(argv)
+
+    try:
+        # Load configuration
+        config = load_config(config_file)
+
+        # Validate configuration
+        if not validate_config(config):
+            print("Configuration validation failed. Exiting.")
+            return 1
+
+        fleet_config = dict(config.get("fleet", {}))
+        overrides = {"sites": args.sites, "points_per_site": args.points, "workers": args.workers,
+                     "format": args.format, "output_dir": args.output_dir}
+        fleet_config.update({key: value for key, value in overrides.items() if value is not None})
+
+        generate_fleet(config, fleet_config)
+        return 0
+    except Exception as e:
+        print(f"Error in fleet generator: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Gunicorn settings for the production dashboard: gunicorn -c gunicorn.conf.py wsgi:server
+
+import os
+import sys
+import subprocess
+import multiprocessing
+
+# Import utility functions
+from utils import load_config
+from settings import channel_settings
+
+bind = f"0.0.0.0:{os.getenv('DASH_PORT', '8050')}"
+
+# Dash callbacks are CPU-bound (figure building, JSON encoding), so scale workers with cores
+workers = int(os.getenv("DASH_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("DASH_THREADS", 2))
+timeout = 60
+
+# Shared MQTT ingestion process, started once by the gunicorn master unless the monitor feeds the workers
+ingest_process = None
+
+def on_starting(server):
+    global ingest_process
+    config = load_config(os.getenv("CONFIG_PATH", "config.json")) or {}
+    if channel_settings(config)["source"] != "ingest":
+        server.log.info("Dashboard workers read the monitor's shared sensor channel")
+        return
+    ingest_process = subprocess.Popen([sys.executable, "dashboard_ingest.py"])
+    server.log.info(f"Started dashboard ingest process (pid {ingest_process.pid})")
+
+def on_exit(server):
+    if ingest_process is not None and ingest_process.poll() is None:
+        ingest_process.terminate()
+        try:
+            ingest_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            ingest_process.kill()
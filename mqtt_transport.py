@@ -0,0 +1,310 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import asyncio
+import socket
+import threading
+from collections import deque
+import paho.mqtt.client as mqtt
+
+# Import utility functions
+from utils import backoff_delay
+
+def default_client_id(role):
+    """Build a stable client id so the broker can keep a persistent session for this component"""
+    return f"scada-{role}-{socket.gethostname()}"
+
+class MQTTTransport:
+    """Asyncio-driven MQTT client shared by the publisher, monitor and dashboard.
+
+    The paho client's socket is serviced by the asyncio event loop. Dropped
+    connections are re-established with jittered exponential backoff, messages
+    published while disconnected are kept in a bounded outbox, and QoS 1 with a
+    persistent session (clean_session=False) lets the broker hold messages for
+    subscribers across restarts. With a DiskSpool the outbox lives on disk
+    instead and is drained at a bounded catch-up rate after reconnecting.
+    """
+
+    def __init__(self, mqtt_config, role="client", subscriptions=None, on_message=None, userdata=None, spool=None,
+                 catch_up_rate=500, drain_batch_size=200):
+        self.broker = mqtt_config["broker"]
+        self.port = mqtt_config["port"]
+        self.keepalive = mqtt_config.get("keepalive", 60)
+        self.qos = mqtt_config.get("qos", 1)
+        self.min_backoff = mqtt_config.get("reconnect_min_delay", 0.5)
+        self.max_backoff = mqtt_config.get("reconnect_max_delay", 30)
+        self.subscriptions = list(subscriptions or [])
+
+        client_id = mqtt_config.get("client_id") or default_client_id(role)
+        self.client = mqtt.Client(client_id=client_id, clean_session=mqtt_config.get("clean_session", False),
+                                  userdata=userdata)
+        if mqtt_config.get("username"):
+            self.client.username_pw_set(mqtt_config["username"], mqtt_config.get("password"))
+
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+        if on_message is not None:
+            self.client.on_message = on_message
+
+        # Messages published while the broker is unreachable: (topic, payload, qos)
+        self.outbox = deque(maxlen=mqtt_config.get("buffer_size", 10000))
+        self.dropped = 0
+        self.connected = False
+        # paho keeps QoS>0 messages it has accepted until acknowledged; bound that queue too
+        self.client.max_queued_messages_set(self.outbox.maxlen)
+
+        # Optional disk spool replacing the in-memory outbox (store-and-forward)
+        self.spool = spool
+        self.catch_up_rate = catch_up_rate
+        self.drain_batch_size = drain_batch_size
+        self._spool_mids = {}
+        self._drain_task = None
+
+        self._loop = None
+        self._thread_id = None
+        self._stopping = None
+        self._disconnected = None
+        self._session_up = False
+        self._misc_task = None
+
+    # --- Publishing ---
+
+    def publish(self, topic, payload, qos=None):
+        """Publish a message, buffering it if the broker is currently unreachable.
+
+        Safe to call from any thread; calls from outside the event loop are
+        handed over to it.
+        """
+        qos = self.qos if qos is None else qos
+        if self._loop is not None and not self._in_loop_thread():
+            self._loop.call_soon_threadsafe(self._publish, topic, payload, qos)
+        else:
+            self._publish(topic, payload, qos)
+
+    def _publish(self, topic, payload, qos):
+        if self.connected:
+            info = self.client.publish(topic, payload, qos=qos)
+            if self._accepted(info, qos):
+                return True
+        self._buffer(topic, payload, qos)
+        return False
+
+    @staticmethod
+    def _accepted(info, qos):
+        # For QoS>0 paho queues the message itself and resends it after reconnecting
+        if qos > 0 and info.rc == mqtt.MQTT_ERR_NO_CONN:
+            return True
+        return info.rc == mqtt.MQTT_ERR_SUCCESS
+
+    def _buffer(self, topic, payload, qos):
+        if self.spool is not None:
+            self.spool.append(topic, payload)
+            return
+        if len(self.outbox) == self.outbox.maxlen:
+            # The deque drops the oldest message on append
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"MQTT outbox full, dropped {self.dropped} message(s)")
+        self.outbox.append((topic, payload, qos))
+
+    def _flush_outbox(self):
+        """Send buffered messages in order until the outbox is empty or the connection drops"""
+        sent = 0
+        while self.outbox and self.connected:
+            topic, payload, qos = self.outbox[0]
+            info = self.client.publish(topic, payload, qos=qos)
+            if not self._accepted(info, qos):
+                break
+            self.outbox.popleft()
+            sent += 1
+        if sent:
+            print(f"Flushed {sent} buffered MQTT message(s)")
+
+    def _start_drain(self):
+        if self.spool is None or not self.spool.unread():
+            return
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = self._loop.create_task(self._drain_spool())
+
+    async def _drain_spool(self):
+        """Replay spooled messages in batches, throttled to catch_up_rate messages per second"""
+        print(f"Draining {self.spool.unread()} spooled message(s) at up to {self.catch_up_rate}/s")
+        while self.connected and self.spool.unread():
+            # Wait for acknowledgements rather than piling messages into paho's queue
+            if len(self._spool_mids) >= self.drain_batch_size:
+                await asyncio.sleep(0.05)
+                continue
+
+            batch = self.spool.read_batch(self.drain_batch_size)
+            for seq, topic, payload in batch:
+                info = self.client.publish(topic, payload, qos=self.qos)
+                if not self._accepted(info, self.qos):
+                    # Leave it for the next drain pass
+                    self.spool.rewind(seq)
+                    break
+                if self.qos == 0:
+                    self.spool.ack(seq)
+                else:
+                    self._spool_mids[info.mid] = seq
+            await asyncio.sleep(len(batch) / self.catch_up_rate)
+        if not self.spool.unread():
+            print("Spool drained")
+
+    def _on_publish(self, client, userdata, mid):
+        seq = self._spool_mids.pop(mid, None)
+        if seq is not None:
+            self.spool.ack(seq)
+
+    # --- Connection lifecycle ---
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"MQTT connection refused: {mqtt.connack_string(rc)}")
+            self._signal_disconnected()
+            return
+        self.connected = True
+        self._session_up = True
+        print(f"MQTT connection successful (session present: {bool(flags.get('session present'))})")
+        for topic in self.subscriptions:
+            client.subscribe(topic, qos=self.qos)
+            print(f"Subscribed to MQTT topic: {topic}")
+        self._flush_outbox()
+        self._start_drain()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        if rc != 0:
+            print(f"MQTT connection lost (rc={rc})")
+        self._signal_disconnected()
+
+    def _signal_disconnected(self):
+        if self._disconnected is not None:
+            self._disconnected.set()
+
+    async def run(self):
+        """Connect and keep the connection alive until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stopping = asyncio.Event()
+        self._disconnected = asyncio.Event()
+        attempt = 0
+
+        try:
+            while not self._stopping.is_set():
+                self._disconnected.clear()
+                self._session_up = False
+                try:
+                    print(f"Connecting to MQTT broker {self.broker}:{self.port}...")
+                    # connect() blocks on DNS and TCP; keep it off the event loop
+                    await self._loop.run_in_executor(None, self.client.connect, self.broker, self.port, self.keepalive)
+                    await self._wait_for_disconnect()
+                except (OSError, ValueError) as e:
+                    print(f"MQTT connection failed: {str(e)}")
+
+                if self._stopping.is_set():
+                    break
+                # Start the backoff over once a connection has actually been established
+                attempt = 0 if self._session_up else attempt + 1
+                delay = backoff_delay(attempt, self.min_backoff, self.max_backoff)
+                print(f"Reconnecting to MQTT broker in {delay:.1f} seconds...")
+                await self._wait_or_stop(delay)
+        finally:
+            self.connected = False
+            if self.client.disconnect() == mqtt.MQTT_ERR_SUCCESS:
+                # Push the DISCONNECT packet out now; the loop stops servicing the socket after this
+                self.client.loop_write()
+            if self.spool is not None:
+                self.spool.close()
+            self._loop = None
+
+    async def _wait_for_disconnect(self):
+        stop_task = asyncio.ensure_future(self._stopping.wait())
+        disconnect_task = asyncio.ensure_future(self._disconnected.wait())
+        try:
+            await asyncio.wait([stop_task, disconnect_task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop_task.cancel()
+            disconnect_task.cancel()
+
+    async def _wait_or_stop(self, delay):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def stop(self):
+        """Ask the transport to disconnect and return from run()"""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def run_forever(self):
+        """Run the transport on a fresh event loop in the calling thread"""
+        asyncio.run(self.run())
+
+    def start(self):
+        """Run the transport on a background daemon thread and return the thread"""
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def _in_loop_thread(self):
+        return threading.get_ident() == self._thread_id
+
+    # --- asyncio socket integration (see paho's loop_asyncio example) ---
+    # paho may invoke these from the executor thread running connect(), so changes
+    # to the event loop's reader/writer sets are handed to the loop thread. File
+    # descriptors are captured immediately because paho closes the socket right
+    # after the close callbacks return.
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._call_in_loop(self._add_socket, sock.fileno())
+
+    def _add_socket(self, fd):
+        self._loop.add_reader(fd, self.client.loop_read)
+        self._misc_task = self._loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._call_in_loop(self._remove_socket, sock.fileno())
+
+    def _remove_socket(self, fd):
+        self._loop.remove_reader(fd)
+        self._loop.remove_writer(fd)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._call_in_loop(self._add_writer, sock.fileno())
+
+    def _add_writer(self, fd):
+        self._loop.add_writer(fd, self.client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._call_in_loop(self._remove_writer, sock.fileno())
+
+    def _remove_writer(self, fd):
+        self._loop.remove_writer(fd)
+
+    def _call_in_loop(self, callback, *args):
+        if self._loop is None:
+            return
+        if self._in_loop_thread():
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(self._call_in_loop, callback, *args)
+
+    async def _misc_loop(self):
+        # Keepalive pings and timeout detection
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
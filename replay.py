@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Push recorded readings through the full monitor pipeline (quality gate,
+# storage, drift detection, alert episodes) on a simulated clock:
+#     python replay.py --db sensor_data.db [--speed 0] [--start ...] [--end ...]
+#     python replay.py --csv output_data/scada_data.csv --origin "2024-01-01 00:00:00"
+
+import sys
+import time
+import argparse
+
+# Import utility functions
+from utils import db_query
+from settings import load_settings
+from alerts import AlertEngine
+from clock import SimulatedClock, parse_time
+import scada_monitor
+
+def load_readings(args):
+    """(epoch timestamps, sensor names, rows of values) from the monitor's database or a generated CSV"""
+    import numpy as np
+    import pandas as pd
+    from drift_analysis import load_sensor_history
+
+    if args.csv:
+        data = pd.read_csv(args.csv)
+        origin = parse_time(args.origin) if args.origin else time.time()
+        # Generated datasets use seconds from the start of the run
+        timestamps = origin + data.pop("Time").to_numpy(dtype=np.float64)
+    else:
+        data = load_sensor_history(args.db, args.start, args.end)
+        if data is None:
+            return None
+        text = data.pop("timestamp")
+        # Stored timestamps repeat for every reading within a second; parse each once
+        parsed = {value: parse_time(value) for value in text.unique()}
+        timestamps = text.map(parsed).to_numpy(dtype=np.float64)
+    names = list(data.columns)
+    return timestamps, names, data.to_numpy(dtype=np.float64)
+
+def count_episodes(alerts_db):
+    result = db_query(alerts_db, "SELECT COUNT(*) FROM alerts")
+    return result[1][0][0] if result else 0
+
+def replay(timestamps, names, rows, settings, alerts_db, sensor_db, speed=0.0):
+    """Run the readings through scada_monitor.process_payload; returns the number of alert episodes opened"""
+    clock = SimulatedClock(timestamps[0] if len(timestamps) else 0.0)
+    alert_engine = AlertEngine.from_config(settings.raw.get("alerting"), db_name=alerts_db, clock=clock)
+    userdata = scada_monitor.build_userdata(settings, alert_engine, clock, sensor_db=sensor_db)
+    before = count_episodes(alerts_db)
+
+    start_wall = time.monotonic()
+    start_time = timestamps[0] if len(timestamps) else 0.0
+    for timestamp, values in zip(timestamps.tolist(), rows.tolist()):
+        if speed > 0:
+            # Hold the replay to `speed` times real time
+            delay = (timestamp - start_time) / speed - (time.monotonic() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        payload = dict(zip(names, values))
+        payload["timestamp"] = timestamp
+        scada_monitor.process_payload(payload, userdata)
+
+    alert_engine.flush()
+    return count_episodes(alerts_db) - before
+
+def main(config_file="config.json", argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded sensor data through the monitor on a simulated clock")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default="sensor_data.db", help="sensor_data database written by the monitor")
+    source.add_argument("--csv", help="Dataset written by scada_data_generator.py")
+    parser.add_argument("--origin", help="Start time for a CSV's Time column (YYYY-MM-DD HH:MM:SS, default now)")
+    parser.add_argument("--start", help="Only readings at or after this timestamp")
+    parser.add_argument("--end", help="Only readings before this timestamp")
+    parser.add_argument("--speed", type=float, default=0, help="Multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--alerts-db", default="replay_alerts.db", help="Alert episodes database for the replay")
+    parser.add_argument("--sensor-db", default="replay_sensor_data.db", help="Where the replayed readings are stored")
+    args = parser.parse_args(argv)
+
+    try:
+        # Load and compile configuration
+        settings = load_settings(config_file)
+        if settings is None:
+            print("Configuration validation failed. Exiting.")
+            return 1
+
+        readings = load_readings(args)
+        if readings is None or not len(readings[0]):
+            print("No sensor data to replay.")
+            return 1
+        timestamps, names, rows = readings
+
+        if not scada_monitor.initialize_database(args.alerts_db):
+            print("Failed to initialize database. Exiting.")
+            return 1
+
+        started = time.perf_counter()
+        opened = replay(timestamps, names, rows, settings, args.alerts_db, args.sensor_db, args.speed)
+        elapsed = time.perf_counter() - started
+        simulated = timestamps[-1] - timestamps[0]
+        print(f"Replayed {len(timestamps)} reading(s) covering {simulated / 3600:.1f} h in {elapsed:.1f} s "
+              f"({simulated / max(elapsed, 1e-9):.0f}x real time): {opened} alert episode(s) opened")
+        return 0
+    except Exception as e:
+        print(f"Error in replay: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
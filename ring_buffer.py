@@ -0,0 +1,58 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import numpy as np
+
+class SensorRingBuffer:
+    """Fixed-capacity ring buffer of (timestamp, value) samples for one sensor.
+
+    Designed for a single writer (the MQTT thread) and any number of readers.
+    Every sample is written twice, at i and i + capacity, so the most recent
+    window is always one contiguous slice and readers get NumPy views instead of
+    copies. The write counter is only advanced after both copies are stored;
+    a reader racing the writer can at worst see the oldest sample being
+    replaced, never a partially written newest sample.
+    """
+
+    __slots__ = ("capacity", "_times", "_values", "_count")
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._times = np.zeros(2 * capacity, dtype="datetime64[ms]")
+        self._values = np.full(2 * capacity, np.nan, dtype=np.float64)
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp, value):
+        """Store one sample; timestamp is epoch seconds"""
+        i = self._count % self.capacity
+        t = np.datetime64(int(round(timestamp * 1000)), "ms")
+        self._times[i] = t
+        self._times[i + self.capacity] = t
+        self._values[i] = value
+        self._values[i + self.capacity] = value
+        self._count += 1
+
+    def window(self, n=None):
+        """Return (times, values) views of the latest n samples, oldest first"""
+        count = self._count
+        size = min(count, self.capacity)
+        if n is not None:
+            size = min(size, n)
+        end = count % self.capacity + self.capacity
+        return self._times[end - size:end], self._values[end - size:end]
+
+    def latest(self):
+        """Return the newest (timestamp, value) pair, or None if the buffer is empty"""
+        count = self._count
+        if count == 0:
+            return None
+        i = (count - 1) % self.capacity
+        return self._times[i], self._values[i]
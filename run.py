@@ -62,9 +62,11 @@ def main():
     """Main function to run the complete SCADA monitoring system"""
     parser = argparse.ArgumentParser(description="Run the SCADA monitoring system")
     parser.add_argument('--generate-data', action='store_true', help='Generate synthetic data')
+    parser.add_argument('--generate-fleet', action='store_true', help='Generate partitioned synthetic data for a fleet of sites')
     parser.add_argument('--simulate-sensors', action='store_true', help='Simulate sensor publishing')
     parser.add_argument('--monitor', action='store_true', help='Run the SCADA monitor')
     parser.add_argument('--dashboard', action='store_true', help='Run the dashboard')
+    parser.add_argument('--production', action='store_true', help='Serve the dashboard with gunicorn workers instead of the development server')
     parser.add_argument('--all', action='store_true', help='Run all components')
     
     args = parser.parse_args()
@@ -81,6 +83,9 @@ def main():
         if args.all or args.generate_data:
             data_gen = start_process("Data Generator", [sys.executable, "scada_data_generator.py"])
         
+        if args.generate_fleet:
+            fleet_gen = start_process("Fleet Generator", [sys.executable, "fleet_generator.py"])
+        
         if args.all or args.simulate_sensors:
             # Wait a moment to ensure data is generated
             if args.all or args.generate_data:
@@ -91,8 +96,11 @@ def main():
         if args.all or args.monitor:
             monitor = start_process("SCADA Monitor", [sys.executable, "scada_monitor.py"])
         
-        if args.all or args.dashboard:
-            dashboard = start_process("Dashboard", [sys.executable, "scada_dashboard.py"])
+        if args.all or args.dashboard or args.production:
+            if args.production:
+                dashboard = start_process("Dashboard", [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"])
+            else:
+                dashboard = start_process("Dashboard", [sys.executable, "scada_dashboard.py"])
             print(f"Dashboard running at http://localhost:{os.getenv('DASH_PORT', '8050')}")
         
         # Monitor outputs and process health
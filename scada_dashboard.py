@@ -5,57 +5,210 @@
 # http://www.apache.org/licenses/LICENSE-2.0
 
 import json
-import sqlite3
-import pandas as pd
+import datetime
+import numpy as np
+import importlib.util
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import paho.mqtt.client as mqtt
+from dash import dcc, html, dash_table
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import threading
+import time
 import os
 import sys
 
 # Import utility functions
-from utils import load_config, validate_config, connect_mqtt_with_retry, db_execute_with_retry
+from utils import load_config, validate_config
+from alerts import ALERT_FIELDS, query_alerts, alert_sensors
+from mqtt_transport import MQTTTransport
+from topic_router import TopicRouter, decode_reading, per_sensor_layout, sensor_filter, sensor_key
+from ring_buffer import SensorRingBuffer
+from shm_channel import SensorChannel
+from settings import channel_settings
+from export import register_export_route
+from asof import asof
+from clock import format_time
 
-# Initialize Dash app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Initialize Dash app (callback responses are gzip-compressed when flask-compress is installed)
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP],
+                compress=importlib.util.find_spec("flask_compress") is not None)
 
-# Global variable to store latest sensor readings
-latest_sensor_data = {}
+# Streaming bulk export of stored readings: GET /export?format=csv|jsonl|parquet&sensors=&start=&end=
+register_export_route(app.server)
+
+# Rolling history per sensor, filled only by the MQTT thread: {sensor_name: SensorRingBuffer}
+sensor_buffers = {}
+buffer_capacity = 3600
+
+# Set when the publisher reports by exception: sensors missing from a payload keep their last value
+carry_forward = False
+
+# The buffers can instead live in shared memory, written by the monitor (with its alert
+# episodes) or by dashboard_ingest.py
+shared_channel_name = None
+shared_channel = None
+# Guards swapping shared_channel between gunicorn request threads
+channel_lock = threading.Lock()
+# Channels replaced after a writer restart, closed once no request thread holds them
+retired_channels = []
+
+def use_shared_channel(name):
+    """Read sensor history from the named shared memory channel instead of an in-process MQTT listener"""
+    global shared_channel_name
+    shared_channel_name = name
+
+def close_retired_channels():
+    """Close replaced channels that no request thread is still reading. Call with channel_lock held"""
+    for index in reversed(range(len(retired_channels))):
+        channel = retired_channels[index]
+        # Referenced only by the list, this local and getrefcount's argument: nobody is reading it
+        if sys.getrefcount(channel) > 3:
+            continue
+        try:
+            channel.close()
+        except BufferError:
+            # Rings handed out earlier still hold views of the block; try again on a later call
+            continue
+        del retired_channels[index]
+
+def current_channel():
+    """The attached shared memory channel, or None (not configured, or its writer has not created it yet)"""
+    global shared_channel
+    with channel_lock:
+        if shared_channel is not None and shared_channel.stale:
+            # The writer restarted: attach to the new block, and close the old one once it is unused
+            retired_channels.append(shared_channel)
+            shared_channel = None
+        if retired_channels:
+            close_retired_channels()
+        if shared_channel is None and shared_channel_name is not None:
+            try:
+                shared_channel = SensorChannel.attach(shared_channel_name)
+            except (FileNotFoundError, ValueError):
+                # Not created yet, or created but its header not written yet (the writer is starting)
+                return None
+        return shared_channel
+
+def current_buffers():
+    """Return {sensor_name: ring buffer} from shared memory or the in-process listener"""
+    if shared_channel_name is None:
+        # Snapshot the dict items: the MQTT thread may add sensors concurrently
+        return dict(list(sensor_buffers.items()))
+    channel = current_channel()
+    return {} if channel is None else channel.buffers()
+
+def alert_sequence():
+    """Count of alert updates published by the monitor, or None when alerts are not in shared memory"""
+    channel = current_channel()
+    return None if channel is None else channel.alert_sequence
+
+def sensor_values_at(when):
+    """{sensor: latest value at or before `when`} across sensors sampled at different rates"""
+    readings = {}
+    for name, buffer in current_buffers().items():
+        times, values = buffer.window()
+        readings[name] = asof(times, values, [when])[0]
+    return readings
+
+def record_readings(payload):
+    """Append one MQTT payload to the per-sensor ring buffers"""
+    timestamp = payload.pop("timestamp", None)
+    if timestamp is None:
+        timestamp = time.time()
+    for name, value in payload.items():
+        if not isinstance(value, (int, float)):
+            continue
+        buffer = sensor_buffers.get(name)
+        if buffer is None:
+            buffer = sensor_buffers[name] = SensorRingBuffer(buffer_capacity)
+        buffer.append(timestamp, value)
+    if carry_forward:
+        for name, buffer in sensor_buffers.items():
+            if name not in payload and len(buffer):
+                buffer.append(timestamp, buffer.latest()[1])
 
 # MQTT Callback - Updates sensor data
 def on_message(client, userdata, message):
     try:
-        global latest_sensor_data
         payload = json.loads(message.payload.decode("utf-8"))
-        latest_sensor_data = payload  # Update global sensor data
+        record_readings(payload)
         print(f"Updated Sensor Data: {payload}")
     except Exception as e:
         print(f"Error processing MQTT message: {str(e)}")
 
+# MQTT Callback for per-sensor topics - the site and sensor come from the topic
+def on_sensor_message(client, userdata, message, sensor, site=None):
+    try:
+        value, timestamp = decode_reading(message.payload)
+        name = sensor_key(site, sensor)
+        if not isinstance(value, (int, float)):
+            return
+        buffer = sensor_buffers.get(name)
+        if buffer is None:
+            buffer = sensor_buffers[name] = SensorRingBuffer(buffer_capacity)
+        buffer.append(time.time() if timestamp is None else timestamp, value)
+    except Exception as e:
+        print(f"Error processing MQTT message: {str(e)}")
+
+def build_router(mqtt_config):
+    """Combined topic plus, with the per_sensor layout, every sensor of every site"""
+    router = TopicRouter()
+    router.add(mqtt_config["topic"], on_message)
+    if per_sensor_layout(mqtt_config):
+        router.add(sensor_filter(mqtt_config), on_sensor_message)
+    return router
+
 # Start MQTT Listener in a separate thread
 def start_mqtt_listener(mqtt_config):
     try:
-        client = connect_mqtt_with_retry(mqtt_config)
-        client.on_message = on_message
-        client.subscribe(mqtt_config["topic"])
-        print(f"Subscribed to MQTT topic: {mqtt_config['topic']}")
-        client.loop_forever()
+        router = build_router(mqtt_config)
+        transport = MQTTTransport(
+            mqtt_config,
+            role="dashboard",
+            subscriptions=router.filters(),
+            on_message=router.on_message
+        )
+        transport.run_forever()
     except Exception as e:
         print(f"MQTT listener error: {str(e)}")
 
-# Read alerts from the database
-def get_alerts(db_path="scada_alerts.db"):
-    try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql("SELECT * FROM alerts ORDER BY timestamp DESC LIMIT 10", conn)
-        conn.close()
-        return df
-    except sqlite3.Error as e:
-        print(f"Database error when reading alerts: {str(e)}")
-        return pd.DataFrame(columns=["timestamp", "alert_message"])
+# Alert history shown per table page
+alerts_page_size = 50
+# Newest episodes listed above the table when the monitor publishes alerts to shared memory
+live_alerts = 5
+alerts_db = "scada_alerts.db"
+
+def alerts_page(page, filters, state, db_path=alerts_db):
+    """Fetch one page of alert history for the table.
+
+    state remembers the keyset cursor at the start of every page visited so
+    far under the current filters; changing the filters starts over at page 0.
+    Returns (rows, page, page_count, state); page_count is None while more pages exist.
+    """
+    if not state or state.get("filters") != filters:
+        state = {"filters": filters, "cursors": [None]}
+        page = 0
+    cursors = state["cursors"]
+    # Pages can only be reached through the ones before them
+    page = min(page or 0, len(cursors) - 1)
+
+    start, end = filters.get("start"), filters.get("end")
+    if end:
+        # The date picker's end date is inclusive
+        end = (datetime.date.fromisoformat(end[:10]) + datetime.timedelta(days=1)).isoformat()
+    cursor = cursors[page]
+    rows, next_cursor = query_alerts(
+        db_path, limit=alerts_page_size, after=tuple(cursor) if cursor else None,
+        sensor=filters.get("sensor"), severity=filters.get("severity"),
+        start=start[:10] if start else None, end=end
+    )
+
+    del cursors[page + 1:]
+    if next_cursor is not None:
+        cursors.append(list(next_cursor))
+    page_count = None if next_cursor is not None else page + 1
+    return rows, page, page_count, state
 
 # Layout of the dashboard
 app.layout = dbc.Container([
@@ -68,8 +221,27 @@ app.layout = dbc.Container([
         ], width=6),
         
         dbc.Col([
-            html.H3("Active Alerts"),
-            html.Div(id="alerts-display", className="alert alert-danger", style={"height": "300px", "overflow-y": "scroll"})
+            html.H3("Alerts"),
+            html.Div(id="alerts-live"),
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id="alerts-sensor", placeholder="Sensor"), width=4),
+                dbc.Col(dcc.Dropdown(id="alerts-severity", placeholder="Severity",
+                                     options=["info", "warning", "critical"]), width=3),
+                dbc.Col(dcc.DatePickerRange(id="alerts-dates", clearable=True), width=5)
+            ], className="mb-2"),
+            dash_table.DataTable(
+                id="alerts-table",
+                columns=[{"name": field, "id": field} for field in ALERT_FIELDS if field != "id"],
+                page_action="custom",
+                page_current=0,
+                page_size=alerts_page_size,
+                # Only the visible rows of a page are rendered
+                virtualization=True,
+                fixed_rows={"headers": True},
+                style_table={"height": "300px", "overflowY": "auto"},
+                style_cell={"textAlign": "left", "whiteSpace": "nowrap"}
+            ),
+            dcc.Store(id="alerts-cursors")
         ], width=6)
     ], className="mb-4"),
 
@@ -77,6 +249,7 @@ app.layout = dbc.Container([
         dbc.Col([
             html.H3("Sensor Values Over Time"),
             dcc.Graph(id='sensor-graph'),
+            html.Div(id="sensor-snapshot", className="text-muted"),
             dcc.Interval(id='graph-update', interval=5000, n_intervals=0)
         ], width=12)
     ], className="mb-4"),
@@ -90,21 +263,79 @@ app.layout = dbc.Container([
     Input("update-interval", "n_intervals")
 )
 def update_sensor_display(n):
-    global latest_sensor_data
-    if latest_sensor_data:
-        return html.Ul([html.Li(f"{key}: {value}") for key, value in latest_sensor_data.items()])
+    readings = [(name, buffer.latest()) for name, buffer in current_buffers().items()]
+    readings = [(name, latest[1]) for name, latest in readings if latest is not None]
+    if readings:
+        return html.Ul([html.Li(f"{name}: {value}") for name, value in readings])
     return "Waiting for sensor data..."
 
-# Callback to update alerts
+# Callback to show every sensor's value at the time of a clicked point
+@app.callback(
+    Output("sensor-snapshot", "children"),
+    Input("sensor-graph", "clickData")
+)
+def update_snapshot(click_data):
+    if not click_data or not click_data.get("points"):
+        return "Click a point on the graph to see every sensor's value at that time."
+    when = np.datetime64(click_data["points"][0]["x"], "ms")
+    readings = [(name, value) for name, value in sensor_values_at(when).items() if not np.isnan(value)]
+    return html.Span(f"As of {when}: " + ", ".join(f"{name}: {value:g}" for name, value in readings))
+
+# Callback to update the alert history table (refreshes with new alerts and on paging/filtering)
+@app.callback(
+    Output("alerts-table", "data"),
+    Output("alerts-table", "page_current"),
+    Output("alerts-table", "page_count"),
+    Output("alerts-cursors", "data"),
+    Input("update-interval", "n_intervals"),
+    Input("alerts-table", "page_current"),
+    Input("alerts-sensor", "value"),
+    Input("alerts-severity", "value"),
+    Input("alerts-dates", "start_date"),
+    Input("alerts-dates", "end_date"),
+    State("alerts-cursors", "data")
+)
+def update_alerts(n, page_current, sensor, severity, start_date, end_date, state):
+    sequence = alert_sequence()
+    if (dash.ctx.triggered_id == "update-interval" and sequence is not None
+            and state and state.get("sequence") == sequence):
+        # The monitor has published no alert changes since this page was read: skip the database
+        raise PreventUpdate
+    filters = {"sensor": sensor, "severity": severity, "start": start_date, "end": end_date}
+    rows, page, page_count, state = alerts_page(page_current, filters, state)
+    state["sequence"] = sequence
+    return rows, page, page_count, state
+
+# Alert sequence the sensor filter options were last read at (per worker)
+alert_sensors_sequence = -1
+
+# Callback to offer the sensors that have alerts as filter options
 @app.callback(
-    Output("alerts-display", "children"),
+    Output("alerts-sensor", "options"),
+    Input("graph-update", "n_intervals")
+)
+def update_alert_sensors(n):
+    global alert_sensors_sequence
+    sequence = alert_sequence()
+    if sequence is not None and sequence == alert_sensors_sequence:
+        raise PreventUpdate
+    alert_sensors_sequence = sequence
+    return alert_sensors(alerts_db)
+
+# Callback to show the newest alert episodes straight from the monitor's shared memory channel
+@app.callback(
+    Output("alerts-live", "children"),
     Input("update-interval", "n_intervals")
 )
-def update_alerts(n):
-    df = get_alerts()
-    if df.empty:
-        return "No recent alerts."
-    return html.Ul([html.Li(f"{row['timestamp']} - {row['alert_message']}") for _, row in df.iterrows()])
+def update_live_alerts(n):
+    channel = current_channel()
+    if channel is None or not channel.alert_sequence:
+        return None
+    return html.Ul([
+        html.Li(f"{format_time(alert['last_seen'])} {alert['sensor']} {alert['rule']} "
+                f"({alert['severity']}, {alert['status']}, x{alert['count']})")
+        for alert in channel.recent_alerts(live_alerts)
+    ], className="mb-2")
 
 # Callback to update sensor graph
 @app.callback(
@@ -113,12 +344,20 @@ def update_alerts(n):
 )
 def update_graph(n):
     try:
-        # Read sensor data from database
-        conn = sqlite3.connect("sensor_data.db")
-        df = pd.read_sql("SELECT * FROM sensor_data ORDER BY timestamp DESC LIMIT 100", conn)
-        conn.close()
+        # Read straight from the in-memory ring buffers; no database round-trip
+        traces = []
+        for name, buffer in current_buffers().items():
+            times, values = buffer.window()
+            if len(times) == 0:
+                continue
+            traces.append({
+                'x': times,
+                'y': values,
+                'name': name,
+                'mode': 'lines+markers'
+            })
         
-        if df.empty:
+        if not traces:
             # Return empty figure if no data
             return {
                 'data': [],
@@ -127,21 +366,6 @@ def update_graph(n):
                 }
             }
         
-        # Prepare data for plotting
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Create traces for each sensor
-        traces = []
-        for column in df.columns:
-            if column != 'timestamp' and column != 'id':
-                traces.append({
-                    'x': df['timestamp'],
-                    'y': df[column],
-                    'name': column,
-                    'mode': 'lines+markers'
-                })
-        
         return {
             'data': traces,
             'layout': {
@@ -170,15 +394,24 @@ if __name__ == "__main__":
             print("Configuration validation failed. Exiting.")
             sys.exit(1)
         
-        # Start MQTT listener in a separate thread
-        mqtt_thread = threading.Thread(
-            target=start_mqtt_listener, 
-            args=(config.get("mqtt", {}),),
-            daemon=True
-        )
-        mqtt_thread.start()
+        # Size the per-sensor history buffers (memory stays fixed however long the dashboard runs)
+        buffer_capacity = config.get("dashboard", {}).get("buffer_capacity", buffer_capacity)
+        carry_forward = config.get("publisher", {}).get("report_by_exception", False)
+        
+        shared = channel_settings(config)
+        if shared["source"] == "monitor":
+            # Live readings and alerts come from the monitor's shared memory channel
+            use_shared_channel(shared["name"])
+        else:
+            # Start MQTT listener in a separate thread
+            mqtt_thread = threading.Thread(
+                target=start_mqtt_listener, 
+                args=(config.get("mqtt", {}),),
+                daemon=True
+            )
+            mqtt_thread.start()
         
-        # Run Dash app
+        # Development server; use gunicorn with gunicorn.conf.py (see wsgi.py) in production
         app.run_server(debug=True, host='0.0.0.0', port=8050)
     except Exception as e:
         print(f"Error starting dashboard: {str(e)}")
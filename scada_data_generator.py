@@ -4,17 +4,23 @@
 # You may obtain a copy of the License at
 # http://www.apache.org/licenses/LICENSE-2.0
 
-import json
 import numpy as np
 import pandas as pd
-import sqlite3
 import os
 import sys
-from timesynth import TimeSampler, signals, noise
 import random
 
 # Import utility functions
 from utils import load_config, validate_config
+from dependency_graph import DependencyGraph
+from signal_model import regular_time_points, sinusoid, StreamingGenerator
+from bulk_writer import bulk_load, bulk_load_dataframe
+from compact_frame import CompactFrame
+from asof import rule_onsets
+from settings import build_settings
+
+# Samples generated per block in compact mode (the float64 scratch space before conversion)
+COMPACT_BLOCK = 65536
 
 # Function to generate synthetic sensor data
 def generate_sensor_data(sensor_config, time_points):
@@ -31,10 +37,8 @@ def generate_sensor_data(sensor_config, time_points):
         # Generate base signal with drift
         signal = base_value + drift_rate * np.arange(len(time_points))
         
-        # Add sinusoidal pattern
-        sine_signal = signals.Sinusoidal(frequency=0.1, amplitude=5)
-        sine_wave, _, _ = sine_signal.generate(time_points)
-        signal += sine_wave
+        # Add sinusoidal pattern (shared with the streaming generator)
+        signal += sinusoid(time_points)
 
         # Add Gaussian noise
         signal += np.random.normal(0, noise_std, len(signal))
@@ -61,16 +65,79 @@ def generate_sensor_data(sensor_config, time_points):
 # Function to apply dependencies between sensors
 def apply_sensor_dependencies(sensor_data, dependencies):
     try:
-        for dependent, info in dependencies.items():
-            base_sensor = info["depends_on"]
-            factor = info["correlation_factor"]
-            if base_sensor in sensor_data and dependent in sensor_data:
-                sensor_data[dependent] += sensor_data[base_sensor] * factor  # Apply correlation
-        return sensor_data
+        # Evaluated in topological order, one matrix multiply per level and (lag, transfer) group
+        return DependencyGraph(dependencies).apply(sensor_data)
     except Exception as e:
         print(f"Error applying sensor dependencies: {str(e)}")
         return sensor_data
 
+# Function to generate straight into one preallocated compact buffer
+def generate_compact(config, sampling_config):
+    """Generate every sensor into a CompactFrame (sampling.compact), a block of samples at a time.
+
+    Uses the streaming signal model, so dependencies are applied per block in
+    float64 and only the converted values are kept. Times are start + i *
+    time_interval and are never stored.
+    """
+    sensors = config["sensors"]
+    num_points = sampling_config["num_points"]
+    frame = CompactFrame([sensor["name"] for sensor in sensors], num_points, sampling_config["time_interval"],
+                         dtype=sampling_config.get("dtype", "float32"),
+                         resolution=sampling_config.get("resolution"),
+                         offset={sensor["name"]: sensor.get("base_value", 0.0) for sensor in sensors})
+    generator = StreamingGenerator(sensors, config.get("sensor_dependencies"),
+                                   time_interval=sampling_config["time_interval"])
+    for row in range(0, num_points, COMPACT_BLOCK):
+        _, block = generator.next_block(min(COMPACT_BLOCK, num_points - row))
+        frame.write(row, block)
+
+    for name, count in frame.saturated.items():
+        if count:
+            print(f"Warning: {count} {name} value(s) beyond the int16 range at resolution "
+                  f"{sampling_config.get('resolution', {}).get(name, 0.01)} were stored as 9999")
+    return frame
+
+# Function to generate each sensor at its own sampling rate
+def generate_multirate(config, sampling_config):
+    """{sensor: (times, values)}, each sensor sampled every sample_interval seconds (default time_interval).
+
+    Every series covers the same span, num_points * time_interval, at its own
+    rate, so nothing is padded to the fastest sensor. drift_rate stays per
+    time_interval. Dependent sensors use each parent's value as of their own
+    sample times.
+    """
+    time_interval = sampling_config["time_interval"]
+    duration = sampling_config["num_points"] * time_interval
+    series = {}
+    for sensor in config["sensors"]:
+        interval = sensor.get("sample_interval", time_interval)
+        model = dict(sensor, drift_rate=sensor.get("drift_rate", 0.0) * interval / time_interval)
+        times, values = StreamingGenerator([model], time_interval=interval).next_block(max(1, round(duration / interval)))
+        series[sensor["name"]] = (times, values[0])
+
+    dependencies = config.get("sensor_dependencies", {})
+    if dependencies:
+        DependencyGraph(dependencies).apply_series(series)
+    return series
+
+# Function to check failure conditions on sensors sampled at different rates
+def check_series_failures(series, failure_conditions):
+    """Alert for each FailureCondition whose sensors are all above their thresholds at the same time.
+
+    Readings are compared as of every sample time of the rule's sensors; the
+    alert is stamped with the first time the rule held.
+    """
+    alerts = []
+    try:
+        for condition in failure_conditions:
+            onsets = rule_onsets(series, condition.thresholds)
+            if len(onsets):
+                alerts.append({"Time": onsets[0], "Alert": condition.alert_message})
+    except Exception as e:
+        print(f"Error checking failure conditions: {str(e)}")
+
+    return alerts
+
 # Function to check failure conditions
 def check_failures(sensor_data, failure_conditions):
     alerts = []
@@ -92,13 +159,14 @@ def check_failures(sensor_data, failure_conditions):
                 
                 if "above" in criteria:
                     # Check if any value is above the threshold
-                    above_threshold = (sensor_data[sensor] > criteria["above"]).any()
+                    above_threshold = (np.asarray(sensor_data[sensor]) > criteria["above"]).any()
                     if not above_threshold:
                         condition_met = False
                         break
 
             if condition_met:
-                alerts.append({"Time": sensor_data["Time"].iloc[-1], "Alert": alert_message})
+                times = sensor_data["Time"]
+                alerts.append({"Time": times.iloc[-1] if hasattr(times, "iloc") else times[-1], "Alert": alert_message})
     except Exception as e:
         print(f"Error checking failure conditions: {str(e)}")
     
@@ -109,9 +177,14 @@ def save_data(df, alerts, output_config):
     try:
         file_name = output_config["file_name"]
         output_format = output_config["format"]
+        # A CompactFrame is written straight from its buffer, a chunk of rows at a time
+        compact = isinstance(df, CompactFrame)
 
         if output_format == "csv":
-            df.to_csv(f"{file_name}.csv", index=False)
+            if compact:
+                df.write_csv(f"{file_name}.csv")
+            else:
+                df.to_csv(f"{file_name}.csv", index=False)
             print(f"Data saved to {file_name}.csv")
             
             # Save alerts to a separate CSV if there are any
@@ -120,7 +193,10 @@ def save_data(df, alerts, output_config):
                 print(f"Alerts saved to {file_name}_alerts.csv")
                 
         elif output_format == "json":
-            df.to_json(f"{file_name}.json", orient="records")
+            if compact:
+                df.write_json(f"{file_name}.json")
+            else:
+                df.to_json(f"{file_name}.json", orient="records")
             print(f"Data saved to {file_name}.json")
             
             # Save alerts to a separate JSON if there are any
@@ -129,13 +205,16 @@ def save_data(df, alerts, output_config):
                 print(f"Alerts saved to {file_name}_alerts.json")
                 
         elif output_format == "database":
-            conn = sqlite3.connect(f"{file_name}.db")
-            df.to_sql("sensor_data", conn, if_exists="replace", index=False)
+            # Typed schema, load-time pragmas, chunked executemany and a time index built after the load
+            chunk_size = output_config.get("chunk_size", 100000)
+            if compact:
+                bulk_load(f"{file_name}.db", "sensor_data", df.columns(), index_columns=["Time"], chunk_size=chunk_size)
+            else:
+                bulk_load_dataframe(f"{file_name}.db", "sensor_data", df, index_columns=["Time"], chunk_size=chunk_size)
             
             if alerts:
-                pd.DataFrame(alerts).to_sql("alerts", conn, if_exists="replace", index=False)
+                bulk_load_dataframe(f"{file_name}.db", "alerts", pd.DataFrame(alerts), index_columns=["Time"])
                 
-            conn.close()
             print(f"Data saved to {file_name}.db (SQLite)")
         else:
             print(f"Unsupported output format: {output_format}")
@@ -146,6 +225,63 @@ def save_data(df, alerts, output_config):
         print(f"Error saving data: {str(e)}")
         return False
 
+# Function to save sensors sampled at different rates, each at its native rate
+def save_series(series, alerts, output_config):
+    """Write {sensor: (times, values)} in long format (Time, sensor, value), one series after another"""
+    try:
+        file_name = output_config["file_name"]
+        output_format = output_config["format"]
+
+        if output_format in ("csv", "json"):
+            with open(f"{file_name}.{output_format}", "w", newline="") as handle:
+                if output_format == "json":
+                    handle.write("[")
+                written = False
+                for index, (name, (times, values)) in enumerate(series.items()):
+                    chunk = pd.DataFrame({"Time": times, "sensor": name, "value": values})
+                    if output_format == "csv":
+                        chunk.to_csv(handle, index=False, header=index == 0)
+                    elif len(chunk):
+                        # One JSON array for the whole file
+                        handle.write(("," if written else "") + chunk.to_json(orient="records")[1:-1])
+                        written = True
+                if output_format == "json":
+                    handle.write("]")
+            print(f"Data saved to {file_name}.{output_format}")
+
+            if alerts:
+                alerts_file = f"{file_name}_alerts.{output_format}"
+                if output_format == "csv":
+                    pd.DataFrame(alerts).to_csv(alerts_file, index=False)
+                else:
+                    pd.DataFrame(alerts).to_json(alerts_file, orient="records")
+                print(f"Alerts saved to {alerts_file}")
+
+        elif output_format == "database":
+            names = list(series)
+            columns = {
+                "Time": np.concatenate([series[name][0] for name in names]),
+                "sensor": np.repeat(np.array(names, dtype=object), [len(series[name][0]) for name in names]),
+                "value": np.concatenate([series[name][1] for name in names])
+            }
+            # Native-rate counterpart of sensor_data (epoch Time, no site or quality, so not the monitor's
+            # sensor_readings schema); range reads go through the (sensor, Time) index
+            bulk_load(f"{file_name}.db", "sensor_series", columns, index_columns=[("sensor", "Time")],
+                      chunk_size=output_config.get("chunk_size", 100000))
+
+            if alerts:
+                bulk_load_dataframe(f"{file_name}.db", "alerts", pd.DataFrame(alerts), index_columns=["Time"])
+
+            print(f"Data saved to {file_name}.db (SQLite)")
+        else:
+            print(f"Unsupported output format: {output_format}")
+            return False
+
+        return True
+    except Exception as e:
+        print(f"Error saving data: {str(e)}")
+        return False
+
 # Main function
 def main(config_file="config.json"):
     # Allow override via environment variable
@@ -165,25 +301,40 @@ def main(config_file="config.json"):
         num_points = sampling_config["num_points"]
         time_interval = sampling_config["time_interval"]
         
-        time_sampler = TimeSampler(stop_time=num_points * time_interval)
-        time_points = time_sampler.sample_regular_time(num_points=num_points)
+        output_config = config.get("output", {"format": "csv", "file_name": "synthetic_scada_data"})
+
+        if any("sample_interval" in sensor for sensor in config["sensors"]):
+            # Sensors at their own rates: stored long-format at native rate, never on a shared grid
+            series = generate_multirate(config, sampling_config)
+            alerts = check_series_failures(series, build_settings(config).failure_conditions)
+            if not save_series(series, alerts, output_config):
+                print("Failed to save data")
+                return 1
+            return 0
 
-        # Generate sensor data
-        sensor_data = {"Time": time_points}
-        for sensor in config["sensors"]:
-            sensor_data[sensor["name"]] = generate_sensor_data(sensor, time_points)
+        if sampling_config.get("compact", False):
+            # One preallocated buffer, implicit time axis, no DataFrame copy
+            df = generate_compact(config, sampling_config)
+            print(f"Generated {num_points} point(s) x {len(df.names)} sensor(s) as {df.data.dtype} "
+                  f"({df.nbytes / 2**20:.1f} MiB)")
+        else:
+            time_points = regular_time_points(num_points, stop_time=num_points * time_interval)
 
-        # Apply sensor dependencies
-        sensor_data = apply_sensor_dependencies(sensor_data, config.get("sensor_dependencies", {}))
+            # Generate sensor data
+            sensor_data = {"Time": time_points}
+            for sensor in config["sensors"]:
+                sensor_data[sensor["name"]] = generate_sensor_data(sensor, time_points)
 
-        # Convert to DataFrame
-        df = pd.DataFrame(sensor_data)
+            # Apply sensor dependencies
+            sensor_data = apply_sensor_dependencies(sensor_data, config.get("sensor_dependencies", {}))
+
+            # Convert to DataFrame
+            df = pd.DataFrame(sensor_data)
 
         # Check for failure conditions
         alerts = check_failures(df, config.get("failure_conditions", []))
 
         # Save output
-        output_config = config.get("output", {"format": "csv", "file_name": "synthetic_scada_data"})
         if not save_data(df, alerts, output_config):
             print("Failed to save data")
             return 1
@@ -6,38 +6,36 @@
 
 import json
 import time
-import sqlite3
-import paho.mqtt.client as mqtt
-import smtplib
-import ssl
-import pandas as pd
 from collections import deque
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import sys
+from functools import partial
 
 # Import utility functions
-from utils import load_config, validate_config, connect_mqtt_with_retry, db_execute_with_retry
+from utils import db_execute_with_retry, db_execute_batch
+from mqtt_transport import MQTTTransport
+from settings import DriftSettings, ConfigWatcher, channel_settings, compile_drift_conditions, load_settings
+from alerts import Alert, AlertEngine, ensure_alert_columns, ensure_alert_indexes
+from deadband import CarryForward
+from detectors import create_detector
+from data_quality import GOOD, QualityGate
+from clock import SystemClock, create_clock, format_time
+from topic_router import TopicRouter, decode_reading, per_sensor_layout, sensor_filter, sensor_key
 
 # Initialize database
 def initialize_database(db_name="scada_alerts.db"):
-    try:
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                alert_message TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
-        print(f"Database {db_name} initialized successfully")
-    except sqlite3.Error as e:
-        print(f"Error initializing database: {str(e)}")
+    query = """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            alert_message TEXT
+        )
+    """
+    # Older databases get the alert episode columns and history indexes added in place
+    if not (db_execute_with_retry(db_name, query) and ensure_alert_columns(db_name) and ensure_alert_indexes(db_name)):
+        print(f"Error initializing database: {db_name}")
         return False
+    print(f"Database {db_name} initialized successfully")
     return True
 
 # Log alerts to the database
@@ -51,6 +49,12 @@ def log_alert(alert_message, db_name="scada_alerts.db"):
 
 # Send email notifications
 def send_email_alert(alert_message, email_config):
+    # SMTP/TLS/MIME modules are only loaded once the first alert email goes out
+    import smtplib
+    import ssl
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     sender_email = email_config["sender_email"]
     receiver_email = email_config["receiver_email"]
     smtp_server = email_config["smtp_server"]
@@ -80,56 +84,109 @@ def send_email_alert(alert_message, email_config):
 # Track historical sensor data for drift detection
 sensor_history = {}
 
-# Check for drift conditions
-def check_drift_conditions(sensor_data, drift_conditions):
+# Streaming detectors for sensors whose drift_conditions select one: {sensor: (detector spec, Detector)}
+sensor_detectors = {}
+
+# Detectors accumulate evidence on every reading, so report-by-exception gaps are replayed up to this many ticks
+MAX_DETECTOR_GAP = 1800
+
+def detect_change(sensor, value, spec, alerts, evaluated, now=None):
+    """Feed one reading to the sensor's detector and record its verdict"""
+    entry = sensor_detectors.get(sensor)
+    if entry is None or entry[0] != spec:
+        # New sensor, or the detector settings changed on reload: learn a fresh baseline
+        entry = sensor_detectors[sensor] = (spec, create_detector(spec))
+    detector = entry[1]
+    alarm = detector.update(value)
+    if not detector.ready:
+        return
+
+    rule = spec["type"]
+    evaluated.append((sensor, rule))
+    if alarm:
+        message = f"{format_time(time.time() if now is None else now)} - WARNING: {sensor} {detector.label} detected! (Value: {value}, Statistic: {detector.statistic:.2f})"
+        alerts.append(Alert(sensor, rule, message, value))
+
+# Evaluate drift conditions; returns the breaches as Alerts and the (sensor, rule) pairs that were checked.
+# now is the reading's time for the alert messages (default: the wall clock)
+def evaluate_drift(sensor_data, drift_conditions, now=None):
     global sensor_history
     alerts = []
+    evaluated = []
+    stamp = format_time(time.time() if now is None else now)
+
+    # Accept raw config dicts too; the monitor itself passes precompiled DriftSettings
+    if drift_conditions and not isinstance(next(iter(drift_conditions.values())), DriftSettings):
+        drift_conditions = compile_drift_conditions(drift_conditions)
 
     for sensor, conditions in drift_conditions.items():
         value = sensor_data.get(sensor, None)
         if value is None:
             continue
 
-        # Initialize rolling history
-        if sensor not in sensor_history:
-            sensor_history[sensor] = deque(maxlen=conditions["window_size"])
+        # A detector from detectors.py replaces the rolling-average test
+        if conditions.detector is not None:
+            detect_change(sensor, value, conditions.detector, alerts, evaluated, now)
+
+        window_size = conditions.window_size
+        history = sensor_history.get(sensor)
+
+        # Initialize rolling history, or resize it after a live config change (keeping the newest values)
+        if history is None or history.maxlen != window_size:
+            history = sensor_history[sensor] = deque(history or (), maxlen=window_size)
 
         # Add new value to history
-        sensor_history[sensor].append(value)
+        history.append(value)
 
-        if len(sensor_history[sensor]) < conditions["window_size"]:
+        if len(history) < window_size:
             continue  # Not enough data to evaluate drift
 
-        # Compute rolling average
-        rolling_avg = sum(sensor_history[sensor]) / len(sensor_history[sensor])
+        if conditions.detector is None:
+            # Compute rolling average
+            rolling_avg = sum(history) / len(history)
+
+            # Check for deviation
+            evaluated.append((sensor, "drift"))
+            if abs(value) > conditions.deviation_factor * rolling_avg:
+                message = f"{stamp} - WARNING: {sensor} sensor drift detected! (Value: {value}, Avg: {rolling_avg})"
+                alerts.append(Alert(sensor, "drift", message, value))
+
+        # Check for abnormal rate of change (optional when a detector is configured)
+        if len(history) > 1 and conditions.rate_of_change != float("inf"):
+            evaluated.append((sensor, "rate_of_change"))
+            rate_of_change = abs(history[-1] - history[-2])
+            if rate_of_change > conditions.rate_of_change:
+                message = f"{stamp} - WARNING: {sensor} abnormal rate of change detected! (Rate: {rate_of_change})"
+                alerts.append(Alert(sensor, "rate_of_change", message, value))
 
-        # Check for deviation
-        if abs(value) > conditions["deviation_factor"] * rolling_avg:
-            alerts.append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - WARNING: {sensor} sensor drift detected! (Value: {value}, Avg: {rolling_avg})")
+    return alerts, evaluated
 
-        # Check for abnormal rate of change
-        if len(sensor_history[sensor]) > 1:
-            rate_of_change = abs(sensor_history[sensor][-1] - sensor_history[sensor][-2])
-            if rate_of_change > conditions["rate_of_change"]:
-                alerts.append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - WARNING: {sensor} abnormal rate of change detected! (Rate: {rate_of_change})")
+# Check for drift conditions
+def check_drift_conditions(sensor_data, drift_conditions):
+    alerts, _ = evaluate_drift(sensor_data, drift_conditions)
+    return [alert.message for alert in alerts]
 
-    return alerts
+def format_timestamp(timestamp=None):
+    """Stored timestamp text for an epoch reading time (now if the publisher sent none)"""
+    if timestamp is None:
+        return format_time(time.time())
+    if isinstance(timestamp, (int, float)):
+        return format_time(timestamp)
+    return timestamp
 
 # Store sensor data in database
-def store_sensor_data(sensor_data, db_name="sensor_data.db"):
+# Databases whose sensor_data timestamp index has been created by this process
+data_tables = set()
+
+def store_sensor_data(sensor_data, db_name="sensor_data.db", timestamp=None):
     try:
-        # Add timestamp
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        # Add timestamp (use the reading's original epoch time when the publisher provided one)
+        timestamp = format_timestamp(timestamp)
         data_with_timestamp = {"timestamp": timestamp, **sensor_data}
         
-        # Connect to database
-        conn = sqlite3.connect(db_name)
-        
         # Create table if it doesn't exist
-        cursor = conn.cursor()
         columns = ["timestamp TEXT"] + [f"{key} REAL" for key in sensor_data.keys()]
         create_table_sql = f"CREATE TABLE IF NOT EXISTS sensor_data (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(columns)})"
-        cursor.execute(create_table_sql)
         
         # Insert data
         columns = list(data_with_timestamp.keys())
@@ -137,76 +194,261 @@ def store_sensor_data(sensor_data, db_name="sensor_data.db"):
         values = [data_with_timestamp[col] for col in columns]
         
         insert_sql = f"INSERT INTO sensor_data ({', '.join(columns)}) VALUES ({placeholders})"
-        cursor.execute(insert_sql, values)
         
-        conn.commit()
-        conn.close()
+        # All statements go through the pooled connection in one transaction. The timestamp
+        # index (for export.py's time-range reads) is created here so readers never write
+        statements = [(create_table_sql, ())]
+        if db_name not in data_tables:
+            statements.append(("CREATE INDEX IF NOT EXISTS idx_sensor_data_timestamp ON sensor_data (timestamp)", ()))
+        statements.append((insert_sql, values))
+        if not db_execute_batch(db_name, statements):
+            return False
+        data_tables.add(db_name)
         return True
     except Exception as e:
         print(f"Error storing sensor data: {str(e)}")
         return False
 
+# Databases whose sensor_readings table has been created by this process
+readings_tables = set()
+
+# Store one reading from a per-sensor topic in the long-format table, partitioned by (site, sensor)
+def store_sensor_reading(site, sensor, value, db_name="sensor_data.db", timestamp=None, quality=GOOD):
+    statements = []
+    if db_name not in readings_tables:
+        statements += [
+            ("CREATE TABLE IF NOT EXISTS sensor_readings (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, site TEXT, sensor TEXT, value REAL, quality INTEGER DEFAULT 0)", ()),
+            ("CREATE INDEX IF NOT EXISTS idx_sensor_readings_partition ON sensor_readings (site, sensor, timestamp)", ()),
+            # Time-range exports across every series (export.py --table sensor_readings)
+            ("CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp ON sensor_readings (timestamp)", ())
+        ]
+    statements.append(("INSERT INTO sensor_readings (timestamp, site, sensor, value, quality) VALUES (?, ?, ?, ?, ?)",
+                       (format_timestamp(timestamp), site, sensor, value, quality)))
+    if not db_execute_batch(db_name, statements):
+        return False
+    readings_tables.add(db_name)
+    return True
+
+# Keep readings the quality gate flagged (stored as NULL in sensor_data) with their raw value and quality code
+def store_quality_flags(flagged, db_name="sensor_data.db", timestamp=None):
+    timestamp = format_timestamp(timestamp)
+    statements = [
+        ("CREATE TABLE IF NOT EXISTS reading_quality (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, sensor TEXT, value REAL, quality INTEGER)", ()),
+        ("CREATE INDEX IF NOT EXISTS idx_reading_quality_sensor ON reading_quality (sensor, timestamp)", ())
+    ]
+    statements += [("INSERT INTO reading_quality (timestamp, sensor, value, quality) VALUES (?, ?, ?, ?)",
+                    (timestamp, sensor, value, code)) for sensor, (value, code) in flagged.items()]
+    return db_execute_batch(db_name, statements)
+
+def raise_alerts(userdata, drift_alerts, evaluated, reading_time):
+    # Repeated breaches are folded into open episodes; only a new episode is emailed
+    opened = userdata["alert_engine"].process(drift_alerts, evaluated, reading_time)
+    for episode in opened:
+        if userdata.get("email_config"):
+            send_email_alert(episode.message, userdata["email_config"])
+
+def max_gap_for(conditions):
+    """Report-by-exception ticks worth replaying for one sensor's drift conditions"""
+    return conditions.window_size if conditions.detector is None else MAX_DETECTOR_GAP
+
+# Used when the caller's userdata has no clock
+system_clock = SystemClock()
+
 # MQTT Callback Function
 def on_message(client, userdata, message):
     try:
         payload = json.loads(message.payload.decode("utf-8"))
         print(f"Received Data: {payload}")
-        
-        # Store sensor data in database
-        store_sensor_data(payload)
-        
-        # Check for drift conditions
-        drift_alerts = check_drift_conditions(payload, userdata["drift_conditions"])
-        for alert in drift_alerts:
-            log_alert(alert)
-            if userdata.get("email_config"):
-                send_email_alert(alert, userdata["email_config"])
+        process_payload(payload, userdata)
     except Exception as e:
         print(f"Error processing message: {str(e)}")
 
+def process_payload(payload, userdata):
+    """Run one decoded reading through quality checks, storage, drift detection and alerting"""
+    # Event time: readings replayed from the publisher's spool or by replay.py carry their original time
+    clock = userdata.get("clock") or system_clock
+    timestamp = clock.observe(payload.pop("timestamp", None))
+    drift_conditions = userdata["settings"].drift_conditions
+    sensor_db = userdata.get("sensor_db", "sensor_data.db")
+
+    # Corrupted readings are kept out of sensor_data and the drift windows, and recorded with their quality code instead.
+    # Screened on arrival with scalar checks so nothing waits for a batch to fill
+    flagged = {}
+    quality_gate = userdata.get("quality_gate")
+    if quality_gate is not None:
+        payload, flagged = quality_gate.screen(payload)
+        if flagged:
+            store_quality_flags(flagged, sensor_db, timestamp=timestamp)
+
+    # Report-by-exception payloads only carry the sensors that changed: carry the
+    # others forward and replay skipped ticks so drift windows keep their time span
+    readings = [(timestamp, payload)]
+    carry_forward = userdata.get("carry_forward")
+    if carry_forward is not None:
+        max_gap = max((max_gap_for(conditions) for conditions in drift_conditions.values()), default=0)
+        gap_readings, reading = carry_forward.fill(payload, timestamp, max_gap)
+        readings = gap_readings + [(timestamp, reading)]
+
+    # Store sensor data in database (flagged sensors as NULL)
+    store_sensor_data({**readings[-1][1], **dict.fromkeys(flagged)}, sensor_db, timestamp=timestamp)
+    if userdata.get("block_store") is not None:
+        userdata["block_store"].append_reading(payload, timestamp)
+
+    for reading_time, reading in readings:
+        # Check for drift conditions (read through the live settings so reloads take effect)
+        drift_alerts, evaluated = evaluate_drift(reading, drift_conditions, reading_time)
+        raise_alerts(userdata, drift_alerts, evaluated, reading_time)
+
+    # Hand the screened reading to the dashboard through shared memory
+    if userdata.get("channel") is not None:
+        userdata["channel"].record({**readings[-1][1], "timestamp": timestamp})
+
+# Per-sensor topic callback: the router has already resolved the site and sensor from the topic
+def on_sensor_message(client, userdata, message, sensor, site=None):
+    try:
+        value, timestamp = decode_reading(message.payload)
+        timestamp = (userdata.get("clock") or system_clock).observe(timestamp)
+        sensor_db = userdata.get("sensor_db", "sensor_data.db")
+        # Drift state, alerts and block storage are kept per site
+        key = sensor_key(site, sensor)
+
+        quality = GOOD
+        quality_gate = userdata.get("quality_gate")
+        if quality_gate is not None:
+            _, flagged = quality_gate.screen({sensor: value}, keys={sensor: key})
+            if flagged:
+                quality = flagged[sensor][1]
+
+        store_sensor_reading(site, sensor, value, sensor_db, timestamp=timestamp, quality=quality)
+        if quality != GOOD:
+            return
+        if userdata.get("block_store") is not None:
+            userdata["block_store"].append_reading({key: value}, timestamp)
+
+        conditions = userdata["settings"].drift_conditions.get(sensor)
+        if conditions is not None:
+            readings = [(timestamp, value)]
+            carry_forward = userdata.get("sensor_carry")
+            if carry_forward is not None:
+                # Each sensor is its own report-by-exception stream: replay its skipped ticks
+                if key not in carry_forward:
+                    carry_forward[key] = CarryForward(userdata["interval"])
+                gap_readings, _ = carry_forward[key].fill({key: value}, timestamp, max_gap_for(conditions))
+                readings = [(gap_time, gap[key]) for gap_time, gap in gap_readings] + readings
+
+            for reading_time, reading in readings:
+                drift_alerts, evaluated = evaluate_drift({key: reading}, {key: conditions}, reading_time)
+                raise_alerts(userdata, drift_alerts, evaluated, reading_time)
+
+        # Hand the screened reading to the dashboard through shared memory
+        if userdata.get("channel") is not None:
+            userdata["channel"].record({key: value, "timestamp": timestamp})
+    except Exception as e:
+        print(f"Error processing message on {message.topic}: {str(e)}")
+
+def build_userdata(settings, alert_engine, clock=None, sensor_db="sensor_data.db", block_store=None, email_config=None,
+                   channel=None):
+    """Monitor state shared by the message callbacks (also used by replay.py)"""
+    # The publisher may only send sensors that left their deadband
+    carry_forward = None
+    publisher_config = settings.raw.get("publisher", {})
+    if publisher_config.get("report_by_exception", False):
+        carry_forward = CarryForward(publisher_config.get("interval", 2))
+
+    # Ingest-time checks for NaN, sentinel, out-of-range and stuck readings
+    quality_gate = QualityGate(settings) if settings.raw.get("data_quality", {}).get("enabled", False) else None
+
+    return {"settings": settings, "email_config": email_config, "alert_engine": alert_engine,
+            "clock": clock or alert_engine.clock, "sensor_db": sensor_db,
+            "block_store": block_store, "carry_forward": carry_forward, "quality_gate": quality_gate,
+            "sensor_carry": {} if carry_forward is not None else None,
+            "interval": publisher_config.get("interval", 2), "channel": channel}
+
+def build_router(mqtt_config, sensors):
+    """Compile the monitor's subscriptions: the combined topic plus, with the per_sensor layout, one route per sensor"""
+    router = TopicRouter()
+    router.add(mqtt_config["topic"], on_message)
+    if per_sensor_layout(mqtt_config):
+        for sensor in sensors:
+            router.add(sensor_filter(mqtt_config, sensor), partial(on_sensor_message, sensor=sensor))
+    return router
+
 # Main real-time monitoring function
 def main(config_file="config.json"):
     try:
-        # Load configuration
-        config = load_config(config_file)
+        # Load and compile configuration
+        settings = load_settings(config_file)
         
         # Validate configuration
-        if not validate_config(config):
+        if settings is None:
             print("Configuration validation failed. Exiting.")
             return 1
         
-        drift_conditions = {}
-        # Extract drift conditions from failure conditions
-        for failure in config.get("failure_conditions", []):
-            if "drift_conditions" in failure:
-                drift_conditions = failure["drift_conditions"]
-                break
-        
-        mqtt_config = config.get("mqtt", {})
-        email_config = config.get("email", {})
+        mqtt_config = settings.mqtt
+        email_config = settings.email
+
+        # Apply threshold changes from the config file without restarting
+        ConfigWatcher(settings, interval=settings.raw.get("hot_reload", {}).get("interval", 2)).start()
 
         # Initialize database
         if not initialize_database():
             print("Failed to initialize database. Exiting.")
             return 1
 
+        # Readings are stamped with their event time (clock.mode: event, system)
+        clock = create_clock(settings.raw.get("clock", {}).get("mode", "event"))
+
+        # Live readings and alert episodes for the dashboard, which then needs no MQTT subscription or database polling
+        channel = None
+        shared = channel_settings(settings.raw)
+        if shared["source"] == "monitor":
+            # Imported here so a monitor without the channel does not load NumPy at start-up
+            from shm_channel import SensorChannel
+            channel = SensorChannel.create(shared["name"], shared["max_sensors"], shared["capacity"], shared["alert_capacity"])
+            print(f"Shared sensor channel {shared['name']} created")
+
+        # Alert episodes survive monitor restarts
+        alert_engine = AlertEngine.from_config(settings.raw.get("alerting"), clock=clock, channel=channel)
+        alert_engine.load_open_episodes()
+
+        # Optional compressed block copy of the readings
+        block_store = None
+        block_config = settings.raw.get("block_storage", {})
+        if block_config.get("enabled"):
+            from block_store import BlockStore, DEFAULT_BLOCK_SIZE
+            block_store = BlockStore(block_config.get("path", "sensor_blocks.db"),
+                                     block_size=block_config.get("block_size", DEFAULT_BLOCK_SIZE))
+
+        # Topics are resolved to their handler once; unrouted payloads are never decoded
+        router = build_router(mqtt_config, settings.sensors)
+
         # MQTT Setup
         try:
-            client = connect_mqtt_with_retry(mqtt_config)
-            client.user_data_set({"drift_conditions": drift_conditions, "email_config": email_config})
-            client.on_message = on_message
-
-            client.subscribe(mqtt_config["topic"])
-            print(f"Subscribed to MQTT topic: {mqtt_config['topic']}")
+            transport = MQTTTransport(
+                mqtt_config,
+                role="monitor",
+                subscriptions=router.filters(),
+                on_message=router.on_message,
+                userdata=build_userdata(settings, alert_engine, clock, block_store=block_store, email_config=email_config,
+                                        channel=channel)
+            )
 
-            # Start MQTT loop
-            client.loop_forever()
+            # Run the MQTT event loop; dropped connections are re-established automatically
+            transport.run_forever()
+            return 0
         except KeyboardInterrupt:
             print("MQTT monitoring stopped by user")
             return 0
         except Exception as e:
             print(f"MQTT error: {str(e)}")
             return 1
+        finally:
+            # Write out episode counts that are still pending
+            alert_engine.flush()
+            if block_store is not None:
+                block_store.close()
+            if channel is not None:
+                channel.close()
             
     except Exception as e:
         print(f"Error in main function: {str(e)}")
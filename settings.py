@@ -0,0 +1,229 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import threading
+from dataclasses import dataclass, field, fields
+
+# Import utility functions
+from utils import load_config, validate_config
+
+@dataclass(slots=True)
+class SensorSettings:
+    """Signal model, report-by-exception and data quality parameters for one sensor"""
+    name: str
+    base_value: float = 0.0
+    drift_rate: float = 0.0
+    spike_frequency: float = 0.0
+    spike_magnitude: float = 0.0
+    noise_std: float = 0.0
+    threshold: float = float("inf")
+    missing_data_rate: float = 0.0
+    deadband: float = 0.0
+    deadband_mode: str = "absolute"
+    max_silence: float = 0.0
+    valid_min: float = float("-inf")
+    valid_max: float = float("inf")
+    sentinels: tuple = (9999.0,)
+    stuck_limit: int = 0
+
+@dataclass(slots=True)
+class DriftSettings:
+    """Drift rules for one sensor: rolling average (or a detector from detectors.py) and rate of change"""
+    rate_of_change: float
+    deviation_factor: float
+    window_size: int
+    detector: dict = None
+
+@dataclass(slots=True)
+class FailureCondition:
+    """Multi-sensor threshold rule from failure_conditions"""
+    name: str
+    thresholds: dict
+    alert_message: str
+
+@dataclass(slots=True)
+class Settings:
+    """Validated configuration compiled into typed lookup tables.
+
+    Hot paths keep a reference to this object and read its tables directly.
+    reload() updates the existing SensorSettings/DriftSettings objects in place
+    and swaps the lookup dicts, so state keyed by sensor (drift windows, ...)
+    survives a configuration change.
+    """
+    raw: dict
+    sensors: dict = field(default_factory=dict)
+    drift_conditions: dict = field(default_factory=dict)
+    failure_conditions: list = field(default_factory=list)
+    mqtt: dict = field(default_factory=dict)
+    email: dict = field(default_factory=dict)
+    path: str = None
+    mtime_ns: int = 0
+
+    def apply(self, other):
+        """Take thresholds and signal parameters from a newer Settings without replacing live objects"""
+        self.sensors = _merge_objects(self.sensors, other.sensors)
+        self.drift_conditions = _merge_objects(self.drift_conditions, other.drift_conditions)
+        self.failure_conditions = other.failure_conditions
+        self.raw = other.raw
+        self.mtime_ns = other.mtime_ns
+
+def _merge_objects(current, new):
+    """Copy field values from new into matching current objects; return the merged table"""
+    merged = {}
+    for key, new_obj in new.items():
+        obj = current.get(key)
+        if obj is None:
+            merged[key] = new_obj
+            continue
+        for f in fields(obj):
+            setattr(obj, f.name, getattr(new_obj, f.name))
+        merged[key] = obj
+    return merged
+
+def _build_sensor(sensor):
+    names = {f.name for f in fields(SensorSettings)}
+    return SensorSettings(**{key: value for key, value in sensor.items() if key in names})
+
+def _compile_drift(conditions):
+    detector = conditions.get("detector")
+    if detector and detector.get("type", "rolling") != "rolling":
+        # The detector replaces the rolling-average test; rate_of_change stays optional
+        return DriftSettings(
+            rate_of_change=float(conditions.get("rate_of_change", "inf")),
+            deviation_factor=float(conditions.get("deviation_factor", "inf")),
+            window_size=int(conditions.get("window_size", 2)),
+            detector={key: value for key, value in detector.items() if not key.startswith("_")}
+        )
+    return DriftSettings(
+        rate_of_change=float(conditions["rate_of_change"]),
+        deviation_factor=float(conditions["deviation_factor"]),
+        window_size=int(conditions["window_size"])
+    )
+
+def compile_drift_conditions(drift_conditions):
+    """Convert a drift_conditions dict from config.json into {sensor: DriftSettings}"""
+    return {
+        sensor: _compile_drift(conditions)
+        for sensor, conditions in drift_conditions.items()
+        if not sensor.startswith("_")
+    }
+
+def build_settings(config, path=None, mtime_ns=0):
+    """Compile a validated configuration dict into a Settings object"""
+    drift_conditions = {}
+    failure_conditions = []
+    for failure in config.get("failure_conditions", []):
+        # The first drift_conditions block wins, as in the original monitor
+        if "drift_conditions" in failure and not drift_conditions:
+            drift_conditions = compile_drift_conditions(failure["drift_conditions"])
+        if "conditions" in failure:
+            thresholds = {
+                sensor: criteria["above"]
+                for sensor, criteria in failure["conditions"].items()
+                if not sensor.startswith("_") and "above" in criteria
+            }
+            failure_conditions.append(FailureCondition(failure["name"], thresholds, failure["alert_message"]))
+
+    return Settings(
+        raw=config,
+        sensors={sensor["name"]: _build_sensor(sensor) for sensor in config.get("sensors", [])},
+        drift_conditions=drift_conditions,
+        failure_conditions=failure_conditions,
+        mqtt=config.get("mqtt", {}),
+        email=config.get("email", {}),
+        path=path,
+        mtime_ns=mtime_ns
+    )
+
+# Name of the dashboard's shared memory channel (shm_channel.SensorChannel)
+DEFAULT_CHANNEL = "sdgenmon_sensors"
+
+def channel_settings(config):
+    """Shared memory channel settings from the dashboard section of the config.
+
+    source is the process that writes the channel: "monitor" (readings after
+    the quality gate, plus alert episodes) or "ingest" (dashboard_ingest.py,
+    raw readings from its own MQTT subscription, no alerts).
+    """
+    dashboard_config = config.get("dashboard", {})
+    shared = dashboard_config.get("shared_memory", {})
+    source = shared.get("source", "ingest")
+    return {
+        "name": shared.get("name", DEFAULT_CHANNEL),
+        "source": source,
+        "max_sensors": shared.get("max_sensors", 64),
+        "capacity": dashboard_config.get("buffer_capacity", 3600),
+        "alert_capacity": shared.get("alert_capacity", 256) if source == "monitor" else 0
+    }
+
+# Memoized settings per resolved config path: {path: Settings}
+_settings_cache = {}
+_settings_lock = threading.Lock()
+
+def _config_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+def load_settings(config_file="config.json"):
+    """Load, validate and compile the configuration once per file version; None if invalid"""
+    path = os.path.abspath(os.getenv("CONFIG_PATH", config_file))
+    mtime_ns = _config_mtime(path)
+
+    with _settings_lock:
+        cached = _settings_cache.get(path)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
+
+        config = load_config(path)
+        if not validate_config(config):
+            return None
+        settings = build_settings(config, path=path, mtime_ns=mtime_ns)
+        _settings_cache[path] = settings
+        return settings
+
+def reload_settings(settings):
+    """Re-read settings.path if it changed and apply it in place. Returns True if anything was applied"""
+    mtime_ns = _config_mtime(settings.path)
+    if mtime_ns == settings.mtime_ns:
+        return False
+
+    config = load_config(settings.path)
+    if not config or not validate_config(config):
+        # Keep running with the last good configuration
+        print(f"Ignoring invalid configuration change in {settings.path}")
+        settings.mtime_ns = mtime_ns
+        return False
+
+    settings.apply(build_settings(config, path=settings.path, mtime_ns=mtime_ns))
+    print(f"Configuration reloaded from {settings.path}")
+    return True
+
+class ConfigWatcher:
+    """Background thread that polls the config file and applies changes to a live Settings object"""
+
+    def __init__(self, settings, interval=2.0):
+        self.settings = settings
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                reload_settings(self.settings)
+            except Exception as e:
+                print(f"Error reloading configuration: {str(e)}")
@@ -0,0 +1,280 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import time
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+# Identifies a block created by SensorChannel ("SDGM" + layout version)
+MAGIC = 0x5344474D0003
+# Longest sensor name (UTF-8 bytes) a channel can hold; "site/sensor" keys need the room
+NAME_BYTES = 128
+HEADER_FIELDS = 6
+
+# One published state of an alert episode (see alerts.Episode); times are epoch seconds
+ALERT_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("first_seen", np.float64),
+    ("last_seen", np.float64),
+    ("count", np.int64),
+    ("sensor", "S64"),
+    ("rule", "S32"),
+    ("severity", "S16"),
+    ("status", "S16"),
+    ("message", "S256"),
+])
+
+def _text(value, size):
+    # Truncated to the field width without splitting a UTF-8 character
+    return str(value).encode("utf-8")[:size].decode("utf-8", "ignore").encode("utf-8")
+
+class SharedRing:
+    """SensorRingBuffer-compatible view of one sensor's ring inside a SensorChannel.
+
+    Same mirrored layout as SensorRingBuffer (each sample stored at i and
+    i + capacity), but the arrays and the write counter live in shared memory
+    so any number of reader processes see the writer's samples without copies.
+    """
+
+    __slots__ = ("capacity", "_times", "_values", "_counts", "_slot")
+
+    def __init__(self, capacity, times, values, counts, slot):
+        self.capacity = capacity
+        self._times = times
+        self._values = values
+        self._counts = counts
+        self._slot = slot
+
+    def __len__(self):
+        return min(int(self._counts[self._slot]), self.capacity)
+
+    def append(self, timestamp, value):
+        """Store one sample; timestamp is epoch seconds. Only the channel's writer may call this"""
+        count = int(self._counts[self._slot])
+        i = count % self.capacity
+        t = np.datetime64(int(round(timestamp * 1000)), "ms")
+        self._times[i] = t
+        self._times[i + self.capacity] = t
+        self._values[i] = value
+        self._values[i + self.capacity] = value
+        # Publish the sample only after both copies are written
+        self._counts[self._slot] = count + 1
+
+    def window(self, n=None):
+        """Return (times, values) views of the latest n samples, oldest first"""
+        count = int(self._counts[self._slot])
+        size = min(count, self.capacity)
+        if n is not None:
+            size = min(size, n)
+        end = count % self.capacity + self.capacity
+        return self._times[end - size:end], self._values[end - size:end]
+
+    def latest(self):
+        """Return the newest (timestamp, value) pair, or None if nothing was written yet"""
+        count = int(self._counts[self._slot])
+        if count == 0:
+            return None
+        i = (count - 1) % self.capacity
+        return self._times[i], self._values[i]
+
+class SensorChannel:
+    """Per-sensor ring buffers and recent alerts in one named shared memory block.
+
+    A single writer (the monitor, or dashboard_ingest.py) creates the channel
+    and appends readings; dashboard workers attach to it by name and read
+    zero-copy views. Layout: header int64[6] (magic, max_sensors, capacity,
+    sensor_count, alert_capacity, alert_sequence), sensor names, write
+    counters int64[max_sensors], the times and values arrays of shape
+    (max_sensors, 2 * capacity), then 2 * alert_capacity ALERT_DTYPE records.
+    A sensor's name is written before sensor_count is bumped, so readers never
+    see a slot without its name. alert_sequence counts every alert record ever
+    written, so readers can tell whether anything changed since they last looked.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != MAGIC:
+            raise ValueError(f"Shared memory block {shm.name} is not a sensor channel")
+        self.max_sensors = int(self._header[1])
+        self.capacity = int(self._header[2])
+        self.alert_capacity = int(self._header[4])
+
+        layout = self._layout(self.max_sensors, self.capacity, self.alert_capacity)
+        self._names = np.ndarray((self.max_sensors,), dtype=f"S{NAME_BYTES}", buffer=shm.buf, offset=layout["names"])
+        self._counts = np.ndarray((self.max_sensors,), dtype=np.int64, buffer=shm.buf, offset=layout["counts"])
+        shape = (self.max_sensors, 2 * self.capacity)
+        self._times = np.ndarray(shape, dtype="datetime64[ms]", buffer=shm.buf, offset=layout["times"])
+        self._values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=layout["values"])
+        self._alerts = np.ndarray((2 * self.alert_capacity,), dtype=ALERT_DTYPE, buffer=shm.buf, offset=layout["alerts"])
+        self._rings = {}
+        self._known = 0
+
+    @staticmethod
+    def _layout(max_sensors, capacity, alert_capacity=0):
+        names = HEADER_FIELDS * 8
+        counts = names + max_sensors * NAME_BYTES
+        counts += -counts % 8
+        times = counts + max_sensors * 8
+        values = times + max_sensors * 2 * capacity * 8
+        alerts = values + max_sensors * 2 * capacity * 8
+        return {"names": names, "counts": counts, "times": times, "values": values, "alerts": alerts,
+                "size": alerts + 2 * alert_capacity * ALERT_DTYPE.itemsize}
+
+    @classmethod
+    def create(cls, name, max_sensors=64, capacity=3600, alert_capacity=0):
+        """Create (or replace a stale) channel; the caller becomes its only writer"""
+        size = cls._layout(max_sensors, capacity, alert_capacity)["size"]
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that did not shut down cleanly; mark it stale for readers still attached
+            stale = shared_memory.SharedMemory(name=name)
+            if stale.size >= 8:
+                np.ndarray((1,), dtype=np.int64, buffer=stale.buf)[0] = 0
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[1:] = (max_sensors, capacity, 0, alert_capacity, 0)
+        header[0] = MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, timeout=0.0):
+        """Attach to an existing channel, waiting up to timeout seconds for it to be created"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+        # Readers must not unlink the block when they exit; only the owner does
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def _refresh(self):
+        count = int(self._header[3])
+        while self._known < count:
+            slot = self._known
+            name = self._names[slot].decode("utf-8")
+            self._rings[name] = SharedRing(self.capacity, self._times[slot], self._values[slot], self._counts, slot)
+            self._known += 1
+
+    def ring(self, sensor):
+        """Return the ring for sensor, registering it if this is the writer.
+
+        Names are stored in full, so a name longer than NAME_BYTES (UTF-8) is
+        rejected rather than cut to a key another sensor could share.
+        """
+        ring = self._rings.get(sensor)
+        if ring is not None:
+            return ring
+        self._refresh()
+        ring = self._rings.get(sensor)
+        if ring is None and self.owner:
+            encoded = sensor.encode("utf-8")
+            if len(encoded) > NAME_BYTES:
+                raise ValueError(f"Sensor name {sensor!r} is longer than {NAME_BYTES} bytes and cannot be shared")
+            slot = int(self._header[3])
+            if slot >= self.max_sensors:
+                raise ValueError(f"Sensor channel {self.name} is full ({self.max_sensors} sensors)")
+            self._names[slot] = encoded
+            self._counts[slot] = 0
+            self._header[3] = slot + 1
+            self._refresh()
+            ring = self._rings.get(sensor)
+        return ring
+
+    def record(self, payload, carry_forward=False):
+        """Append one MQTT payload ({sensor: value, "timestamp": epoch}) to the rings.
+
+        With carry_forward (report-by-exception publishing), sensors missing
+        from the payload repeat their last value so every ring stays aligned.
+        """
+        timestamp = payload.get("timestamp")
+        if timestamp is None:
+            timestamp = time.time()
+        for sensor, value in payload.items():
+            if sensor == "timestamp" or not isinstance(value, (int, float)):
+                continue
+            self.ring(sensor).append(timestamp, value)
+        if carry_forward:
+            for sensor, ring in self.buffers().items():
+                if sensor not in payload and len(ring):
+                    ring.append(timestamp, ring.latest()[1])
+
+    def buffers(self):
+        """Return {sensor_name: SharedRing} for every sensor written so far"""
+        self._refresh()
+        return dict(self._rings)
+
+    @property
+    def stale(self):
+        """True once the writer has closed or replaced the channel; readers should attach again"""
+        return self._header is None or self._header[0] != MAGIC
+
+    @property
+    def alert_sequence(self):
+        """Number of alert records written so far, or None if this channel carries no alerts"""
+        if not self.alert_capacity:
+            return None
+        return int(self._header[5])
+
+    def record_alert(self, episode):
+        """Publish the current state of an alert episode (when it opens and whenever its count or status is written)"""
+        if not self.alert_capacity:
+            return
+        sequence = int(self._header[5])
+        i = sequence % self.alert_capacity
+        record = (episode.row_id or 0, episode.first_seen, episode.last_seen, episode.count,
+                  _text(episode.sensor, 64), _text(episode.rule, 32), _text(episode.severity, 16),
+                  _text(episode.status, 16), _text(episode.message, 256))
+        self._alerts[i] = record
+        self._alerts[i + self.alert_capacity] = record
+        # Publish the record only after both copies are written
+        self._header[5] = sequence + 1
+
+    def alert_window(self, n=None):
+        """Zero-copy view of the latest n alert records, oldest first"""
+        sequence = int(self._header[5]) if self.alert_capacity else 0
+        size = min(sequence, self.alert_capacity)
+        if n is not None:
+            size = min(size, n)
+        end = sequence % self.alert_capacity + self.alert_capacity if self.alert_capacity else 0
+        return self._alerts[end - size:end]
+
+    def recent_alerts(self, limit=None):
+        """Latest published state of each recent episode as dicts, newest first"""
+        latest = {}
+        for record in reversed(self.alert_window().tolist()):
+            row_id, first_seen, last_seen, count, sensor, rule, severity, status, message = record
+            if row_id in latest:
+                continue
+            latest[row_id] = {"id": row_id, "first_seen": first_seen, "last_seen": last_seen, "count": count,
+                              "sensor": sensor.decode("utf-8"), "rule": rule.decode("utf-8"),
+                              "severity": severity.decode("utf-8"), "status": status.decode("utf-8"),
+                              "alert_message": message.decode("utf-8")}
+            if limit is not None and len(latest) >= limit:
+                break
+        return list(latest.values())
+
+    def close(self):
+        # Views into the block must be released before the mapping can be closed
+        if self.owner:
+            # Tell attached readers this block is going away
+            self._header[0] = 0
+        self._rings = {}
+        self._header = self._names = self._counts = self._times = self._values = self._alerts = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
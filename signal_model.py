@@ -0,0 +1,105 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import numpy as np
+
+from dependency_graph import DependencyGraph
+
+# Periodic component shared by the batch and streaming generators
+SINE_FREQUENCY = 0.1
+SINE_AMPLITUDE = 5.0
+
+# Value written for "corrupted" readings (the other half of missing readings are NaN)
+CORRUPTED_VALUE = 9999
+
+def regular_time_points(num_points, stop_time, start_time=0.0):
+    """Evenly spaced time grid including both ends (same grid as timesynth's sample_regular_time)"""
+    return np.linspace(start_time, stop_time, num_points)
+
+def sinusoid(time_points, frequency=SINE_FREQUENCY, amplitude=SINE_AMPLITUDE):
+    """Sinusoidal component of the signal model"""
+    return amplitude * np.sin(2 * np.pi * frequency * np.asarray(time_points, dtype=np.float64))
+
+def _param(sensor, name, default=0.0):
+    # Sensors may be plain config dicts or SensorSettings objects
+    if isinstance(sensor, dict):
+        return sensor.get(name, default)
+    return getattr(sensor, name, default)
+
+class StreamingGenerator:
+    """Incremental version of the generate_sensor_data signal model.
+
+    Produces the next tick, or the next block of ticks, for every sensor at
+    once: drift + sinusoid + Gaussian noise, random spikes, clipping at
+    threshold + spike_magnitude and NaN/9999 corruption, followed by sensor
+    dependencies. Only the tick counter and the last max_lag propagated samples
+    are kept, so memory does not grow with the length of the run.
+    """
+
+    def __init__(self, sensors, dependencies=None, time_interval=0.1, seed=None, start_tick=0):
+        self.sensors = list(sensors)
+        self.names = [_param(sensor, "name", None) for sensor in self.sensors]
+        self.time_interval = time_interval
+        self.tick = start_tick
+        self.rng = np.random.default_rng(seed)
+        self.graph = DependencyGraph(dependencies) if dependencies else None
+        self._history = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-read sensor parameters (e.g. after a configuration reload)"""
+        def column(name, default=0.0):
+            return np.array([float(_param(sensor, name, default)) for sensor in self.sensors])[:, None]
+
+        self.base_value = column("base_value")
+        self.drift_rate = column("drift_rate")
+        self.noise_std = column("noise_std")
+        self.spike_frequency = column("spike_frequency")
+        self.spike_magnitude = column("spike_magnitude")
+        self.missing_rate = column("missing_data_rate")
+        self.clip_max = column("threshold", np.inf) + self.spike_magnitude
+
+    def next_block(self, n, return_labels=False):
+        """Return (times, values) for the next n ticks; values has shape (sensors, n).
+
+        With return_labels, also return (spikes, corrupted) boolean masks of the
+        same shape marking where anomalies were injected, for scoring detectors.
+        """
+        ticks = np.arange(self.tick, self.tick + n)
+        times = ticks * self.time_interval
+        shape = (len(self.sensors), n)
+
+        values = self.base_value + self.drift_rate * ticks
+        values = values + sinusoid(times)
+        values += self.rng.normal(0.0, 1.0, shape) * self.noise_std
+
+        # Spikes in either direction
+        spikes = self.rng.random(shape) < self.spike_frequency
+        signs = np.where(self.rng.random(shape) > 0.5, 1.0, -1.0)
+        values += np.where(spikes, self.spike_magnitude * signs, 0.0)
+
+        np.minimum(values, self.clip_max, out=values)
+
+        # Missing / corrupted readings
+        corrupted = self.rng.random(shape) < self.missing_rate
+        corrupt_values = np.where(self.rng.random(shape) > 0.5, np.nan, CORRUPTED_VALUE)
+        values = np.where(corrupted, corrupt_values, values)
+
+        if self.graph is not None:
+            self.graph.apply_array(values, self.names, history=self._history)
+            if self.graph.max_lag:
+                previous = self._history if self._history is not None else values[:, :0]
+                self._history = np.hstack([previous, values])[:, -self.graph.max_lag:]
+
+        self.tick += n
+        if return_labels:
+            return times, values, (spikes, corrupted)
+        return times, values
+
+    def next_tick(self):
+        """Return {sensor_name: value} for the next tick"""
+        _, values = self.next_block(1)
+        return dict(zip(self.names, values[:, 0].tolist()))
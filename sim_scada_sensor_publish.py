@@ -4,7 +4,7 @@
 # You may obtain a copy of the License at
 # http://www.apache.org/licenses/LICENSE-2.0
 
-import paho.mqtt.client as mqtt
+import asyncio
 import json
 import time
 import random
@@ -12,51 +12,161 @@ import os
 import sys
 
 # Import utility functions
-from utils import load_config, validate_config, connect_mqtt_with_retry
+from mqtt_transport import MQTTTransport
+from settings import ConfigWatcher, load_settings
+from spool import DiskSpool
+from deadband import DeadbandFilter
+from topic_router import SensorTopics, encode_reading, per_sensor_layout
+
+def publish_reading(transport, topic, sensor_data, deadband=None):
+    """Publish one reading; with a DeadbandFilter only changed sensors are sent. Returns what was published
+
+    topic is the combined topic, or SensorTopics to send each sensor on its own topic.
+    """
+    if deadband is not None:
+        timestamp = sensor_data.pop("timestamp")
+        changed = deadband.filter(timestamp, sensor_data)
+        if not changed:
+            # Nothing moved outside its deadband and no heartbeat is due
+            return None
+        sensor_data = {"timestamp": timestamp, **changed}
+    # Buffered by the transport while the broker is unreachable
+    if isinstance(topic, SensorTopics):
+        timestamp = sensor_data.get("timestamp")
+        for sensor, value in sensor_data.items():
+            if sensor != "timestamp":
+                transport.publish(topic[sensor], encode_reading(value, timestamp))
+        return sensor_data
+    transport.publish(topic, json.dumps(sensor_data))
+    return sensor_data
+
+async def publish_loop(transport, topic, settings, interval=2, deadband=None):
+    """Publish a reading for every sensor each interval until cancelled"""
+    while True:
+        # Stamp the reading when it is produced so spooled data keeps its original time
+        sensor_data = {"timestamp": round(time.time(), 3)}
+        # Snapshot the table each cycle so live config changes apply on the next reading
+        for sensor in list(settings.sensors.values()):
+            # Generate random value around base_value
+            base_value = sensor.base_value
+            value = base_value + random.uniform(-base_value * 0.05, base_value * 0.05)
+            sensor_data[sensor.name] = round(value, 2)
+        
+        # Publish data
+        published = publish_reading(transport, topic, sensor_data, deadband)
+        if published is not None:
+            print(f"Published: {published}")
+        
+        # Wait before next update
+        await asyncio.sleep(interval)
+
+async def publish_realistic_loop(transport, topic, settings, interval=2, deadband=None):
+    """Publish readings from the same signal model the batch generator uses.
+
+    Ticks are scheduled against a monotonic clock; whenever the loop wakes up
+    it generates every tick that has come due in one block, so high rates are
+    sustained even when asyncio.sleep cannot wake up once per tick.
+    """
+    # NumPy is only needed by the realistic mode
+    from signal_model import StreamingGenerator
+
+    generator = StreamingGenerator(
+        list(settings.sensors.values()),
+        dependencies=settings.raw.get("sensor_dependencies", {}),
+        time_interval=interval
+    )
+    config_version = settings.mtime_ns
+    start_wall = time.time()
+    start = time.monotonic()
+    published = 0
+    while True:
+        if settings.mtime_ns != config_version:
+            # Parameters changed on disk: pick them up without losing the tick position
+            config_version = settings.mtime_ns
+            generator.refresh()
+
+        due = int((time.monotonic() - start) / interval) + 1 - published
+        if due > 0:
+            _, values = generator.next_block(due)
+            sent = 0
+            for i in range(due):
+                sensor_data = {"timestamp": round(start_wall + (published + i) * interval, 3)}
+                sensor_data.update(zip(generator.names, values[:, i].round(2).tolist()))
+                if publish_reading(transport, topic, sensor_data, deadband) is not None:
+                    sent += 1
+            published += due
+            print(f"Published {sent} of {due} reading(s), latest: {sensor_data}")
+
+        await asyncio.sleep(max(interval, 0.001))
+
+async def run_publisher(transport, topic, settings, interval=2, mode="uniform", report_by_exception=False):
+    """Run the MQTT transport and the publishing loop on the same event loop"""
+    transport_task = asyncio.create_task(transport.run())
+    loop = publish_realistic_loop if mode == "realistic" else publish_loop
+    # Report-by-exception: each sensor is sent only when it leaves its deadband or its heartbeat is due
+    deadband = DeadbandFilter(settings) if report_by_exception else None
+    try:
+        await loop(transport, topic, settings, interval, deadband)
+    finally:
+        transport.stop()
+        await transport_task
 
 def main(config_file="config.json"):
     try:
-        # Load configuration
-        config = load_config(config_file)
+        # Load and compile configuration
+        settings = load_settings(config_file)
         
         # Validate configuration
-        if not validate_config(config):
+        if settings is None:
             print("Configuration validation failed. Exiting.")
             return 1
         
-        mqtt_config = config.get("mqtt", {})
+        config = settings.raw
+        mqtt_config = settings.mqtt
+        publisher_config = config.get("publisher", {})
         
-        # Connect to MQTT broker
-        client = connect_mqtt_with_retry(mqtt_config)
+        # Optional disk spool so readings survive broker outages and restarts
+        spool = None
+        spool_config = publisher_config.get("spool", {})
+        if spool_config.get("enabled", False):
+            spool = DiskSpool(
+                spool_config.get("directory", "spool"),
+                segment_size=int(spool_config.get("segment_size_mb", 4) * 1024 * 1024),
+                max_bytes=int(spool_config.get("max_size_mb", 512) * 1024 * 1024),
+                fsync=spool_config.get("fsync", False)
+            )
+            print(f"Spooling to {spool.directory} while the broker is unreachable ({len(spool)} pending)")
         
-        # Get topic from config
-        topic = mqtt_config.get("topic", "scada/sensors")
-        print(f"Publishing to topic: {topic}")
+        # MQTT transport with automatic reconnect and outbound buffering
+        transport = MQTTTransport(
+            mqtt_config,
+            role="publisher",
+            spool=spool,
+            catch_up_rate=spool_config.get("catch_up_rate", 500),
+            drain_batch_size=spool_config.get("drain_batch_size", 200)
+        )
         
-        # Get sensors from config
-        sensors = config.get("sensors", [
-            {"name": "temperature", "base_value": 100},
-            {"name": "pressure", "base_value": 10}
-        ])
+        # Get topic from config: one combined topic, or one topic per sensor (scada/<site>/<sensor>)
+        if per_sensor_layout(mqtt_config):
+            topic = SensorTopics(mqtt_config)
+            print(f"Publishing to per-sensor topics: {mqtt_config.get('sensor_topic', 'scada/{site}/{sensor}')}")
+        else:
+            topic = mqtt_config.get("topic", "scada/sensors")
+            print(f"Publishing to topic: {topic}")
         
-        # Create a map of sensor names to their base values
-        sensor_map = {sensor["name"]: sensor["base_value"] for sensor in sensors}
+        # Pick up sensor parameter changes from the config file without restarting
+        ConfigWatcher(settings, interval=config.get("hot_reload", {}).get("interval", 2)).start()
         
         # Main publishing loop
         try:
-            while True:
-                sensor_data = {}
-                for name, base_value in sensor_map.items():
-                    # Generate random value around base_value
-                    value = base_value + random.uniform(-base_value * 0.05, base_value * 0.05)
-                    sensor_data[name] = round(value, 2)
-                
-                # Publish data
-                client.publish(topic, json.dumps(sensor_data))
-                print(f"Published: {sensor_data}")
-                
-                # Wait before next update
-                time.sleep(2)
+            asyncio.run(run_publisher(
+                transport,
+                topic,
+                settings,
+                interval=publisher_config.get("interval", 2),
+                mode=publisher_config.get("mode", "uniform"),
+                report_by_exception=publisher_config.get("report_by_exception", False)
+            ))
         except KeyboardInterrupt:
             print("Publisher stopped by user")
             return 0
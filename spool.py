@@ -0,0 +1,255 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import struct
+import zlib
+
+# Record layout: sequence number, topic length, payload length, CRC32 of topic+payload
+RECORD_HEADER = struct.Struct("<QHII")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".spool"
+CHECKPOINT_FILE = "acked.seq"
+
+class DiskSpool:
+    """Bounded, append-only store-and-forward spool made of segment files.
+
+    Messages are appended to the newest segment and read back in order with a
+    cursor. Acknowledged sequence numbers advance a watermark, and segments
+    entirely below the watermark are deleted. When the spool grows beyond
+    max_bytes the oldest segment is discarded, so disk use stays bounded during
+    arbitrarily long outages.
+    """
+
+    def __init__(self, directory, segment_size=4 * 1024 * 1024, max_bytes=512 * 1024 * 1024, fsync=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Each segment: {"first": seq, "last": seq, "path": str, "size": bytes}
+        self.segments = []
+        self.acked_seq = self._read_checkpoint()
+        self._pending_acks = set()
+        self._load_segments()
+
+        last = self.segments[-1]["last"] if self.segments else self.acked_seq
+        self.next_seq = max(last, self.acked_seq) + 1
+        self.read_seq = self.acked_seq + 1
+        self._writer = None
+        self._reader = None
+        self._reader_segment = None
+        self._compact()
+
+    # --- Recovery ---
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), "r") as file:
+                return int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(str(self.acked_seq))
+        os.replace(tmp_path, path)
+
+    def _load_segments(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            first, last, valid_size = None, None, 0
+            with open(path, "rb") as file:
+                for seq, _, _, end in self._iter_records(file):
+                    first = seq if first is None else first
+                    last = seq
+                    valid_size = end
+            if first is None:
+                os.remove(path)
+                continue
+            if valid_size != os.path.getsize(path):
+                # Torn write from a crash: drop the incomplete tail record
+                with open(path, "r+b") as file:
+                    file.truncate(valid_size)
+            self.segments.append({"first": first, "last": last, "path": path, "size": valid_size})
+
+    @staticmethod
+    def _iter_records(file):
+        """Yield (seq, topic, payload, end_offset) for every intact record in a segment file"""
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            seq, topic_len, payload_len, crc = RECORD_HEADER.unpack(header)
+            body = file.read(topic_len + payload_len)
+            if len(body) < topic_len + payload_len or zlib.crc32(body) != crc:
+                return
+            yield seq, body[:topic_len].decode("utf-8"), body[topic_len:], file.tell()
+
+    # --- Writing ---
+
+    def append(self, topic, payload):
+        """Append one message to the spool and return its sequence number"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        topic_bytes = topic.encode("utf-8")
+        body = topic_bytes + payload
+        seq = self.next_seq
+        record = RECORD_HEADER.pack(seq, len(topic_bytes), len(payload), zlib.crc32(body)) + body
+
+        if self._writer is None or self.segments[-1]["size"] >= self.segment_size:
+            self._open_new_segment(seq)
+
+        segment = self.segments[-1]
+        self._writer.write(record)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        segment["last"] = seq
+        segment["size"] += len(record)
+        self.next_seq += 1
+
+        self._enforce_size_limit()
+        return seq
+
+    def _open_new_segment(self, first_seq):
+        if self._writer is not None:
+            self._writer.close()
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:020d}{SEGMENT_SUFFIX}")
+        self._writer = open(path, "ab")
+        self.segments.append({"first": first_seq, "last": first_seq - 1, "path": path, "size": 0})
+
+    def _enforce_size_limit(self):
+        while len(self.segments) > 1 and sum(segment["size"] for segment in self.segments) > self.max_bytes:
+            oldest = self.segments[0]
+            lost = max(0, oldest["last"] - max(self.acked_seq, oldest["first"] - 1))
+            self.dropped += lost
+            print(f"Spool exceeded {self.max_bytes} bytes, discarded {lost} unacknowledged message(s)")
+            self.acked_seq = max(self.acked_seq, oldest["last"])
+            self.read_seq = max(self.read_seq, self.acked_seq + 1)
+            self._compact()
+
+    # --- Reading and acknowledgement ---
+
+    def __len__(self):
+        """Number of messages not yet acknowledged"""
+        return max(0, self.next_seq - 1 - self.acked_seq)
+
+    def unread(self):
+        """Number of messages not yet handed out by read_batch()"""
+        return max(0, self.next_seq - self.read_seq)
+
+    def read_batch(self, max_records):
+        """Return up to max_records (seq, topic, payload) tuples following the read cursor"""
+        batch = []
+        while len(batch) < max_records and self.read_seq < self.next_seq:
+            segment = self._segment_for(self.read_seq)
+            if segment is None:
+                break
+            if self._reader_segment is not segment:
+                self._open_reader(segment)
+            if self._writer is not None:
+                self._writer.flush()
+
+            record = next(self._iter_records(self._reader), None)
+            if record is None:
+                # End of this segment: move on to the next one
+                next_segment = self._segment_after(segment)
+                if next_segment is None:
+                    break
+                self.read_seq = max(self.read_seq, next_segment["first"])
+                continue
+            seq, topic, payload, _ = record
+            if seq >= self.read_seq:
+                batch.append((seq, topic, payload))
+                self.read_seq = seq + 1
+        return batch
+
+    def _segment_for(self, seq):
+        for segment in self.segments:
+            if segment["first"] <= seq <= segment["last"]:
+                return segment
+        return self._segment_after_seq(seq)
+
+    def _segment_after_seq(self, seq):
+        for segment in self.segments:
+            if segment["first"] > seq:
+                return segment
+        return None
+
+    def _segment_after(self, segment):
+        index = self.segments.index(segment)
+        return self.segments[index + 1] if index + 1 < len(self.segments) else None
+
+    def _open_reader(self, segment):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = open(segment["path"], "rb")
+        self._reader_segment = segment
+
+    def rewind(self, seq=None):
+        """Move the read cursor back to seq, or to the oldest unacknowledged message"""
+        self.read_seq = self.acked_seq + 1 if seq is None else max(seq, self.acked_seq + 1)
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = None
+        self._reader_segment = None
+
+    def ack(self, seq):
+        """Mark a message as delivered; compacts segments once everything before them is acknowledged"""
+        if seq <= self.acked_seq:
+            return
+        self._pending_acks.add(seq)
+        advanced = False
+        while self.acked_seq + 1 in self._pending_acks:
+            self._pending_acks.remove(self.acked_seq + 1)
+            self.acked_seq += 1
+            advanced = True
+        if advanced:
+            self._compact()
+
+    def _compact(self):
+        """Delete segments whose messages have all been acknowledged and persist the watermark"""
+        removed = False
+        while self.segments and self.segments[0]["last"] <= self.acked_seq:
+            # Keep the active write segment open while it still has room
+            if len(self.segments) == 1 and self._writer is not None and \
+                    self.segments[0]["size"] < self.segment_size:
+                break
+            segment = self.segments.pop(0)
+            if self._reader_segment is segment:
+                self._reader.close()
+                self._reader = None
+                self._reader_segment = None
+            if self._writer is not None and not self.segments:
+                self._writer.close()
+                self._writer = None
+            try:
+                os.remove(segment["path"])
+            except FileNotFoundError:
+                pass
+            removed = True
+        self._pending_acks = {seq for seq in self._pending_acks if seq > self.acked_seq}
+        # The watermark is only persisted when segments go away; after a crash the
+        # remaining messages are simply delivered again (at-least-once)
+        if removed:
+            self._write_checkpoint()
+
+    def close(self):
+        """Flush the checkpoint and close open segment files"""
+        self._write_checkpoint()
+        for handle in (self._writer, self._reader):
+            if handle is not None:
+                handle.close()
+        self._writer = None
+        self._reader = None
+        self._reader_segment = None
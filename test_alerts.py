@@ -0,0 +1,110 @@
+import unittest
+import os
+import tempfile
+import sqlite3
+
+from alerts import Alert, AlertEngine, ensure_alert_columns, query_alerts
+from scada_monitor import initialize_database
+from utils import close_db_connection, db_executemany_with_retry
+
+class TestAlertEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        initialize_database(self.temp_db.name)
+        self.engine = AlertEngine(self.temp_db.name, clear_after=3, cooldown=60, flush_interval=0)
+        self.drift = Alert("temp", "drift", "temp sensor drift detected!", 130.0)
+        self.evaluated = [("temp", "drift")]
+
+    def tearDown(self):
+        close_db_connection()
+        os.unlink(self.temp_db.name)
+
+    def rows(self):
+        conn = sqlite3.connect(self.temp_db.name)
+        rows = conn.execute("SELECT sensor, rule, status, count, first_seen, last_seen FROM alerts ORDER BY id").fetchall()
+        conn.close()
+        return rows
+
+    def test_persistent_breach_is_one_episode(self):
+        """Test that repeated breaches update one row and only the first one notifies"""
+        opened = self.engine.process([self.drift], self.evaluated, timestamp=1000)
+        self.assertEqual(len(opened), 1)
+        for second in range(1, 100):
+            self.assertEqual(self.engine.process([self.drift], self.evaluated, timestamp=1000 + second), [])
+
+        rows = self.rows()
+        self.assertEqual(len(rows), 1)
+        sensor, rule, status, count, first_seen, last_seen = rows[0]
+        self.assertEqual((sensor, rule, status, count), ("temp", "drift", "open", 100))
+        self.assertLess(first_seen, last_seen)
+
+    def test_hysteresis_and_cooldown(self):
+        """Test that episodes clear after quiet evaluations and reopen only within the cooldown"""
+        self.engine.process([self.drift], self.evaluated, timestamp=1000)
+        self.engine.process([], self.evaluated, timestamp=1001)
+        self.engine.process([self.drift], self.evaluated, timestamp=1002)
+        for second in range(3, 6):
+            self.engine.process([], self.evaluated, timestamp=1000 + second)
+        self.assertEqual(self.rows()[0][2:4], ("cleared", 2))
+
+        # Flapping within the cooldown continues the same episode without notifying
+        self.assertEqual(self.engine.process([self.drift], self.evaluated, timestamp=1030), [])
+        self.assertEqual(self.rows()[0][2:4], ("open", 3))
+
+        for second in range(31, 34):
+            self.engine.process([], self.evaluated, timestamp=1000 + second)
+        opened = self.engine.process([self.drift], self.evaluated, timestamp=1200)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(len(self.rows()), 2)
+
+    def test_migration_and_restart(self):
+        """Test that old alerts tables gain the episode columns and open episodes are resumed"""
+        legacy_db = self.temp_db.name + ".legacy"
+        conn = sqlite3.connect(legacy_db)
+        conn.execute("CREATE TABLE alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, alert_message TEXT)")
+        conn.commit()
+        conn.close()
+        try:
+            self.assertTrue(ensure_alert_columns(legacy_db))
+            conn = sqlite3.connect(legacy_db)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+            conn.close()
+            self.assertTrue({"sensor", "rule", "severity", "status", "first_seen", "last_seen", "count"} <= columns)
+        finally:
+            close_db_connection(legacy_db)
+            os.unlink(legacy_db)
+
+        self.engine.process([self.drift], self.evaluated, timestamp=1000)
+        restarted = AlertEngine(self.temp_db.name, flush_interval=0)
+        self.assertEqual(restarted.load_open_episodes(), 1)
+        self.assertEqual(restarted.process([self.drift], self.evaluated, timestamp=1010), [])
+        self.assertEqual(self.rows()[0][3], 2)
+
+    def test_query_alerts_pages_through_history(self):
+        """Test keyset pagination and filters over the alert history"""
+        rows = [(f"2026-01-{1 + i // 100:02d} 12:00:00", f"alert {i}", f"s{i % 2}", ["warning", "critical"][i % 3 == 0])
+                for i in range(500)]
+        db_executemany_with_retry(self.temp_db.name,
+                                  "INSERT INTO alerts (timestamp, alert_message, sensor, severity) VALUES (?, ?, ?, ?)", rows)
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = query_alerts(self.temp_db.name, limit=64, after=cursor, sensor="s1", start="2026-01-02", end="2026-01-05")
+            seen.extend(page)
+            if cursor is None:
+                break
+        messages = [row["alert_message"] for row in seen]
+        expected = [f"alert {i}" for i in range(100, 400) if i % 2 == 1]
+        self.assertEqual(sorted(messages), sorted(expected))
+        self.assertEqual(len(set(messages)), len(messages))
+        timestamps = [row["timestamp"] for row in seen]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+        critical, _ = query_alerts(self.temp_db.name, limit=1000, severity="critical")
+        self.assertEqual(len(critical), len([i for i in range(500) if i % 3 == 0]))
+
+if __name__ == '__main__':
+    unittest.main()
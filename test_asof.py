@@ -0,0 +1,89 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import numpy as np
+
+from asof import asof, align_window, rule_onsets, group_long
+from dependency_graph import DependencyGraph
+from scada_data_generator import generate_multirate, check_series_failures, save_series
+from settings import FailureCondition
+from signal_model import sinusoid
+
+class TestAsOfAlignment(unittest.TestCase):
+
+    def setUp(self):
+        # A fast sensor every second and a slow one every 10 seconds
+        self.series = {
+            "fast": (np.arange(0.0, 60.0), np.arange(60.0)),
+            "slow": (np.arange(0.0, 60.0, 10.0), np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]))
+        }
+
+    def test_asof_takes_latest_sample(self):
+        """Test that each target gets the latest sample at or before it, NaN before the first or past the tolerance"""
+        times, values = self.series["slow"]
+        np.testing.assert_array_equal(asof(times, values, [-1.0, 0.0, 9.9, 10.0, 75.0]), [np.nan, 1.0, 1.0, 2.0, 6.0])
+        np.testing.assert_array_equal(asof(times, values, [12.0, 75.0], tolerance=5.0), [2.0, np.nan])
+
+    def test_align_window(self):
+        """Test that a window is aligned on the union of sample times, carrying in the sample before it"""
+        grid, names, values = align_window(self.series, start=15.0, end=21.0)
+        np.testing.assert_array_equal(grid, [15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0])
+        self.assertEqual(names, ["fast", "slow"])
+        np.testing.assert_array_equal(values[:, 1], [2.0, 2.0, 2.0, 2.0, 2.0, 3.0, 3.0])
+
+        grid, _, values = align_window(self.series, start=5.0, end=35.0, step=15.0)
+        np.testing.assert_array_equal(grid, [5.0, 20.0, 35.0])
+        np.testing.assert_array_equal(values, [[5.0, 1.0], [20.0, 3.0], [35.0, 4.0]])
+
+    def test_rule_onsets_need_both_sensors_at_once(self):
+        """Test that a multi-sensor rule fires only while every sensor is above its threshold at the same time"""
+        np.testing.assert_array_equal(rule_onsets(self.series, {"fast": 25.0, "slow": 3.5}), [30.0])
+        self.assertEqual(len(rule_onsets(self.series, {"fast": 25.0, "missing": 0.0})), 0)
+        self.assertEqual(group_long([1.0, 0.0], ["a", "a"], [2.0, 3.0])["a"][1].tolist(), [3.0, 2.0])
+
+    def test_dependencies_across_rates(self):
+        """Test that dependencies on a shared grid match the array path, and a slow parent is used as of each child sample"""
+        dependencies = {"slow": {"parents": [{"sensor": "fast", "factor": 0.5, "lag": 2}]}}
+        same_grid = {"fast": np.arange(20.0), "slow": np.ones(20)}
+        expected = DependencyGraph(dependencies).apply(dict(same_grid))
+        series = {name: (np.arange(20.0), values.copy()) for name, values in same_grid.items()}
+        DependencyGraph(dependencies).apply_series(series)
+        np.testing.assert_allclose(series["slow"][1], expected["slow"])
+
+        series = {"fast": (np.arange(0.0, 30.0), np.ones(30)), "slow": (np.array([0.0, 10.0, 20.0]), np.array([5.0, np.nan, 7.0]))}
+        DependencyGraph({"fast": {"depends_on": "slow", "correlation_factor": 1.0}}).apply_series(series)
+        fast = series["fast"][1]
+        self.assertEqual(fast[9], 6.0)
+        self.assertTrue(np.isnan(fast[10:20]).all())
+        self.assertEqual(fast[25], 8.0)
+
+class TestMultiRateGeneration(unittest.TestCase):
+
+    def test_each_sensor_stored_at_native_rate(self):
+        """Test that sensors are generated and stored at their own rates without padding"""
+        sensors = [
+            {"name": "vibration", "base_value": 1, "drift_rate": 0, "spike_frequency": 0, "spike_magnitude": 0,
+             "noise_std": 0, "threshold": 10, "missing_data_rate": 0, "sample_interval": 0.01},
+            {"name": "level", "base_value": 50, "drift_rate": 0.1, "spike_frequency": 0, "spike_magnitude": 0,
+             "noise_std": 0, "threshold": 100, "missing_data_rate": 0, "sample_interval": 60}
+        ]
+        series = generate_multirate({"sensors": sensors}, {"num_points": 600, "time_interval": 1.0})
+        self.assertEqual(len(series["vibration"][0]), 60000)
+        self.assertEqual(len(series["level"][0]), 10)
+        # drift_rate is per time_interval, whatever the sensor's own rate
+        self.assertAlmostEqual(series["level"][1][1] - series["level"][1][0], 6.0 + sinusoid(60.0) - sinusoid(0.0), places=6)
+
+        alerts = check_series_failures(series, [FailureCondition("Both", {"vibration": 0.5, "level": 60}, "both high")])
+        self.assertEqual(alerts, [{"Time": 120.0, "Alert": "both high"}])
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "multi")
+            self.assertTrue(save_series(series, alerts, {"format": "database", "file_name": file_name}))
+            conn = sqlite3.connect(f"{file_name}.db")
+            counts = dict(conn.execute("SELECT sensor, COUNT(*) FROM sensor_series GROUP BY sensor").fetchall())
+            conn.close()
+        self.assertEqual(counts, {"vibration": 60000, "level": 10})
+
+if __name__ == '__main__':
+    unittest.main()
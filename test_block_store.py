@@ -0,0 +1,111 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+
+from block_store import BlockStore, encode_block, decode_block, import_sensor_db, XOR_VALUES
+from scada_monitor import store_sensor_reading
+from data_quality import GOOD, SENTINEL
+from utils import close_db_connection
+
+class TestBlockStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.rng = np.random.default_rng(7)
+        self.times = 1_700_000_000_000 + np.arange(1024, dtype=np.int64) * 1000
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def assert_round_trip(self, times, values):
+        block = encode_block(times, values)
+        decoded_times, decoded_values = decode_block(block)
+        np.testing.assert_array_equal(decoded_times, times)
+        # Compare bit patterns so NaN and -0.0 count as well
+        np.testing.assert_array_equal(decoded_values.view(np.uint64), np.asarray(values, dtype=np.float64).view(np.uint64))
+        return block
+
+    def test_full_precision_values_are_lossless(self):
+        """Test that arbitrary floats, NaN and -0.0 survive the XOR encoding bit for bit"""
+        values = 100 + self.rng.normal(0, 0.5, len(self.times))
+        values[::17] = np.nan
+        values[5] = -0.0
+        values[6] = np.inf
+        block = self.assert_round_trip(self.times, values)
+        self.assertEqual(block[1], XOR_VALUES)
+
+    def test_irregular_timestamps_are_lossless(self):
+        """Test that jittered, repeated and backwards timestamps decode exactly"""
+        times = self.times + self.rng.integers(-400, 400, len(self.times))
+        times[10] = times[9]
+        self.assert_round_trip(times, np.round(self.rng.normal(size=len(times)), 2))
+
+    def test_short_blocks(self):
+        """Test that blocks of one, two and three readings round-trip"""
+        for n in (1, 2, 3):
+            self.assert_round_trip(self.times[:n], [12.34, 12.35, 12.5][:n])
+
+    def test_rounded_readings_compress_tenfold(self):
+        """Test that two-decimal readings like the publisher's take a tenth of their raw size"""
+        values = np.round(50 + np.cumsum(self.rng.normal(0, 0.02, len(self.times))), 2)
+        block = self.assert_round_trip(self.times, values)
+        self.assertEqual(block[1], 2)
+        self.assertLess(len(block) * 10, 16 * len(self.times))
+
+    def test_range_read_decodes_only_overlapping_blocks(self):
+        """Test that reads return exactly the readings in [start, end) across block boundaries"""
+        store = BlockStore(self.temp_db.name, block_size=100)
+        times = self.times[:950]
+        values = np.round(self.rng.normal(size=950), 2)
+        # Appends of uneven sizes fill blocks across calls; the tail stays buffered until flush
+        for start in range(0, 950, 130):
+            store.append("temperature", times[start:start + 130], values[start:start + 130])
+        self.assertEqual(store.stats()["temperature"][:2], (9, 900))
+        store.flush()
+        self.assertEqual(store.stats()["temperature"][:2], (10, 950))
+
+        read_times, read_values = store.read("temperature", times[150], times[420])
+        np.testing.assert_array_equal(read_times.astype(np.int64), times[150:420])
+        np.testing.assert_array_equal(read_values, values[150:420])
+
+        all_times, all_values = store.read("temperature")
+        np.testing.assert_array_equal(all_values, values)
+        self.assertEqual(len(store.read("pressure")[0]), 0)
+        store.close()
+
+    def test_append_reading(self):
+        """Test that monitor payloads are split per sensor and persisted on close"""
+        store = BlockStore(self.temp_db.name, block_size=4)
+        for i in range(6):
+            store.append_reading({"temperature": 20.0 + i, "pressure": 1.5, "status": "ok"}, 1_700_000_000 + i)
+        store.close()
+
+        store = BlockStore(self.temp_db.name)
+        self.assertEqual(store.sensors(), ["pressure", "temperature"])
+        times, values = store.read("temperature", start_ms=1_700_000_002_000)
+        self.assertEqual(values.tolist(), [22.0, 23.0, 24.0, 25.0])
+        self.assertEqual(times[0], np.datetime64(1_700_000_002_000, "ms"))
+        store.close()
+
+    def test_import_per_sensor_readings(self):
+        """Test that per-sensor topic readings import as one series per site/sensor, with flagged readings as gaps"""
+        readings_db = self.temp_db.name + ".readings"
+        self.addCleanup(os.unlink, readings_db)
+        for i, value in enumerate([20.0, 9999.0, 22.0]):
+            store_sensor_reading("north", "temperature", value, readings_db, timestamp=1_700_000_000 + i,
+                                 quality=SENTINEL if value == 9999.0 else GOOD)
+            store_sensor_reading("south", "temperature", 30.0 + i, readings_db, timestamp=1_700_000_000 + i)
+
+        store = BlockStore(self.temp_db.name)
+        self.assertEqual(import_sensor_db(readings_db, store, table="sensor_readings"), 6)
+        close_db_connection(readings_db)
+        self.assertEqual(store.sensors(), ["north/temperature", "south/temperature"])
+        np.testing.assert_array_equal(store.read("north/temperature")[1], [20.0, np.nan, 22.0])
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import tempfile
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from bulk_writer import bulk_load, bulk_load_dataframe
+
+class TestBulkWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.temp_db.name)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_numeric_load_round_trips(self):
+        """Test that every row (including a partial final statement) is stored exactly, NaN as NULL"""
+        values = np.random.default_rng(1).normal(size=1037)
+        values[::10] = np.nan
+        df = pd.DataFrame({"Time": np.arange(1037) * 0.1, "temperature": values})
+        self.assertEqual(bulk_load_dataframe(self.temp_db.name, "sensor_data", df, index_columns=["Time"], chunk_size=250), 1037)
+
+        rows = self.query("SELECT Time, temperature FROM sensor_data ORDER BY rowid")
+        stored = np.array([np.nan if value is None else value for _, value in rows])
+        np.testing.assert_array_equal(stored, values)
+        self.assertEqual([row[0] for row in rows], df["Time"].tolist())
+
+        columns = {row[1]: row[2] for row in self.query("PRAGMA table_info(sensor_data)")}
+        self.assertEqual(columns, {"Time": "REAL", "temperature": "REAL"})
+        self.assertIn(("idx_sensor_data_Time",), self.query("SELECT name FROM sqlite_master WHERE type='index'"))
+        self.assertEqual(self.query("PRAGMA journal_mode"), [("wal",)])
+
+    def test_mixed_types_replace_existing_table(self):
+        """Test text/integer columns and that reloading replaces the previous table"""
+        bulk_load(self.temp_db.name, "alerts", {"Time": np.arange(5.0), "Alert": np.array(["old"] * 5, dtype=object)})
+        bulk_load(self.temp_db.name, "alerts", {"Time": np.arange(3), "Alert": np.array(["a", "b", "c"], dtype=object)})
+
+        self.assertEqual(self.query("SELECT Time, Alert FROM alerts"), [(0, "a"), (1, "b"), (2, "c")])
+        columns = {row[1]: row[2] for row in self.query("PRAGMA table_info(alerts)")}
+        self.assertEqual(columns, {"Time": "INTEGER", "Alert": "TEXT"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+
+import scada_monitor
+from settings import build_settings
+from drift_analysis import analyze_drift
+from data_quality import QualityGate, good_positions, GOOD, MISSING, SENTINEL, OUT_OF_RANGE, STUCK
+from deadband import CarryForward
+
+def make_settings(**limits):
+    sensors = [{"name": "temperature", "valid_min": -50, "valid_max": 400, "sentinels": [9999], "stuck_limit": 3},
+               {"name": "flow_rate", "valid_min": 0, "stuck_limit": 0}]
+    for sensor in sensors:
+        sensor.update(limits.get(sensor["name"], {}))
+    return build_settings({
+        "sensors": sensors,
+        "mqtt": {"broker": "localhost", "port": 1883, "topic": "test"},
+        "failure_conditions": [{"name": "Drift", "drift_conditions": {
+            "temperature": {"rate_of_change": 20, "deviation_factor": 1.5, "window_size": 5}}}]
+    })
+
+class TestQualityGate(unittest.TestCase):
+
+    def test_codes(self):
+        """Test that each kind of bad reading gets its own code and the most specific one wins"""
+        gate = QualityGate(make_settings())
+        codes = gate.assess(["temperature", "flow_rate"], [
+            [100.0, 50.0],
+            [float("nan"), None],
+            [9999.0, -1.0],
+            [500.0, float("inf")],
+            [-60.0, 9999.0],
+        ])
+        np.testing.assert_array_equal(codes, [
+            [GOOD, GOOD],
+            [MISSING, MISSING],
+            [SENTINEL, OUT_OF_RANGE],
+            [OUT_OF_RANGE, OUT_OF_RANGE],
+            [OUT_OF_RANGE, SENTINEL],
+        ])
+
+    def test_stuck_runs_span_batches(self):
+        """Test that stuck values are found the same way in one batch or one reading at a time"""
+        values = [1.0, 2.0, 2.0, 2.0, 2.0, float("nan"), 2.0, 2.0, 2.0, 3.0]
+        expected = [GOOD, GOOD, GOOD, STUCK, STUCK, MISSING, GOOD, GOOD, STUCK, GOOD]
+        batch = QualityGate(make_settings()).assess(["temperature"], np.array(values)[:, None])[:, 0]
+        np.testing.assert_array_equal(batch, expected)
+
+        gate = QualityGate(make_settings())
+        single = [gate.assess(["temperature"], [[value]])[0, 0] for value in values]
+        self.assertEqual(single, expected)
+
+        # flow_rate has stuck_limit 0: repeats are fine
+        codes = QualityGate(make_settings()).assess(["flow_rate"], [[5.0]] * 10)
+        self.assertTrue((codes == GOOD).all())
+
+    def test_scalar_screen_matches_batch(self):
+        """Test that live per-message screening gives the same codes as the vectorized batch check"""
+        rng = np.random.default_rng(3)
+        choices = [100.0, 100.0, 100.0, 9999.0, float("nan"), 500.0, -60.0, float("inf"), 0.0, -1.0, None]
+        rows = [[choices[i] for i in rng.integers(0, len(choices), 2)] for _ in range(400)]
+        batch = QualityGate(make_settings()).assess(["temperature", "flow_rate"], rows)
+
+        gate = QualityGate(make_settings())
+        for row, expected in zip(rows, batch.tolist()):
+            _, flagged = gate.screen({"temperature": row[0], "flow_rate": row[1]})
+            codes = [flagged.get(name, (None, GOOD))[1] for name in ("temperature", "flow_rate")]
+            self.assertEqual(codes, expected)
+
+    def test_live_limits(self):
+        """Test that limit changes on reload apply to the next batch"""
+        settings = make_settings()
+        gate = QualityGate(settings)
+        self.assertEqual(gate.screen({"temperature": 450.0})[1], {"temperature": (450.0, OUT_OF_RANGE)})
+        settings.apply(make_settings(temperature={"valid_max": 500}))
+        settings.mtime_ns += 1
+        self.assertEqual(gate.screen({"temperature": 450.0}), ({"temperature": 450.0}, {}))
+
+class TestMonitorQualityGate(unittest.TestCase):
+
+    def setUp(self):
+        scada_monitor.sensor_history = {}
+        scada_monitor.sensor_detectors = {}
+        self.settings = make_settings()
+        self.alert_engine = MagicMock()
+        self.alert_engine.process.return_value = []
+        self.userdata = {"settings": self.settings, "alert_engine": self.alert_engine,
+                         "quality_gate": QualityGate(self.settings)}
+
+    def receive(self, reading):
+        message = SimpleNamespace(topic="test", payload=json.dumps(reading).encode())
+        scada_monitor.on_message(None, self.userdata, message)
+
+    def test_sentinel_is_stored_with_code_and_skipped(self):
+        """Test that a 9999 reading is stored as NULL with its quality code and never enters the drift window"""
+        with patch("scada_monitor.store_sensor_data") as store, patch("scada_monitor.store_quality_flags") as flags:
+            for value in [100.0, 101.0, 9999.0, 102.0]:
+                self.receive({"timestamp": 1000.0, "temperature": value, "flow_rate": 50.0})
+
+        self.assertEqual(list(scada_monitor.sensor_history["temperature"]), [100.0, 101.0, 102.0])
+        store.assert_any_call({"temperature": None, "flow_rate": 50.0}, "sensor_data.db", timestamp=1000.0)
+        flags.assert_called_once_with({"temperature": (9999.0, SENTINEL)}, "sensor_data.db", timestamp=1000.0)
+
+    def test_backtest_matches_gated_monitor(self):
+        """Test that analyze_drift with quality skips the same readings as the live gate"""
+        rng = np.random.default_rng(3)
+        values = 100 + rng.normal(0, 1, 400)
+        values[::37] = 9999.0
+        values[::53] = np.nan
+        values[200:205] = 100.0
+        values[300] = 180.0
+
+        with patch("scada_monitor.store_sensor_data"), patch("scada_monitor.store_quality_flags"):
+            for value in values.tolist():
+                self.receive({"temperature": value})
+        live = [(alert.rule, alert.value) for call in self.alert_engine.process.call_args_list for alert in call.args[0]]
+
+        batch = analyze_drift(pd.DataFrame({"temperature": values}), self.settings.drift_conditions, quality=self.settings)
+        self.assertTrue(live)
+        self.assertNotIn(9999.0, batch["value"].tolist())
+        self.assertEqual(live, list(zip(batch["type"], batch["value"])))
+
+    def test_backtest_of_stored_carried_forward_rows(self):
+        """Test that backtesting stored report-by-exception rows keeps the carried values the live gate never screened"""
+        self.settings = make_settings(temperature={"stuck_limit": 3})
+        self.userdata.update(settings=self.settings, quality_gate=QualityGate(self.settings), carry_forward=CarryForward(1))
+        rng = np.random.default_rng(5)
+        readings = []
+        for i in range(200):
+            # temperature only reported every fourth tick, as if it stayed inside its deadband
+            reading = {"timestamp": 1000.0 + i, "flow_rate": 50.0}
+            if i % 4 == 0:
+                reading["temperature"] = 9999.0 if i == 120 else float(100 + rng.normal(0, 15))
+            readings.append(reading)
+
+        with patch("scada_monitor.store_sensor_data") as store, patch("scada_monitor.store_quality_flags"):
+            for reading in readings:
+                self.receive(reading)
+        live = [(alert.rule, alert.value) for call in self.alert_engine.process.call_args_list for alert in call.args[0]]
+        stored = pd.DataFrame([call.args[0] for call in store.call_args_list], dtype=np.float64)
+
+        batch = analyze_drift(stored, self.settings.drift_conditions, quality=self.settings, screened=True)
+        self.assertTrue(live)
+        self.assertEqual(live, list(zip(batch["type"], batch["value"])))
+        # Re-running the checks would call the carried values stuck and drop them
+        kept = stored["temperature"].notna().sum()
+        self.assertLess(len(good_positions(stored["temperature"].to_numpy(), "temperature", self.settings)), kept)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+import scada_monitor
+from settings import build_settings
+from deadband import DeadbandFilter, CarryForward
+
+def make_settings(**overrides):
+    sensors = [
+        {"name": "temperature", "deadband": 1.0, "max_silence": 10},
+        {"name": "pressure", "deadband": 10, "deadband_mode": "percent"},
+        {"name": "flow_rate"}
+    ]
+    for sensor in sensors:
+        sensor.update(overrides.get(sensor["name"], {}))
+    return build_settings({"sensors": sensors, "mqtt": {}})
+
+class TestDeadbandFilter(unittest.TestCase):
+
+    def test_absolute_deadband_and_heartbeat(self):
+        """Test that small moves are suppressed until the deadband is left or max_silence passes"""
+        deadband = DeadbandFilter(make_settings())
+        published = [bool(deadband.filter(t, {"temperature": value}))
+                     for t, value in [(0, 20.0), (1, 20.5), (2, 19.2), (3, 21.1), (4, 21.0), (13, 21.0)]]
+        # 19.2 is within 1.0 of the last *published* value (20.0), 21.1 is not
+        self.assertEqual(published, [True, False, False, True, False, True])
+
+    def test_percent_deadband(self):
+        """Test that percent deadbands scale with the last published value"""
+        deadband = DeadbandFilter(make_settings())
+        self.assertEqual(deadband.filter(0, {"pressure": 10.0}), {"pressure": 10.0})
+        self.assertEqual(deadband.filter(1, {"pressure": 10.9}), {})
+        self.assertEqual(deadband.filter(2, {"pressure": 11.1}), {"pressure": 11.1})
+
+    def test_zero_deadband_publishes_changes_only(self):
+        """Test that sensors without a deadband are sent on every change, NaN transitions included"""
+        deadband = DeadbandFilter(make_settings())
+        values = [5.0, 5.0, 5.01, float("nan"), float("nan"), 5.01]
+        sent = [deadband.filter(t, {"flow_rate": value}) for t, value in enumerate(values)]
+        self.assertEqual([bool(readings) for readings in sent], [True, False, True, True, False, True])
+
+    def test_live_settings(self):
+        """Test that deadband changes on reload apply to the next reading"""
+        settings = make_settings()
+        deadband = DeadbandFilter(settings)
+        deadband.filter(0, {"temperature": 20.0})
+        settings.apply(make_settings(temperature={"deadband": 0.1}))
+        self.assertEqual(deadband.filter(1, {"temperature": 20.5}), {"temperature": 20.5})
+
+class TestCarryForward(unittest.TestCase):
+
+    def setUp(self):
+        scada_monitor.sensor_history = {}
+
+    def test_missing_sensors_keep_their_last_value(self):
+        """Test that partial payloads are merged with the carried-forward values"""
+        carry = CarryForward(interval=2)
+        carry.fill({"temperature": 20.0, "pressure": 10.0}, 100)
+        gaps, reading = carry.fill({"pressure": 12.0}, 102)
+        self.assertEqual(gaps, [])
+        self.assertEqual(reading, {"temperature": 20.0, "pressure": 12.0})
+
+    def test_skipped_ticks_are_filled(self):
+        """Test that a gap of several intervals is replayed as carried-forward ticks, capped at max_gap"""
+        carry = CarryForward(interval=2)
+        carry.fill({"temperature": 20.0}, 100)
+        gaps, reading = carry.fill({"temperature": 25.0}, 110)
+        self.assertEqual([t for t, _ in gaps], [102, 104, 106, 108])
+        self.assertTrue(all(values == {"temperature": 20.0} for _, values in gaps))
+        self.assertEqual(reading, {"temperature": 25.0})
+
+        gaps, _ = carry.fill({"temperature": 30.0}, 130, max_gap=3)
+        self.assertEqual([t for t, _ in gaps], [124, 126, 128])
+
+    def test_drift_alerts_match_full_publishing(self):
+        """Test that drift evaluation on the reconstructed stream matches the full stream"""
+        settings = make_settings(temperature={"deadband": 0, "max_silence": 0})
+        conditions = {"temperature": {"rate_of_change": 3, "deviation_factor": 1.1, "window_size": 4}}
+        values = [20.0, 20.0, 20.0, 20.0, 20.0, 26.0, 26.0, 26.0, 26.0, 26.0, 26.0, 20.0, 20.0, 20.0]
+
+        expected = []
+        for value in values:
+            alerts, _ = scada_monitor.evaluate_drift({"temperature": value}, conditions)
+            expected.extend((alert.rule, alert.value) for alert in alerts)
+        self.assertTrue(expected)
+
+        scada_monitor.sensor_history = {}
+        deadband = DeadbandFilter(settings)
+        carry = CarryForward(interval=1)
+        actual = []
+        sent = 0
+        for t, value in enumerate(values):
+            payload = deadband.filter(float(t), {"temperature": value})
+            if not payload:
+                continue
+            sent += 1
+            gaps, reading = carry.fill(payload, float(t))
+            for _, filled in gaps + [(t, reading)]:
+                alerts, _ = scada_monitor.evaluate_drift(filled, conditions)
+                actual.extend((alert.rule, alert.value) for alert in alerts)
+        self.assertEqual(sent, 3)
+        self.assertEqual(actual, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+
+from dependency_graph import DependencyGraph, DependencyCycleError
+from utils import validate_config
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def test_chain_is_evaluated_in_topological_order(self):
+        """Test that A -> B -> C gives the same result regardless of dict order"""
+        dependencies = {
+            "c": {"depends_on": "b", "correlation_factor": 2.0},
+            "b": {"depends_on": "a", "correlation_factor": 0.5}
+        }
+        data = {"a": np.array([10.0, 20.0]), "b": np.array([1.0, 1.0]), "c": np.array([0.0, 0.0])}
+
+        result = DependencyGraph(dependencies).apply(data)
+
+        np.testing.assert_allclose(result["b"], [6.0, 11.0])
+        np.testing.assert_allclose(result["c"], [12.0, 22.0])
+
+    def test_cycle_is_detected_at_load_time(self):
+        """Test that cyclic dependencies are rejected"""
+        dependencies = {
+            "a": {"depends_on": "b", "correlation_factor": 1.0},
+            "b": {"depends_on": "a", "correlation_factor": 1.0}
+        }
+        with self.assertRaises(DependencyCycleError):
+            DependencyGraph(dependencies)
+
+        config = {
+            "sensors": [{"name": "a"}, {"name": "b"}],
+            "sensor_dependencies": dependencies,
+            "mqtt": {"broker": "localhost", "port": 1883, "topic": "test"}
+        }
+        self.assertFalse(validate_config(config))
+
+    def test_multiple_parents_with_lag_and_transfer(self):
+        """Test multi-parent dependencies against a straightforward reference implementation"""
+        rng = np.random.default_rng(0)
+        a = rng.normal(size=20)
+        b = rng.normal(size=20)
+        dependencies = {
+            "c": {"parents": [
+                {"sensor": "a", "factor": 0.5, "lag": 2},
+                {"sensor": "b", "factor": -1.5, "transfer": "tanh"}
+            ]}
+        }
+
+        result = DependencyGraph(dependencies).apply({"a": a.copy(), "b": b.copy(), "c": np.zeros(20)})
+
+        lagged_a = np.concatenate([[a[0], a[0]], a[:-2]])
+        np.testing.assert_allclose(result["c"], 0.5 * lagged_a - 1.5 * np.tanh(b))
+
+    def test_history_makes_lags_continuous_across_blocks(self):
+        """Test that block-wise evaluation with history matches evaluating the whole series"""
+        dependencies = {"b": {"parents": [{"sensor": "a", "factor": 1.0, "lag": 3}]}}
+        graph = DependencyGraph(dependencies)
+        full = np.vstack([np.arange(10.0), np.zeros(10)])
+        expected = graph.apply_array(full.copy(), ["a", "b"])
+
+        first = graph.apply_array(full[:, :6].copy(), ["a", "b"])
+        second = graph.apply_array(full[:, 6:].copy(), ["a", "b"], history=first[:, -3:])
+        np.testing.assert_allclose(np.hstack([first, second]), expected)
+
+    def test_nan_only_affects_its_dependents(self):
+        """Test that a missing parent reading does not leak into unrelated dependents"""
+        dependencies = {
+            "x": {"depends_on": "a", "correlation_factor": 1.0},
+            "y": {"depends_on": "b", "correlation_factor": 1.0}
+        }
+        data = {"a": np.array([np.nan, 1.0]), "b": np.array([2.0, 2.0]),
+                "x": np.zeros(2), "y": np.zeros(2)}
+
+        result = DependencyGraph(dependencies).apply(data)
+
+        self.assertTrue(np.isnan(result["x"][0]))
+        np.testing.assert_array_equal(result["y"], [2.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
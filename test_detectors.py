@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+import scada_monitor
+from utils import validate_config
+from drift_analysis import analyze_drift
+from detectors import DETECTORS, create_detector, detect_batch
+
+def shifted_series(seed=0, n=20000):
+    """Noise around zero with an upward and a downward step and a few missing readings"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0.0, 0.5, n)
+    values[5000:6000] += 0.75
+    values[12000:] -= 1.5
+    values[::499] = np.nan
+    return values
+
+class TestDetectors(unittest.TestCase):
+
+    def test_batch_matches_streaming(self):
+        """Test that every detector's batch version raises the same alarms as the streaming one"""
+        values = shifted_series()
+        for spec in [{"type": "ewma"}, {"type": "cusum"}, {"type": "page_hinkley"},
+                     {"type": "cusum", "k": 0.25, "h": 3, "warmup": 30},
+                     {"type": "page_hinkley", "delta": 0.05, "threshold": 5},
+                     {"type": "ewma", "lam": 0.3, "L": 2.5, "target": 0.0, "sigma": 0.5}]:
+            detector = create_detector(spec)
+            streaming = np.array([detector.update(value) for value in values.tolist()])
+            alarms, statistic = detect_batch(values, spec)
+            np.testing.assert_array_equal(alarms, streaming, err_msg=str(spec))
+            self.assertAlmostEqual(statistic[-1], detector.statistic, places=9)
+
+    def test_detects_small_shift_near_zero(self):
+        """Test that a 1.5 sigma step on a zero-mean signal is caught within a few dozen readings"""
+        values = shifted_series()
+        for detector_type in DETECTORS:
+            alarms, _ = detect_batch(values, {"type": detector_type})
+            after = np.flatnonzero(alarms[12000:])
+            self.assertTrue(len(after), detector_type)
+            self.assertLess(after[0], 50, detector_type)
+            # The warmup learns the baseline; nothing alarms before it is complete
+            self.assertFalse(alarms[:200].any())
+
+    def test_configured_baseline_skips_warmup(self):
+        """Test that target and sigma make the detector ready from the first reading"""
+        detector = create_detector({"type": "cusum", "target": 10.0, "sigma": 1.0, "h": 4})
+        self.assertTrue(detector.ready)
+        self.assertEqual([detector.update(value) for value in [12.0, 12.0, 12.0]], [False, False, True])
+        # Missing readings are skipped
+        self.assertFalse(detector.update(float("nan")))
+
+    def test_unknown_detector(self):
+        """Test that unknown detector types are rejected when building and validating"""
+        with self.assertRaises(ValueError):
+            create_detector({"type": "bogus"})
+        config = {
+            "sensors": [{"name": "flow_rate"}],
+            "mqtt": {"broker": "localhost", "port": 1883, "topic": "test"},
+            "failure_conditions": [{"name": "Drift", "drift_conditions": {"flow_rate": {"detector": {"type": "bogus"}}}}]
+        }
+        self.assertFalse(validate_config(config))
+
+    def test_monitor_and_backtest_agree(self):
+        """Test that the monitor's detector alerts match analyze_drift on the same readings"""
+        conditions = {"flow_rate": {"detector": {"type": "page_hinkley", "warmup": 100}, "rate_of_change": 2.5}}
+        values = shifted_series(seed=1, n=4000)
+        values[3000:] += 3.0
+
+        scada_monitor.sensor_history = {}
+        scada_monitor.sensor_detectors = {}
+        live = []
+        for value in values.tolist():
+            alerts, _ = scada_monitor.evaluate_drift({"flow_rate": value}, conditions)
+            live.extend((alert.rule, alert.value) for alert in alerts)
+
+        batch = analyze_drift(pd.DataFrame({"flow_rate": values}), conditions)
+        self.assertIn("page_hinkley", batch["type"].tolist())
+        self.assertIn("rate_of_change", batch["type"].tolist())
+        self.assertEqual(live, list(zip(batch["type"], batch["value"])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+import scada_monitor
+from scada_monitor import check_drift_conditions
+from drift_analysis import detect_drift, analyze_drift
+
+def stream_alerts(values, conditions):
+    """Replay readings through the live detector; return the drift and rate-of-change alert masks"""
+    scada_monitor.sensor_history = {}
+    drift, rate = [], []
+    for value in values:
+        alerts = check_drift_conditions({"temp": value}, {"temp": conditions})
+        drift.append(any("drift detected" in alert for alert in alerts))
+        rate.append(any("rate of change" in alert for alert in alerts))
+    return np.array(drift), np.array(rate)
+
+class TestDriftAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.conditions = {"rate_of_change": 3.0, "deviation_factor": 1.05, "window_size": 10}
+
+    def test_matches_streaming_detector(self):
+        """Test that batch masks equal the live detector on noisy data with spikes and missing readings"""
+        rng = np.random.default_rng(3)
+        values = 100 + np.cumsum(rng.normal(0, 0.5, 3000))
+        values[rng.random(3000) < 0.02] += 15
+        values[rng.random(3000) < 0.01] = np.nan
+        values[rng.random(3000) < 0.01] = 9999
+
+        drift, rate, _, _ = detect_drift(values, self.conditions)
+        expected_drift, expected_rate = stream_alerts(values, self.conditions)
+        np.testing.assert_array_equal(drift, expected_drift)
+        np.testing.assert_array_equal(rate, expected_rate)
+        self.assertTrue(drift.any() and rate.any())
+
+    def test_near_threshold_rounding_matches(self):
+        """Test that windows whose average is within rounding of the value are decided like the live sum()"""
+        conditions = {"rate_of_change": 1.0, "deviation_factor": 1.0, "window_size": 10}
+        values = np.concatenate([np.full(50, 0.1), np.full(50, 0.7), np.full(50, 1 / 3)])
+
+        drift, _, _, _ = detect_drift(values, conditions)
+        expected_drift, _ = stream_alerts(values, conditions)
+        np.testing.assert_array_equal(drift, expected_drift)
+
+    def test_analyze_drift_reports_alert_rows(self):
+        """Test that alerts are reported per reading with the triggering metric"""
+        values = [10.0] * 5 + [20.0] + [10.0] * 4
+        data = pd.DataFrame({"timestamp": range(10), "temp": values, "other": 0.0})
+        conditions = {"temp": {"rate_of_change": 5.0, "deviation_factor": 1.4, "window_size": 3}}
+
+        alerts = analyze_drift(data, conditions)
+        self.assertEqual(list(alerts["type"]), ["drift", "rate_of_change", "rate_of_change"])
+        self.assertEqual(list(alerts["timestamp"]), [5, 5, 6])
+        self.assertAlmostEqual(alerts["metric"].iloc[0], 40 / 3)
+
+if __name__ == '__main__':
+    unittest.main()
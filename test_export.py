@@ -0,0 +1,88 @@
+import unittest
+import os
+import io
+import csv
+import json
+import tempfile
+import sqlite3
+from flask import Flask
+
+from export import export_chunks, register_export_route
+from scada_monitor import store_sensor_data, store_sensor_reading
+from drift_analysis import load_sensor_history
+from utils import close_db_connection
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        for i in range(25):
+            store_sensor_data({"temperature": 100.0 + i, "pressure": 10.0 + i}, self.temp_db.name,
+                              timestamp=f"2026-01-01 00:00:{i:02d}")
+
+    def tearDown(self):
+        close_db_connection()
+        os.unlink(self.temp_db.name)
+
+    def test_csv_export_is_chunked(self):
+        """Test that a time range of chosen sensors is streamed in bounded chunks"""
+        chunks = list(export_chunks(self.temp_db.name, "csv", ["temperature"],
+                                    start="2026-01-01 00:00:05", end="2026-01-01 00:00:20", chunk_size=4))
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        self.assertEqual(rows[0], ["timestamp", "temperature"])
+        self.assertEqual(len(rows), 16)
+        self.assertEqual(rows[1], ["2026-01-01 00:00:05", "105.0"])
+
+    def test_jsonl_export(self):
+        """Test JSON Lines output has one object per reading"""
+        lines = "".join(export_chunks(self.temp_db.name, "jsonl")).splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(json.loads(lines[-1]), {"timestamp": "2026-01-01 00:00:24", "temperature": 124.0, "pressure": 34.0})
+
+    def test_export_is_read_only(self):
+        """Test that the monitor creates the timestamp index and exporting never writes to the database"""
+        with sqlite3.connect(self.temp_db.name) as conn:
+            indexes = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")]
+            self.assertIn("idx_sensor_data_timestamp", indexes)
+            conn.execute("DROP INDEX idx_sensor_data_timestamp")
+        close_db_connection()
+
+        self.assertEqual(len("".join(export_chunks(self.temp_db.name, "jsonl")).splitlines()), 25)
+        with sqlite3.connect(self.temp_db.name) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='index'").fetchone()[0], 0)
+
+    def test_per_sensor_readings(self):
+        """Test that per-sensor topic readings export from sensor_readings, and backtests refuse them clearly"""
+        readings_db = self.temp_db.name + ".readings"
+        self.addCleanup(os.unlink, readings_db)
+        for i in range(3):
+            for site in ("north", "south"):
+                store_sensor_reading(site, "temperature", 100.0 + i, readings_db, timestamp=f"2026-01-01 00:00:{i:02d}")
+
+        chunks = export_chunks(readings_db, "csv", ["south/temperature"], start="2026-01-01 00:00:01", table="sensor_readings")
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        self.assertEqual(rows[0], ["timestamp", "site", "sensor", "value", "quality"])
+        self.assertEqual(rows[1:], [["2026-01-01 00:00:01", "south", "temperature", "101.0", "0"],
+                                    ["2026-01-01 00:00:02", "south", "temperature", "102.0", "0"]])
+        with self.assertRaisesRegex(ValueError, "sensor_readings"):
+            list(export_chunks(readings_db, "csv"))
+        with self.assertRaisesRegex(ValueError, "sensor_readings"):
+            load_sensor_history(readings_db)
+        close_db_connection(readings_db)
+
+    def test_http_endpoint(self):
+        """Test the streaming HTTP endpoint and its parameter validation"""
+        server = Flask(__name__)
+        register_export_route(server, self.temp_db.name)
+        client = server.test_client()
+
+        response = client.get("/export?format=csv&sensors=pressure&end=2026-01-01 00:00:03")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True).splitlines()[-1], "2026-01-01 00:00:02,12.0")
+
+        self.assertEqual(client.get("/export?sensors=unknown").status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
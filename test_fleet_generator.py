@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+from fleet_generator import generate_fleet, generate_partition, build_tasks, site_sensors
+
+class TestFleetGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.config = {
+            "sensors": [
+                {"name": "temp", "base_value": 100, "drift_rate": 0.01, "spike_frequency": 0.01,
+                 "spike_magnitude": 15, "noise_std": 0.5, "threshold": 120, "missing_data_rate": 0.01},
+                {"name": "press", "base_value": 10, "drift_rate": 0.02, "spike_frequency": 0.005,
+                 "spike_magnitude": 5, "noise_std": 0.2, "threshold": 15, "missing_data_rate": 0.005}
+            ],
+            "sensor_dependencies": {
+                "press": {"parents": [{"sensor": "temp", "factor": 0.1, "lag": 2}]}
+            }
+        }
+        self.fleet_config = {
+            "sites": 3,
+            "points_per_site": 250,
+            "partition_points": 100,
+            "workers": 1,
+            "seed": 7,
+            "output_dir": self.output_dir
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_fleet_is_partitioned_by_site_and_time(self):
+        """Test that every site gets its own directory of time partitions"""
+        rows = generate_fleet(self.config, self.fleet_config)
+        self.assertEqual(rows, 3 * 250)
+
+        sites = sorted(os.listdir(self.output_dir))
+        self.assertEqual(sites, ["site=site_00000", "site=site_00001", "site=site_00002"])
+        parts = sorted(os.listdir(os.path.join(self.output_dir, sites[0])))
+        self.assertEqual(parts, ["part-00000.csv", "part-00001.csv", "part-00002.csv"])
+
+        last = pd.read_csv(os.path.join(self.output_dir, sites[0], parts[-1]))
+        self.assertEqual(len(last), 50)
+        self.assertAlmostEqual(last["Time"].iloc[0], 200 * 0.1)
+        self.assertEqual(list(last.columns), ["Time", "temp", "press"])
+
+    def test_sites_are_jittered_but_reproducible(self):
+        """Test that sites differ from each other but regenerate identically"""
+        first = site_sensors(self.config["sensors"], 0, {"base_value": 0.05}, seed=7)
+        second = site_sensors(self.config["sensors"], 1, {"base_value": 0.05}, seed=7)
+        self.assertNotEqual(first[0]["base_value"], second[0]["base_value"])
+        self.assertAlmostEqual(first[0]["base_value"], 100, delta=5)
+        self.assertEqual(first, site_sensors(self.config["sensors"], 0, {"base_value": 0.05}, seed=7))
+
+    def test_partitions_join_into_one_continuous_series(self):
+        """Test that lagged dependencies see the samples the previous partition wrote"""
+        whole_dir = os.path.join(self.output_dir, "whole")
+        generate_fleet(self.config, dict(self.fleet_config, sites=1, partition_points=250, output_dir=whole_dir))
+        generate_fleet(self.config, dict(self.fleet_config, sites=1))
+
+        site_dir = os.path.join(self.output_dir, "site=site_00000")
+        parts = [pd.read_csv(os.path.join(site_dir, name)) for name in sorted(os.listdir(site_dir))]
+        whole = pd.read_csv(os.path.join(whole_dir, "site=site_00000", "part-00000.csv"))
+        pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), whole)
+
+    def test_existing_partitions_are_skipped(self):
+        """Test that rerunning resumes instead of regenerating finished partitions"""
+        generate_fleet(self.config, self.fleet_config)
+        self.assertEqual(generate_fleet(self.config, self.fleet_config), 0)
+
+        task = build_tasks(self.config, dict(self.fleet_config, overwrite=True))[0]
+        path, rows = generate_partition(task)
+        self.assertEqual(rows, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+import paho.mqtt.client as mqtt
+
+from mqtt_transport import MQTTTransport
+from spool import DiskSpool
+
+class TestMQTTTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.mqtt_config = {
+            "broker": "localhost",
+            "port": 1883,
+            "topic": "test/scada",
+            "buffer_size": 3
+        }
+        self.transport = MQTTTransport(self.mqtt_config, role="test", subscriptions=["test/scada"])
+        self.transport.client = MagicMock()
+        self.transport.client.publish.return_value = MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+
+    def test_publish_while_disconnected_is_buffered(self):
+        """Test that messages published while disconnected go to the bounded outbox"""
+        for i in range(5):
+            self.transport.publish("test/scada", f"message {i}")
+
+        self.transport.client.publish.assert_not_called()
+        self.assertEqual(len(self.transport.outbox), 3)
+        self.assertEqual(self.transport.dropped, 2)
+
+        # The oldest messages are the ones dropped
+        self.assertEqual([payload for _, payload, _ in self.transport.outbox],
+                         ["message 2", "message 3", "message 4"])
+
+    def test_connect_flushes_outbox_and_subscribes(self):
+        """Test that a successful connection resubscribes and flushes buffered messages in order"""
+        self.transport.publish("test/scada", "first")
+        self.transport.publish("test/scada", "second")
+
+        self.transport._on_connect(self.transport.client, None, {"session present": 1}, 0)
+
+        self.assertTrue(self.transport.connected)
+        self.transport.client.subscribe.assert_called_once_with("test/scada", qos=1)
+        payloads = [call.args[1] for call in self.transport.client.publish.call_args_list]
+        self.assertEqual(payloads, ["first", "second"])
+        self.assertEqual(len(self.transport.outbox), 0)
+
+    def test_publish_uses_qos_1_when_connected(self):
+        """Test that live messages are published with QoS 1"""
+        self.transport.connected = True
+        self.transport.publish("test/scada", "live")
+
+        self.transport.client.publish.assert_called_once_with("test/scada", "live", qos=1)
+        self.assertEqual(len(self.transport.outbox), 0)
+
+    def test_disconnect_buffers_subsequent_messages(self):
+        """Test that messages are buffered again after the connection drops"""
+        self.transport._on_connect(self.transport.client, None, {}, 0)
+        self.transport._on_disconnect(self.transport.client, None, 1)
+
+        self.transport.publish("test/scada", "after drop")
+
+        self.assertFalse(self.transport.connected)
+        self.assertEqual(len(self.transport.outbox), 1)
+
+    def test_spool_replaces_outbox_and_acks_on_puback(self):
+        """Test that a disk spool stores messages while disconnected and is acknowledged per PUBACK"""
+        directory = tempfile.mkdtemp()
+        try:
+            spool = DiskSpool(directory)
+            transport = MQTTTransport(self.mqtt_config, role="test", spool=spool)
+            transport.client = MagicMock()
+
+            transport.publish("test/scada", "spooled")
+            self.assertEqual(len(transport.outbox), 0)
+            self.assertEqual(len(spool), 1)
+
+            seq, _, _ = spool.read_batch(1)[0]
+            transport._spool_mids[42] = seq
+            transport._on_publish(transport.client, None, 42)
+            self.assertEqual(len(spool), 0)
+            spool.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
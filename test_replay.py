@@ -0,0 +1,102 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import numpy as np
+
+import scada_monitor
+import replay
+from alerts import Alert, AlertEngine
+from clock import EventClock, SimulatedClock, SystemClock, format_time, parse_time
+from settings import build_settings
+from utils import close_db_connection
+
+def make_settings():
+    return build_settings({
+        "sensors": [{"name": "temperature"}],
+        "mqtt": {"broker": "localhost", "port": 1883, "topic": "test"},
+        "alerting": {"clear_after": 3, "cooldown": 600, "flush_interval": 0},
+        "failure_conditions": [{"name": "Drift", "drift_conditions": {
+            "temperature": {"rate_of_change": 20, "deviation_factor": 1.5, "window_size": 5}}}]
+    })
+
+class TestClocks(unittest.TestCase):
+
+    def test_event_clock(self):
+        """Test that the event clock follows payload timestamps and never runs backwards"""
+        clock = EventClock()
+        self.assertAlmostEqual(clock.now(), SystemClock().now(), delta=5)
+        self.assertEqual(clock.observe(1000.0), 1000.0)
+        # A late (out-of-order) reading keeps its own time but does not move the clock back
+        self.assertEqual(clock.observe(990.0), 990.0)
+        self.assertEqual(clock.now(), 1000.0)
+        self.assertEqual(clock.observe(None), 1000.0)
+
+    def test_simulated_clock(self):
+        """Test that the simulated clock only moves when told to"""
+        clock = SimulatedClock(start=500.0)
+        clock.advance(30)
+        self.assertEqual(clock.now(), 530.0)
+        clock.observe(600.0)
+        self.assertEqual(clock.observe(None), 600.0)
+
+    def test_alert_engine_uses_clock(self):
+        """Test that episode times and cooldown expiry follow the injected clock"""
+        temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        temp_db.close()
+        try:
+            scada_monitor.initialize_database(temp_db.name)
+            clock = SimulatedClock(start=parse_time("2024-01-01 00:00:00"))
+            engine = AlertEngine(temp_db.name, clear_after=1, cooldown=60, flush_interval=0, clock=clock)
+            drift = Alert("temperature", "drift", "drift", 150.0)
+            engine.process([drift], [("temperature", "drift")])
+            engine.process([], [("temperature", "drift")])
+            clock.advance(3600)
+            engine.flush()
+            self.assertEqual(engine.episodes, {})
+
+            conn = sqlite3.connect(temp_db.name)
+            first_seen = conn.execute("SELECT first_seen FROM alerts").fetchone()[0]
+            conn.close()
+            self.assertEqual(first_seen, "2024-01-01 00:00:00")
+        finally:
+            close_db_connection()
+            os.unlink(temp_db.name)
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        scada_monitor.sensor_history = {}
+        scada_monitor.sensor_detectors = {}
+        self.directory = tempfile.TemporaryDirectory()
+        self.alerts_db = os.path.join(self.directory.name, "alerts.db")
+        self.sensor_db = os.path.join(self.directory.name, "sensor_data.db")
+        scada_monitor.initialize_database(self.alerts_db)
+
+    def tearDown(self):
+        close_db_connection()
+        self.directory.cleanup()
+
+    def test_replay_uses_event_time(self):
+        """Test that a day of readings replays in event time: stored rows and alerts carry the recorded times"""
+        start = parse_time("2024-03-01 00:00:00")
+        timestamps = start + np.arange(0, 86400, 60.0)
+        values = np.full((len(timestamps), 1), 100.0)
+        values[720] = 200.0  # 12:00
+
+        opened = replay.replay(timestamps, ["temperature"], values, make_settings(), self.alerts_db, self.sensor_db)
+        self.assertEqual(opened, 2)
+
+        conn = sqlite3.connect(self.alerts_db)
+        episodes = conn.execute("SELECT rule, first_seen, last_seen FROM alerts ORDER BY id").fetchall()
+        conn.close()
+        self.assertEqual(episodes, [("drift", "2024-03-01 12:00:00", "2024-03-01 12:00:00"),
+                                    ("rate_of_change", "2024-03-01 12:00:00", "2024-03-01 12:01:00")])
+
+        conn = sqlite3.connect(self.sensor_db)
+        stored = conn.execute("SELECT MIN(timestamp), MAX(timestamp), COUNT(*) FROM sensor_data").fetchone()
+        conn.close()
+        self.assertEqual(stored, (format_time(timestamps[0]), format_time(timestamps[-1]), len(timestamps)))
+
+if __name__ == '__main__':
+    unittest.main()
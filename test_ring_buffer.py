@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+
+from ring_buffer import SensorRingBuffer
+
+class TestSensorRingBuffer(unittest.TestCase):
+
+    def test_window_before_wraparound(self):
+        """Test reading a partially filled buffer"""
+        buffer = SensorRingBuffer(5)
+        for i in range(3):
+            buffer.append(1000.0 + i, float(i))
+
+        times, values = buffer.window()
+        np.testing.assert_array_equal(values, [0.0, 1.0, 2.0])
+        self.assertEqual(times[0], np.datetime64(1000000, "ms"))
+        self.assertEqual(len(buffer), 3)
+
+    def test_window_after_wraparound_is_contiguous_view(self):
+        """Test that the latest window stays ordered and is a view, not a copy"""
+        buffer = SensorRingBuffer(4)
+        for i in range(10):
+            buffer.append(float(i), float(i))
+
+        times, values = buffer.window()
+        np.testing.assert_array_equal(values, [6.0, 7.0, 8.0, 9.0])
+        self.assertFalse(values.flags.owndata)
+        self.assertEqual(len(buffer), 4)
+
+        _, last_two = buffer.window(2)
+        np.testing.assert_array_equal(last_two, [8.0, 9.0])
+
+    def test_latest(self):
+        """Test retrieving the newest sample"""
+        buffer = SensorRingBuffer(3)
+        self.assertIsNone(buffer.latest())
+
+        for i in range(7):
+            buffer.append(float(i), i * 10.0)
+        self.assertEqual(buffer.latest()[1], 60.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,7 @@ from collections import deque
 # Import functions to test
 from scada_monitor import initialize_database, log_alert, check_drift_conditions
 from scada_data_generator import generate_sensor_data, apply_sensor_dependencies
-from utils import validate_config
+from utils import validate_config, close_db_connection
 
 class TestSCADAMonitoring(unittest.TestCase):
     
@@ -50,6 +50,9 @@ class TestSCADAMonitoring(unittest.TestCase):
         self.temp_db.close()
     
     def tearDown(self):
+        # Close pooled connections before removing the files
+        close_db_connection()
+        
         # Clean up temporary files
         os.unlink(self.temp_config.name)
         os.unlink(self.temp_db.name)
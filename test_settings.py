@@ -0,0 +1,97 @@
+import unittest
+import json
+import os
+import tempfile
+from collections import deque
+
+import scada_monitor
+from scada_monitor import check_drift_conditions
+from settings import DriftSettings, load_settings, reload_settings
+
+class TestSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "sensors": [
+                {"name": "test_temp", "base_value": 100, "drift_rate": 0.01, "_comment": "ignored"}
+            ],
+            "failure_conditions": [
+                {
+                    "name": "Test Failure",
+                    "conditions": {"test_temp": {"above": 115}, "_comment_test_temp": "ignored"},
+                    "alert_message": "TEST ALERT"
+                },
+                {
+                    "name": "Test Drift",
+                    "drift_conditions": {
+                        "test_temp": {"rate_of_change": 5.0, "deviation_factor": 1.5, "window_size": 3}
+                    },
+                    "alert_message": "TEST DRIFT"
+                }
+            ],
+            "mqtt": {"broker": "localhost", "port": 1883, "topic": "test/scada"}
+        }
+        self.temp_config = tempfile.NamedTemporaryFile(delete=False, mode='w', suffix=".json")
+        json.dump(self.config, self.temp_config)
+        self.temp_config.close()
+
+    def tearDown(self):
+        os.unlink(self.temp_config.name)
+
+    def write_config(self):
+        with open(self.temp_config.name, 'w') as f:
+            json.dump(self.config, f)
+        # Make sure the modification time changes even on coarse-grained filesystems
+        stat = os.stat(self.temp_config.name)
+        os.utime(self.temp_config.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_settings_are_typed_and_memoized(self):
+        """Test that settings compile into slotted objects and are only built once per file version"""
+        settings = load_settings(self.temp_config.name)
+
+        drift = settings.drift_conditions["test_temp"]
+        self.assertIsInstance(drift, DriftSettings)
+        self.assertEqual(drift.window_size, 3)
+        self.assertFalse(hasattr(drift, "__dict__"))
+        self.assertEqual(settings.sensors["test_temp"].base_value, 100)
+        self.assertEqual(settings.failure_conditions[0].thresholds, {"test_temp": 115})
+
+        self.assertIs(load_settings(self.temp_config.name), settings)
+
+    def test_reload_updates_objects_in_place(self):
+        """Test that a config change is applied to the live objects hot paths already hold"""
+        settings = load_settings(self.temp_config.name)
+        drift = settings.drift_conditions["test_temp"]
+
+        self.config["failure_conditions"][1]["drift_conditions"]["test_temp"]["rate_of_change"] = 0.5
+        self.config["sensors"][0]["base_value"] = 120
+        self.write_config()
+
+        self.assertTrue(reload_settings(settings))
+        self.assertIs(settings.drift_conditions["test_temp"], drift)
+        self.assertEqual(drift.rate_of_change, 0.5)
+        self.assertEqual(settings.sensors["test_temp"].base_value, 120)
+
+    def test_invalid_reload_keeps_last_good_config(self):
+        """Test that an invalid edit is ignored"""
+        settings = load_settings(self.temp_config.name)
+        del self.config["mqtt"]
+        self.write_config()
+
+        self.assertFalse(reload_settings(settings))
+        self.assertEqual(settings.mqtt["broker"], "localhost")
+
+    def test_window_resize_keeps_history(self):
+        """Test that changing window_size live keeps the newest readings"""
+        scada_monitor.sensor_history = {}
+        conditions = {"test_temp": DriftSettings(rate_of_change=100.0, deviation_factor=10.0, window_size=3)}
+        for value in [1.0, 2.0, 3.0]:
+            check_drift_conditions({"test_temp": value}, conditions)
+
+        conditions["test_temp"].window_size = 2
+        check_drift_conditions({"test_temp": 4.0}, conditions)
+
+        self.assertEqual(scada_monitor.sensor_history["test_temp"], deque([3.0, 4.0], maxlen=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import os
+import tempfile
+import multiprocessing
+import numpy as np
+
+import scada_monitor
+from shm_channel import SensorChannel, NAME_BYTES
+from alerts import Alert, AlertEngine
+from clock import SimulatedClock
+from settings import build_settings
+from utils import close_db_connection
+
+def read_latest(name, queue):
+    channel = SensorChannel.attach(name)
+    buffers = channel.buffers()
+    queue.put({sensor: float(ring.latest()[1]) for sensor, ring in buffers.items()})
+    channel.close()
+
+class TestSensorChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f"sdgenmon_test_{os.getpid()}"
+        self.channel = SensorChannel.create(self.name, max_sensors=2, capacity=4)
+
+    def tearDown(self):
+        self.channel.close()
+
+    def test_reader_process_sees_writes(self):
+        """Test that another process attached by name reads the writer's latest samples"""
+        self.channel.record({"timestamp": 1000.0, "temperature": 101.5, "pressure": 10.2})
+        self.channel.record({"timestamp": 1001.0, "temperature": 102.5})
+
+        queue = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=read_latest, args=(self.name, queue))
+        reader.start()
+        latest = queue.get(timeout=10)
+        reader.join(timeout=10)
+        self.assertEqual(latest, {"temperature": 102.5, "pressure": 10.2})
+
+    def test_window_wraps_like_ring_buffer(self):
+        """Test that windows are contiguous, oldest first, and bounded by the capacity"""
+        reader = SensorChannel.attach(self.name)
+        for i in range(6):
+            self.channel.record({"timestamp": 1000.0 + i, "flow": float(i)})
+
+        ring = reader.buffers()["flow"]
+        times, values = ring.window()
+        np.testing.assert_array_equal(values, [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(times[-1], np.datetime64(1005000, "ms"))
+        self.assertEqual(len(ring), 4)
+        del times, values, ring
+        reader.close()
+
+    def test_channel_is_bounded(self):
+        """Test that registering more sensors than max_sensors fails loudly"""
+        self.channel.record({"a": 1.0, "b": 2.0})
+        with self.assertRaises(ValueError):
+            self.channel.record({"c": 3.0})
+
+    def test_carry_forward(self):
+        """Test that report-by-exception payloads repeat the last value of missing sensors"""
+        self.channel.record({"timestamp": 1000.0, "temperature": 101.5, "pressure": 10.2}, carry_forward=True)
+        self.channel.record({"timestamp": 1002.0, "temperature": 104.0}, carry_forward=True)
+        times, values = self.channel.ring("pressure").window()
+        np.testing.assert_array_equal(values, [10.2, 10.2])
+        self.assertEqual(times[-1], np.datetime64(1002000, "ms"))
+        del times, values
+
+    def test_long_sensor_names_are_kept_apart(self):
+        """Test that site/sensor keys longer than the old 32-byte field get their own rings, and overlong names fail"""
+        first = "site_00001/reactor_outlet_temperature_a"
+        second = "site_00001/reactor_outlet_temperature_b"
+        self.channel.record({"timestamp": 1000.0, first: 1.0, second: 500.0})
+        self.channel.record({"timestamp": 1001.0, first: 2.0, second: 501.0})
+        np.testing.assert_array_equal(self.channel.ring(first).window()[1], [1.0, 2.0])
+        np.testing.assert_array_equal(self.channel.ring(second).window()[1], [500.0, 501.0])
+
+        # Two names that only differ past NAME_BYTES must not merge
+        prefix = "site_00001/" + "x" * NAME_BYTES
+        reader = SensorChannel.attach(self.name)
+        with self.assertRaises(ValueError):
+            self.channel.record({prefix + "_a": 1.0})
+        self.assertEqual(set(reader.buffers()), {first, second})
+        reader.close()
+
+class TestMonitorChannel(unittest.TestCase):
+
+    def setUp(self):
+        scada_monitor.sensor_history = {}
+        scada_monitor.sensor_detectors = {}
+        self.name = f"sdgenmon_monitor_test_{os.getpid()}"
+        self.channel = SensorChannel.create(self.name, max_sensors=4, capacity=8, alert_capacity=4)
+        self.directory = tempfile.TemporaryDirectory()
+        self.alerts_db = os.path.join(self.directory.name, "alerts.db")
+        scada_monitor.initialize_database(self.alerts_db)
+
+    def tearDown(self):
+        self.channel.close()
+        close_db_connection()
+        self.directory.cleanup()
+
+    def test_alert_ring_keeps_latest_episode_state(self):
+        """Test that episode updates are published in order and readers see the latest state of each episode"""
+        engine = AlertEngine(self.alerts_db, clear_after=1, flush_interval=0, clock=SimulatedClock(1000.0), channel=self.channel)
+        reader = SensorChannel.attach(self.name)
+        self.assertEqual(reader.alert_sequence, 0)
+
+        drift = Alert("temperature", "drift", "Drift on temperature", 150.0)
+        engine.process([drift], [("temperature", "drift")], 1000.0)
+        engine.process([drift], [("temperature", "drift")], 1002.0)
+        engine.process([], [("temperature", "drift")], 1004.0)
+
+        latest = reader.recent_alerts()
+        self.assertEqual(len(latest), 1)
+        self.assertEqual({key: latest[0][key] for key in ("sensor", "rule", "status", "count", "first_seen", "last_seen")},
+                         {"sensor": "temperature", "rule": "drift", "status": "cleared", "count": 2,
+                          "first_seen": 1000.0, "last_seen": 1002.0})
+        # Opened, then written back twice (count 2, then cleared)
+        self.assertEqual(reader.alert_sequence, 3)
+        self.assertEqual(reader.alert_window()["status"].tolist(), [b"open", b"open", b"cleared"])
+        reader.close()
+
+    def test_monitor_publishes_screened_readings(self):
+        """Test that the monitor hands stored readings to the channel, without the values the quality gate rejected"""
+        settings = build_settings({
+            "sensors": [{"name": "temperature", "valid_max": 400}],
+            "mqtt": {"broker": "localhost", "port": 1883, "topic": "test"},
+            "data_quality": {"enabled": True},
+            "failure_conditions": [{"name": "Drift", "drift_conditions": {
+                "temperature": {"rate_of_change": 20, "deviation_factor": 1.5, "window_size": 5}}}]
+        })
+        engine = AlertEngine(self.alerts_db, flush_interval=0, clock=SimulatedClock(1000.0))
+        userdata = scada_monitor.build_userdata(settings, engine, sensor_db=os.path.join(self.directory.name, "sensor.db"),
+                                                channel=self.channel)
+        for i, value in enumerate([100.0, 9999.0, 101.0]):
+            scada_monitor.process_payload({"timestamp": 1000.0 + i, "temperature": value}, userdata)
+
+        reader = SensorChannel.attach(self.name)
+        times, values = reader.buffers()["temperature"].window()
+        np.testing.assert_array_equal(values, [100.0, 101.0])
+        self.assertEqual(times[-1], np.datetime64(1002000, "ms"))
+        del times, values
+        reader.close()
+
+    def test_readers_notice_a_replaced_channel(self):
+        """Test that readers can tell when a crashed writer's channel is replaced, or the writer closes it"""
+        name = f"{self.name}_restart"
+        SensorChannel.create(name, max_sensors=1, capacity=2)  # never closed, as if the writer crashed
+        reader = SensorChannel.attach(name)
+        self.assertFalse(reader.stale)
+
+        writer = SensorChannel.create(name, max_sensors=1, capacity=2)
+        self.assertTrue(reader.stale)
+        reader.close()
+
+        reader = SensorChannel.attach(name)
+        writer.close()
+        self.assertTrue(reader.stale)
+        reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+
+from signal_model import StreamingGenerator, regular_time_points
+from scada_data_generator import generate_sensor_data, apply_sensor_dependencies, generate_compact, check_failures, save_data
+from compact_frame import CompactFrame, TimeAxis, INT16_MISSING, INT16_CORRUPTED
+
+class TestStreamingGenerator(unittest.TestCase):
+
+    def setUp(self):
+        # Deterministic sensors (no noise, spikes or corruption) so batch and stream can be compared exactly
+        self.sensors = [
+            {"name": "flow_rate", "base_value": 50, "drift_rate": 0.05, "spike_frequency": 0,
+             "spike_magnitude": 10, "noise_std": 0, "threshold": 70, "missing_data_rate": 0},
+            {"name": "pressure", "base_value": 10, "drift_rate": 0.02, "spike_frequency": 0,
+             "spike_magnitude": 5, "noise_std": 0, "threshold": 15, "missing_data_rate": 0}
+        ]
+        self.dependencies = {"pressure": {"depends_on": "flow_rate", "correlation_factor": 0.5}}
+
+    def test_stream_matches_batch_model(self):
+        """Test that streamed ticks reproduce the batch generator's signal model"""
+        time_points = np.arange(200) * 0.1
+        batch = {"Time": time_points}
+        for sensor in self.sensors:
+            batch[sensor["name"]] = generate_sensor_data(sensor, time_points)
+        batch = apply_sensor_dependencies(batch, self.dependencies)
+
+        generator = StreamingGenerator(self.sensors, self.dependencies, time_interval=0.1)
+        _, first = generator.next_block(150)
+        ticks = [generator.next_tick() for _ in range(50)]
+        rest = np.array([[tick["flow_rate"] for tick in ticks], [tick["pressure"] for tick in ticks]])
+        streamed = np.hstack([first, rest])
+
+        np.testing.assert_allclose(streamed[0], batch["flow_rate"])
+        np.testing.assert_allclose(streamed[1], batch["pressure"])
+
+    def test_block_shapes_and_tick_counter(self):
+        """Test that blocks advance the tick counter and time axis"""
+        generator = StreamingGenerator(self.sensors, time_interval=0.5, seed=1)
+        times, values = generator.next_block(4)
+        self.assertEqual(values.shape, (2, 4))
+        np.testing.assert_allclose(times, [0.0, 0.5, 1.0, 1.5])
+
+        times, _ = generator.next_block(2)
+        np.testing.assert_allclose(times, [2.0, 2.5])
+        self.assertEqual(generator.tick, 6)
+
+    def test_corruption_and_spikes_are_injected(self):
+        """Test that the realistic artifacts of the batch model also appear in the stream"""
+        sensor = dict(self.sensors[0], spike_frequency=0.2, missing_data_rate=0.2, noise_std=0.5)
+        generator = StreamingGenerator([sensor], seed=3)
+        _, values, (spikes, corrupted) = generator.next_block(2000, return_labels=True)
+
+        np.testing.assert_array_equal(corrupted, np.isnan(values) | (values == 9999))
+        self.assertTrue(spikes.any())
+        self.assertTrue(np.isnan(values).any())
+        self.assertTrue((values == 9999).any())
+        clean = values[(~np.isnan(values)) & (values != 9999)]
+        self.assertLessEqual(clean.max(), 70 + 10)
+
+    def test_regular_time_points(self):
+        """Test the time grid used by the batch generator includes both ends"""
+        np.testing.assert_allclose(regular_time_points(5, stop_time=0.5), [0.0, 0.125, 0.25, 0.375, 0.5])
+
+class TestCompactGeneration(unittest.TestCase):
+
+    def setUp(self):
+        self.sensors = [
+            {"name": "flow_rate", "base_value": 50, "drift_rate": 0.0, "spike_frequency": 0,
+             "spike_magnitude": 10, "noise_std": 0, "threshold": 70, "missing_data_rate": 0},
+            {"name": "pressure", "base_value": 10, "drift_rate": 0.0, "spike_frequency": 0,
+             "spike_magnitude": 5, "noise_std": 0, "threshold": 15, "missing_data_rate": 0}
+        ]
+        self.config = {"sensors": self.sensors,
+                       "sensor_dependencies": {"pressure": {"depends_on": "flow_rate", "correlation_factor": 0.5}}}
+
+    def test_float32_matches_streaming_model(self):
+        """Test that compact float32 generation stores the streaming model's values with an implicit time axis"""
+        frame = generate_compact(self.config, {"num_points": 1000, "time_interval": 0.5, "compact": True, "dtype": "float32"})
+        _, expected = StreamingGenerator(self.sensors, self.config["sensor_dependencies"], time_interval=0.5).next_block(1000)
+
+        self.assertEqual(frame.data.dtype, np.float32)
+        self.assertEqual(frame.data.shape, (1000, 2))
+        np.testing.assert_allclose(frame.data.T, expected, rtol=1e-6)
+        self.assertIsInstance(frame["Time"], TimeAxis)
+        np.testing.assert_allclose(frame["Time"][:3], [0.0, 0.5, 1.0])
+        self.assertEqual(frame["Time"][-1], 499.5)
+
+    def test_int16_codes(self):
+        """Test scaled int16 storage: quantized values, reserved codes for NaN and 9999, saturation counted"""
+        frame = CompactFrame(["temperature"], 5, 1.0, dtype="int16", resolution={"temperature": 0.05}, offset={"temperature": 100})
+        frame.write(0, np.array([[100.0, 101.234, np.nan, 9999.0, 5000.0]]))
+
+        np.testing.assert_array_equal(frame.data[2:, 0], [INT16_MISSING, INT16_CORRUPTED, INT16_CORRUPTED])
+        np.testing.assert_array_equal(np.asarray(frame["temperature"]), [100.0, 101.25, np.nan, 9999.0, 9999.0])
+        self.assertEqual(frame.saturated, {"temperature": 1})
+        # Failure checks read the decoded column
+        alerts = check_failures(frame, [{"name": "Hot", "conditions": {"temperature": {"above": 101}}, "alert_message": "hot"}])
+        self.assertEqual(alerts, [{"Time": 4.0, "Alert": "hot"}])
+
+    def test_writers_consume_buffer_in_chunks(self):
+        """Test that CSV and database output of a compact frame match the DataFrame writers"""
+        frame = generate_compact(self.config, {"num_points": 250, "time_interval": 0.1, "compact": True, "dtype": "int16"})
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "data")
+            self.assertTrue(save_data(frame, [], {"format": "csv", "file_name": file_name}))
+            self.assertTrue(save_data(frame, [], {"format": "database", "file_name": file_name, "chunk_size": 100}))
+
+            written = pd.read_csv(f"{file_name}.csv")
+            self.assertEqual(list(written.columns), ["Time", "flow_rate", "pressure"])
+            np.testing.assert_allclose(written["Time"], np.arange(250) * 0.1)
+            np.testing.assert_allclose(written[["flow_rate", "pressure"]], frame.rows(0, 250))
+
+            conn = sqlite3.connect(f"{file_name}.db")
+            stored = np.array(conn.execute("SELECT Time, flow_rate, pressure FROM sensor_data ORDER BY rowid").fetchall())
+            conn.close()
+            np.testing.assert_allclose(stored, written.to_numpy())
+
+if __name__ == '__main__':
+    unittest.main()
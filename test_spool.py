@@ -0,0 +1,105 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from spool import DiskSpool
+
+class TestDiskSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".spool"))
+
+    def test_append_and_read_in_order(self):
+        """Test that spooled messages are read back in order"""
+        spool = DiskSpool(self.directory)
+        for i in range(5):
+            spool.append("test/scada", f'{{"value": {i}}}')
+
+        batch = spool.read_batch(3)
+        self.assertEqual([seq for seq, _, _ in batch], [1, 2, 3])
+        self.assertEqual(batch[0][1], "test/scada")
+        self.assertEqual(batch[0][2], b'{"value": 0}')
+        self.assertEqual(len(spool.read_batch(10)), 2)
+        self.assertEqual(spool.unread(), 0)
+        spool.close()
+
+    def test_ack_compacts_segments(self):
+        """Test that fully acknowledged segments are deleted"""
+        spool = DiskSpool(self.directory, segment_size=100)
+        for i in range(10):
+            spool.append("t", "x" * 40)
+        self.assertGreater(len(self.segment_files()), 1)
+
+        for seq, _, _ in spool.read_batch(10):
+            spool.ack(seq)
+
+        self.assertEqual(len(spool), 0)
+        self.assertLessEqual(len(self.segment_files()), 1)
+        spool.close()
+
+    def test_out_of_order_acks_advance_watermark(self):
+        """Test that the watermark only advances over contiguous acknowledgements"""
+        spool = DiskSpool(self.directory)
+        for i in range(3):
+            spool.append("t", str(i))
+        spool.read_batch(3)
+
+        spool.ack(2)
+        self.assertEqual(spool.acked_seq, 0)
+        spool.ack(1)
+        self.assertEqual(spool.acked_seq, 2)
+        spool.close()
+
+    def test_recovery_after_restart(self):
+        """Test that unacknowledged messages survive reopening the spool"""
+        spool = DiskSpool(self.directory, segment_size=60)
+        for i in range(6):
+            spool.append("t", f"message {i}")
+        for seq, _, _ in spool.read_batch(3):
+            spool.ack(seq)
+        spool.close()
+
+        reopened = DiskSpool(self.directory, segment_size=60)
+        payloads = [payload for _, _, payload in reopened.read_batch(10)]
+        self.assertEqual(payloads, [b"message 3", b"message 4", b"message 5"])
+        self.assertEqual(reopened.append("t", "next"), 7)
+        reopened.close()
+
+    def test_torn_tail_is_discarded(self):
+        """Test that a partially written record is dropped on recovery"""
+        spool = DiskSpool(self.directory)
+        spool.append("t", "complete")
+        spool.close()
+
+        path = os.path.join(self.directory, self.segment_files()[0])
+        with open(path, "ab") as file:
+            file.write(b"\x02\x00\x00")
+
+        reopened = DiskSpool(self.directory)
+        self.assertEqual([payload for _, _, payload in reopened.read_batch(10)], [b"complete"])
+        reopened.close()
+
+    def test_size_limit_discards_oldest_segment(self):
+        """Test that the spool stays within max_bytes during long outages"""
+        spool = DiskSpool(self.directory, segment_size=200, max_bytes=600)
+        for i in range(100):
+            spool.append("t", "y" * 50)
+
+        total = sum(os.path.getsize(os.path.join(self.directory, name)) for name in self.segment_files())
+        self.assertLessEqual(total, 600 + 200)
+        self.assertGreater(spool.dropped, 0)
+
+        # Reading resumes at the oldest message still on disk
+        first_seq = spool.read_batch(1)[0][0]
+        self.assertEqual(first_seq, spool.acked_seq + 1)
+        spool.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from threshold_sweep import grid_candidates, random_candidates, run_sweep
+
+class TestThresholdSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "sensors": [
+                {"name": "temp", "base_value": 100, "drift_rate": 0.0, "spike_frequency": 0.02,
+                 "spike_magnitude": 30, "noise_std": 0.5, "threshold": 150, "missing_data_rate": 0.0}
+            ]
+        }
+
+    def test_candidate_generation(self):
+        """Test grid and random candidates cover every sensor within the requested ranges"""
+        grid = {"rate_of_change": [1, 2], "deviation_factor": [1.1], "window_size": [5, 10]}
+        self.assertEqual(len(grid_candidates(["a", "b"], grid)), 8)
+
+        ranges = {"rate_of_change": [1, 2], "deviation_factor": [1.1, 1.2], "window_size": [5, 6]}
+        candidates = random_candidates(["a"], ranges, samples=20, seed=1)
+        self.assertEqual(len(candidates), 20)
+        for _, rate, deviation, window in candidates:
+            self.assertTrue(1 <= rate <= 2 and 1.1 <= deviation <= 1.2 and window in (5, 6))
+
+    def test_sweep_scores_candidates(self):
+        """Test that a sensitive rule finds the injected spikes and a blunt one finds none"""
+        sweep_config = {
+            "points": 5000, "seed": 4, "workers": 2,
+            "grid": {"rate_of_change": [10.0, 1000.0], "deviation_factor": [100.0], "window_size": [5]}
+        }
+        scores = run_sweep(self.config, sweep_config).set_index("rate_of_change")
+
+        self.assertGreater(scores.loc[10.0, "recall"], 0.9)
+        self.assertGreater(scores.loc[10.0, "precision"], 0.4)
+        self.assertEqual(scores.loc[1000.0, "alerts"], 0)
+        self.assertEqual(scores.loc[1000.0, "recall"], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
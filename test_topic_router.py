@@ -0,0 +1,136 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import scada_monitor
+from settings import compile_drift_conditions
+from topic_router import TopicRouter, SensorTopics, decode_reading, encode_reading, sensor_filter
+from utils import close_db_connection
+
+def message(topic, payload=b"{}"):
+    return SimpleNamespace(topic=topic, payload=payload)
+
+class TestTopicRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = TopicRouter()
+        self.calls = []
+
+    def handler(self, name):
+        def handle(client, userdata, message, **params):
+            self.calls.append((name, message.topic, params))
+        return handle
+
+    def routed(self, topic):
+        return sorted(name for name, routed_topic, _ in self.calls if routed_topic == topic)
+
+    def test_wildcards(self):
+        """Test MQTT '+' and '#' semantics, including the parent level and $SYS topics"""
+        self.router.add("scada/sensors", self.handler("combined"))
+        self.router.add("scada/+/temperature", self.handler("temperature"))
+        self.router.add("scada/#", self.handler("all"))
+        self.router.add("#", self.handler("everything"))
+
+        for topic in ["scada/sensors", "scada/site_1/temperature", "scada/site_1/pressure",
+                      "scada", "other/topic", "$SYS/broker/load"]:
+            self.router.on_message(None, None, message(topic))
+
+        self.assertEqual(self.routed("scada/sensors"), ["all", "combined", "everything"])
+        self.assertEqual(self.routed("scada/site_1/temperature"), ["all", "everything", "temperature"])
+        self.assertEqual(self.routed("scada/site_1/pressure"), ["all", "everything"])
+        self.assertEqual(self.routed("scada"), ["all", "everything"])
+        self.assertEqual(self.routed("other/topic"), ["everything"])
+        self.assertEqual(self.routed("$SYS/broker/load"), [])
+        self.assertEqual(self.router.unrouted, 1)
+
+    def test_named_levels(self):
+        """Test that named levels subscribe as '+' and are passed to the handler"""
+        mqtt_filter = self.router.add("scada/{site}/{sensor}", self.handler("sensor"))
+        self.assertEqual(mqtt_filter, "scada/+/+")
+        self.assertEqual(self.router.filters(), ["scada/+/+"])
+
+        self.router.on_message(None, None, message("scada/north/flow_rate"))
+        self.router.on_message(None, None, message("scada/north/flow_rate/extra"))
+        self.assertEqual(self.calls, [("sensor", "scada/north/flow_rate", {"site": "north", "sensor": "flow_rate"})])
+
+        with self.assertRaises(ValueError):
+            self.router.add("scada/#/flow_rate", self.handler("bad"))
+        with self.assertRaises(ValueError):
+            self.router.add("scada/site+/flow_rate", self.handler("bad"))
+
+    def test_dispatch_table_is_cached(self):
+        """Test that a topic is resolved once and new routes invalidate the cached table"""
+        self.router.add("scada/{site}/temperature", self.handler("temperature"))
+        first = self.router.match("scada/a/temperature")
+        self.assertIs(self.router.match("scada/a/temperature"), first)
+
+        self.router.add("scada/a/+", self.handler("site_a"))
+        self.assertEqual(len(self.router.match("scada/a/temperature")), 2)
+
+    def test_unrouted_payloads_are_not_decoded(self):
+        """Test that messages without a route never touch their payload"""
+        payload = MagicMock()
+        self.router.add("scada/{site}/temperature", self.handler("temperature"))
+        self.router.on_message(None, None, message("scada/a/pressure", payload))
+        payload.decode.assert_not_called()
+        self.assertEqual(self.calls, [])
+
+class TestPerSensorTopics(unittest.TestCase):
+
+    def setUp(self):
+        self.mqtt_config = {"topic": "scada/sensors", "topic_layout": "per_sensor",
+                            "sensor_topic": "scada/{site}/{sensor}", "site": "north"}
+        scada_monitor.sensor_history = {}
+        scada_monitor.sensor_detectors = {}
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+
+    def tearDown(self):
+        close_db_connection()
+        os.unlink(self.temp_db.name)
+
+    def test_publisher_topics(self):
+        """Test that the publisher's topics and payloads round-trip through the consumer helpers"""
+        topics = SensorTopics(self.mqtt_config)
+        self.assertEqual(topics["flow_rate"], "scada/north/flow_rate")
+        self.assertEqual(sensor_filter(self.mqtt_config, "flow_rate"), "scada/{site}/flow_rate")
+        self.assertEqual(decode_reading(encode_reading(4.5, 100.0)), (4.5, 100.0))
+        self.assertEqual(decode_reading(b"4.5"), (4.5, None))
+
+    def test_monitor_routes_each_sensor_to_its_own_state(self):
+        """Test that per-sensor messages reach that sensor's drift rule, keyed by site"""
+        router = scada_monitor.build_router(self.mqtt_config, ["temperature", "flow_rate"])
+        self.assertEqual(sorted(router.filters()), ["scada/+/flow_rate", "scada/+/temperature", "scada/sensors"])
+
+        settings = SimpleNamespace(drift_conditions=compile_drift_conditions(
+            {"flow_rate": {"rate_of_change": 3, "deviation_factor": 10, "window_size": 2}}))
+        alert_engine = MagicMock()
+        alert_engine.process.return_value = []
+        userdata = {"settings": settings, "alert_engine": alert_engine}
+
+        with patch("scada_monitor.store_sensor_reading") as store:
+            for topic, value in [("scada/north/flow_rate", 5.0), ("scada/south/flow_rate", 20.0),
+                                 ("scada/north/flow_rate", 10.0), ("scada/north/temperature", 80.0),
+                                 ("scada/north/unknown", 1.0)]:
+                router.on_message(None, userdata, message(topic, encode_reading(value, 100.0).encode()))
+
+        self.assertEqual(store.call_count, 4)
+        store.assert_any_call("south", "flow_rate", 20.0, "sensor_data.db", timestamp=100.0, quality=0)
+        self.assertEqual(sorted(scada_monitor.sensor_history), ["north/flow_rate", "south/flow_rate"])
+        alerts = [alert for call in alert_engine.process.call_args_list for alert in call.args[0]]
+        self.assertEqual([(alert.sensor, alert.rule) for alert in alerts], [("north/flow_rate", "rate_of_change")])
+
+    def test_long_format_storage(self):
+        """Test that per-sensor readings are stored partitioned by site and sensor"""
+        scada_monitor.store_sensor_reading("north", "flow_rate", 4.5, self.temp_db.name, timestamp=0)
+        scada_monitor.store_sensor_reading("south", "flow_rate", 5.5, self.temp_db.name, timestamp=0)
+        conn = sqlite3.connect(self.temp_db.name)
+        rows = conn.execute("SELECT site, sensor, value FROM sensor_readings ORDER BY site").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("north", "flow_rate", 4.5), ("south", "flow_rate", 5.5)])
+
+if __name__ == '__main__':
+    unittest.main()
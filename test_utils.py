@@ -5,7 +5,8 @@ import tempfile
 from unittest.mock import patch, MagicMock
 import sqlite3
 
-from utils import load_config, validate_config, db_execute_with_retry
+from utils import (load_config, validate_config, db_execute_with_retry, db_executemany_with_retry,
+                   db_query, get_db_connection, close_db_connection, backoff_delay)
 
 class TestUtils(unittest.TestCase):
     
@@ -45,6 +46,9 @@ class TestUtils(unittest.TestCase):
         self.temp_db.close()
     
     def tearDown(self):
+        # Close pooled connections before removing the files
+        close_db_connection()
+        
         # Clean up temporary files
         os.unlink(self.temp_config.name)
         os.unlink(self.temp_db.name)
@@ -170,5 +174,53 @@ class TestUtils(unittest.TestCase):
         # Check that execute was called once (on the second connection)
         mock_cursor.execute.assert_called_once()
 
+    def test_get_db_connection_is_cached_per_thread(self):
+        """Test that the pooled connection is reused and configured for WAL"""
+        conn = get_db_connection(self.temp_db.name)
+        self.assertIs(conn, get_db_connection(self.temp_db.name))
+        
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode.lower(), "wal")
+    
+    def test_db_executemany_and_query(self):
+        """Test batched inserts and reading them back"""
+        db_execute_with_retry(self.temp_db.name, "CREATE TABLE test (id INTEGER PRIMARY KEY, value TEXT)")
+        
+        result = db_executemany_with_retry(
+            self.temp_db.name,
+            "INSERT INTO test (value) VALUES (?)",
+            [("a",), ("b",), ("c",)]
+        )
+        self.assertTrue(result)
+        
+        columns, rows = db_query(self.temp_db.name, "SELECT id, value FROM test ORDER BY id")
+        self.assertEqual(columns, ["id", "value"])
+        self.assertEqual([row[1] for row in rows], ["a", "b", "c"])
+    
+    @patch('utils.time.sleep')
+    @patch('utils.get_db_connection')
+    def test_db_execute_backs_off_on_lock(self, mock_get_connection, mock_sleep):
+        """Test that lock contention uses jittered backoff instead of the fixed retry delay"""
+        mock_conn = MagicMock()
+        mock_get_connection.side_effect = [
+            sqlite3.OperationalError("database is locked"),
+            sqlite3.OperationalError("database is locked"),
+            mock_conn
+        ]
+        
+        result = db_execute_with_retry("test.db", "UPDATE test SET value = 1", max_retries=1, retry_delay=10)
+        
+        self.assertTrue(result)
+        self.assertEqual(mock_sleep.call_count, 2)
+        for call in mock_sleep.call_args_list:
+            self.assertLess(call.args[0], 10)
+    
+    def test_backoff_delay_is_bounded(self):
+        """Test that backoff delays never exceed the configured cap"""
+        for attempt in range(20):
+            delay = backoff_delay(attempt, base_delay=0.1, max_delay=2.0)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, 2.0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,187 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import os
+import sys
+import argparse
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Import utility functions
+from utils import load_config, validate_config
+from signal_model import StreamingGenerator
+from drift_analysis import detect_drift
+
+# Parameters searched for every sensor's drift rule
+PARAMETERS = ("rate_of_change", "deviation_factor", "window_size")
+
+DEFAULT_GRID = {
+    "rate_of_change": [1.0, 2.0, 5.0, 10.0],
+    "deviation_factor": [1.05, 1.1, 1.2, 1.5],
+    "window_size": [5, 10, 20, 50]
+}
+
+DEFAULT_RANGES = {
+    "rate_of_change": [0.5, 20.0],
+    "deviation_factor": [1.01, 2.0],
+    "window_size": [3, 100]
+}
+
+def build_dataset(config, num_points, directory, seed=0):
+    """Generate a labeled dataset and save it as .npy files that workers memory-map.
+
+    values.npy holds the readings (sensors x points); labels.npy marks readings
+    where the generator injected a spike or a corrupted value.
+    """
+    generator = StreamingGenerator(config["sensors"], config.get("sensor_dependencies"),
+                                   time_interval=config.get("sampling", {}).get("time_interval", 0.1), seed=seed)
+    _, values, (spikes, corrupted) = generator.next_block(num_points, return_labels=True)
+    np.save(os.path.join(directory, "values.npy"), values)
+    np.save(os.path.join(directory, "labels.npy"), spikes | corrupted)
+    return generator.names
+
+def grid_candidates(sensors, grid):
+    """Every combination of the grid values, for every sensor"""
+    combos = itertools.product(*(grid[param] for param in PARAMETERS))
+    return [(sensor, *combo) for combo in combos for sensor in sensors]
+
+def random_candidates(sensors, ranges, samples, seed=0):
+    """samples random parameter sets per sensor drawn from {param: [low, high]} ranges"""
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for sensor in sensors:
+        for _ in range(samples):
+            rate = rng.uniform(*ranges["rate_of_change"])
+            deviation = rng.uniform(*ranges["deviation_factor"])
+            window = int(rng.integers(ranges["window_size"][0], ranges["window_size"][1] + 1))
+            candidates.append((sensor, rate, deviation, window))
+    return candidates
+
+# Dataset memory-mapped once per worker process
+_dataset = {}
+
+def _open_dataset(directory, names):
+    _dataset["values"] = np.load(os.path.join(directory, "values.npy"), mmap_mode="r")
+    _dataset["labels"] = np.load(os.path.join(directory, "labels.npy"), mmap_mode="r")
+    _dataset["rows"] = {name: i for i, name in enumerate(names)}
+
+def evaluate_candidate(candidate):
+    """Score one (sensor, rate_of_change, deviation_factor, window_size) candidate"""
+    sensor, rate, deviation, window = candidate
+    row = _dataset["rows"][sensor]
+    values = np.asarray(_dataset["values"][row])
+    labels = np.asarray(_dataset["labels"][row])
+
+    drift, rate_alert, _, _ = detect_drift(values, {
+        "rate_of_change": rate, "deviation_factor": deviation, "window_size": window
+    })
+    predicted = drift | rate_alert
+    true_positives = int(np.count_nonzero(predicted & labels))
+    alerts = int(np.count_nonzero(drift) + np.count_nonzero(rate_alert))
+    flagged = int(np.count_nonzero(predicted))
+    anomalies = int(np.count_nonzero(labels))
+
+    return {
+        "sensor": sensor,
+        "rate_of_change": rate,
+        "deviation_factor": deviation,
+        "window_size": window,
+        "precision": true_positives / flagged if flagged else 0.0,
+        "recall": true_positives / anomalies if anomalies else 0.0,
+        "alerts": alerts,
+        "alerts_per_1000": 1000.0 * alerts / len(values)
+    }
+
+def run_sweep(config, sweep_config):
+    """Evaluate every candidate against a generated labeled dataset; returns a DataFrame of scores"""
+    num_points = sweep_config.get("points", 100000)
+    seed = sweep_config.get("seed", 0)
+    sensors = sweep_config.get("sensors") or [sensor["name"] for sensor in config["sensors"]]
+    workers = sweep_config.get("workers") or os.cpu_count()
+
+    if sweep_config.get("mode", "grid") == "random":
+        random_config = sweep_config.get("random", {})
+        ranges = random_config.get("ranges", DEFAULT_RANGES)
+        candidates = random_candidates(sensors, ranges, random_config.get("samples", 50), seed)
+    else:
+        candidates = grid_candidates(sensors, sweep_config.get("grid", DEFAULT_GRID))
+
+    with tempfile.TemporaryDirectory(prefix="sweep-") as directory:
+        names = build_dataset(config, num_points, directory, seed)
+        print(f"Evaluating {len(candidates)} candidate(s) on {num_points} labeled reading(s) with {workers} worker(s)")
+
+        if workers == 1:
+            _open_dataset(directory, names)
+            results = list(map(evaluate_candidate, candidates))
+        else:
+            # Workers memory-map the same files, so the dataset is never pickled or copied per task
+            with ProcessPoolExecutor(max_workers=workers, initializer=_open_dataset,
+                                     initargs=(directory, names)) as executor:
+                chunksize = max(1, len(candidates) // (workers * 4))
+                results = list(executor.map(evaluate_candidate, candidates, chunksize=chunksize))
+
+    scores = pd.DataFrame(results)
+    total = scores["precision"] + scores["recall"]
+    scores["f1"] = np.where(total > 0, 2 * scores["precision"] * scores["recall"] / total.where(total > 0, 1), 0.0)
+    return scores.sort_values(["sensor", "f1", "alerts"], ascending=[True, False, True]).reset_index(drop=True)
+
+def _parse_list(text, cast=float):
+    return [cast(item) for item in text.split(",")]
+
+def main(config_file="config.json", argv=None):
+    parser = argparse.ArgumentParser(description="Sweep drift_conditions parameters against labeled synthetic data")
+    parser.add_argument("--points", type=int, help="Labeled readings per sensor (overrides sweep.points)")
+    parser.add_argument("--rate", help="Comma-separated rate_of_change grid values")
+    parser.add_argument("--deviation", help="Comma-separated deviation_factor grid values")
+    parser.add_argument("--window", help="Comma-separated window_size grid values")
+    parser.add_argument("--random", type=int, metavar="N", help="Random search with N samples per sensor over sweep.random.ranges")
+    parser.add_argument("--workers", type=int, help="Worker processes (overrides sweep.workers)")
+    parser.add_argument("--top", type=int, default=5, help="Candidates to print per sensor")
+    parser.add_argument("--output", help="Write all scores to this CSV file")
+    args = parser.parse_args(argv)
+
+    try:
+        # Load configuration
+        config = load_config(config_file)
+
+        # Validate configuration
+        if not validate_config(config):
+            print("Configuration validation failed. Exiting.")
+            return 1
+
+        sweep_config = dict(config.get("sweep", {}))
+        if args.points is not None:
+            sweep_config["points"] = args.points
+        if args.workers is not None:
+            sweep_config["workers"] = args.workers
+        grid = dict(sweep_config.get("grid", DEFAULT_GRID))
+        for param, text, cast in (("rate_of_change", args.rate, float), ("deviation_factor", args.deviation, float),
+                                  ("window_size", args.window, int)):
+            if text:
+                grid[param] = _parse_list(text, cast)
+        sweep_config["grid"] = grid
+        if args.random:
+            sweep_config["mode"] = "random"
+            sweep_config["random"] = dict(sweep_config.get("random", {}), samples=args.random)
+        elif args.rate or args.deviation or args.window:
+            sweep_config["mode"] = "grid"
+
+        scores = run_sweep(config, sweep_config)
+        print(scores.groupby("sensor").head(args.top).to_string(index=False))
+
+        if args.output:
+            scores.to_csv(args.output, index=False)
+            print(f"Scores written to {args.output}")
+        return 0
+    except Exception as e:
+        print(f"Error in threshold sweep: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+import json
+
+DEFAULT_SENSOR_TOPIC = "scada/{site}/{sensor}"
+
+class _Node:
+    __slots__ = ("children", "single", "multi", "routes")
+
+    def __init__(self):
+        self.children = {}
+        self.single = None  # "+" child
+        self.multi = []     # routes ending in "#" at this level
+        self.routes = []    # routes ending exactly at this level
+
+class TopicRouter:
+    """MQTT topic filters compiled into a trie, with a per-topic dispatch cache.
+
+    Filters use MQTT wildcards ("+" for one level, "#" for the rest) or named
+    levels such as "scada/{site}/{sensor}", which subscribe as "+" and are
+    passed to the handler as keyword arguments. Handlers are called like paho
+    callbacks, handler(client, userdata, message, **params), so the router only
+    looks at the topic; payloads of topics without a route are never decoded.
+    The first message on a topic walks the trie, O(topic depth) for filters
+    without overlapping wildcards; the result is cached, so later messages on
+    the same topic cost one dict lookup.
+    """
+
+    def __init__(self, cache_size=10000):
+        self._root = _Node()
+        self._filters = []
+        self._cache = {}
+        self.cache_size = cache_size
+        self.unrouted = 0
+
+    def add(self, topic_filter, handler):
+        """Route messages whose topic matches topic_filter to handler"""
+        levels = topic_filter.split("/")
+        names = {}
+        node = self._root
+        for i, level in enumerate(levels):
+            if level.startswith("{") and level.endswith("}"):
+                names[i] = level[1:-1]
+                level = "+"
+            if level == "#":
+                if i != len(levels) - 1:
+                    raise ValueError(f"'#' must be the last level of a topic filter: {topic_filter}")
+                node.multi.append((handler, names))
+                break
+            if level == "+":
+                if node.single is None:
+                    node.single = _Node()
+                node = node.single
+            else:
+                if "+" in level or "#" in level:
+                    raise ValueError(f"Wildcards must occupy a whole level: {topic_filter}")
+                node = node.children.setdefault(level, _Node())
+        else:
+            node.routes.append((handler, names))
+
+        mqtt_filter = "/".join("+" if i in names else level for i, level in enumerate(levels))
+        if mqtt_filter not in self._filters:
+            self._filters.append(mqtt_filter)
+        self._cache.clear()
+        return mqtt_filter
+
+    def filters(self):
+        """MQTT subscription filters covering every route"""
+        return list(self._filters)
+
+    def _collect(self, node, levels, depth, found):
+        found.extend(node.multi)
+        if depth == len(levels):
+            found.extend(node.routes)
+            return
+        level = levels[depth]
+        child = node.children.get(level)
+        if child is not None:
+            self._collect(child, levels, depth + 1, found)
+        # Wildcards at the first level do not match $SYS-style topics
+        if node.single is not None and not (depth == 0 and level.startswith("$")):
+            self._collect(node.single, levels, depth + 1, found)
+
+    def match(self, topic):
+        """Return ((handler, params), ...) for every route matching topic"""
+        matched = self._cache.get(topic)
+        if matched is not None:
+            return matched
+
+        levels = topic.split("/")
+        found = []
+        multi_at_root = self._root.multi
+        if topic.startswith("$"):
+            # "#" at the root must not match $SYS-style topics either
+            self._root.multi = []
+        try:
+            self._collect(self._root, levels, 0, found)
+        finally:
+            self._root.multi = multi_at_root
+        matched = tuple((handler, {name: levels[i] for i, name in names.items()}) for handler, names in found)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[topic] = matched
+        return matched
+
+    def on_message(self, client, userdata, message):
+        """paho on_message callback: dispatch to the matching handlers"""
+        routes = self.match(message.topic)
+        if not routes:
+            self.unrouted += 1
+            return
+        for handler, params in routes:
+            handler(client, userdata, message, **params)
+
+def sensor_topic(mqtt_config, sensor, site=None):
+    """Topic for one sensor's readings under the per_sensor layout"""
+    pattern = mqtt_config.get("sensor_topic", DEFAULT_SENSOR_TOPIC)
+    return pattern.format(site=site or mqtt_config.get("site", "site_00000"), sensor=sensor)
+
+def sensor_filter(mqtt_config, sensor=None):
+    """Routing filter for a sensor's readings from every site (all sensors if sensor is None)"""
+    pattern = mqtt_config.get("sensor_topic", DEFAULT_SENSOR_TOPIC)
+    return pattern.replace("{sensor}", sensor) if sensor else pattern
+
+class SensorTopics(dict):
+    """{sensor: topic} for the publisher's per_sensor layout, formatted on first use"""
+
+    def __init__(self, mqtt_config, site=None):
+        super().__init__()
+        self.mqtt_config = mqtt_config
+        self.site = site
+
+    def __missing__(self, sensor):
+        topic = self[sensor] = sensor_topic(self.mqtt_config, sensor, self.site)
+        return topic
+
+def sensor_key(site, sensor):
+    """Series name for one site's sensor ("site/sensor"; just the sensor if the topic has no site level)"""
+    return sensor if site is None else f"{site}/{sensor}"
+
+def per_sensor_layout(mqtt_config):
+    return mqtt_config.get("topic_layout", "combined") == "per_sensor"
+
+def encode_reading(value, timestamp):
+    return json.dumps({"timestamp": timestamp, "value": value})
+
+def decode_reading(payload):
+    """(value, timestamp) from a per-sensor payload ({"timestamp": t, "value": v} or a bare number)"""
+    reading = json.loads(payload)
+    if isinstance(reading, dict):
+        return reading.get("value"), reading.get("timestamp")
+    return reading, None
@@ -7,8 +7,23 @@
 import json
 import os
 import time
+import random
 import sqlite3
-import paho.mqtt.client as mqtt
+import threading
+
+# Pragmas applied to every pooled SQLite connection. WAL lets the monitor write
+# while the dashboard reads, and busy_timeout makes SQLite wait on a lock
+# internally before we fall back to our own backoff.
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+# Per-thread connection cache: {db_name: sqlite3.Connection}
+_db_local = threading.local()
 
 def load_config(config_file):
     """Load configuration from file and override with environment variables"""
@@ -52,7 +67,51 @@ def validate_config(config):
         for i, sensor in enumerate(config['sensors']):
             if 'name' not in sensor:
                 errors.append(f"Sensor at index {i} is missing 'name'")
+            if sensor.get('deadband_mode', 'absolute') not in ('absolute', 'percent'):
+                errors.append(f"Sensor at index {i} has invalid 'deadband_mode' (use 'absolute' or 'percent')")
+            if sensor.get('valid_min', float('-inf')) > sensor.get('valid_max', float('inf')):
+                errors.append(f"Sensor at index {i} has 'valid_min' above 'valid_max'")
+            if not isinstance(sensor.get('stuck_limit', 0), int) or sensor.get('stuck_limit', 0) < 0:
+                errors.append(f"Sensor at index {i} has invalid 'stuck_limit' (use a whole number, 0 to disable)")
+            if 'sample_interval' in sensor and (not isinstance(sensor['sample_interval'], (int, float)) or sensor['sample_interval'] <= 0):
+                errors.append(f"Sensor at index {i} has invalid 'sample_interval' (use a positive number of seconds)")
+    
+    # Validate sensor dependencies (unknown transfer functions, cycles)
+    if 'sensor_dependencies' in config:
+        from dependency_graph import parse_dependencies, topological_levels
+        try:
+            topological_levels(parse_dependencies(config['sensor_dependencies']))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(f"Invalid sensor_dependencies: {str(e)}")
+    
+    # Validate drift detectors
+    for failure in config.get('failure_conditions', []):
+        for sensor, conditions in failure.get('drift_conditions', {}).items():
+            detector = conditions.get('detector') if isinstance(conditions, dict) else None
+            if detector:
+                from detectors import DETECTORS
+                if detector.get('type', 'rolling') not in ('rolling', *DETECTORS):
+                    errors.append(f"Unknown detector type for {sensor}: {detector.get('type')}")
     
+    # Validate clock mode
+    if config.get('clock', {}).get('mode', 'event') not in ('system', 'event'):
+        errors.append("Invalid clock 'mode' (use 'event' or 'system')")
+
+    # Validate the writer of the dashboard's shared memory channel
+    if config.get('dashboard', {}).get('shared_memory', {}).get('source', 'ingest') not in ('monitor', 'ingest'):
+        errors.append("Invalid dashboard shared_memory 'source' (use 'monitor' or 'ingest')")
+
+    # Validate compact generation settings
+    sampling = config.get('sampling', {})
+    if sampling.get('compact', False):
+        if sampling.get('dtype', 'float32') not in ('float64', 'float32', 'int16'):
+            errors.append("Invalid sampling 'dtype' (use 'float64', 'float32' or 'int16')")
+        for sensor, step in sampling.get('resolution', {}).items():
+            if not isinstance(step, (int, float)) or step <= 0:
+                errors.append(f"Sampling resolution for {sensor} must be a positive number")
+        if any('sample_interval' in sensor for sensor in config.get('sensors', [])):
+            errors.append("Compact sampling needs one shared time_interval; remove per-sensor 'sample_interval' or 'compact'")
+
     # Validate MQTT configuration
     if 'mqtt' not in config:
         errors.append("Missing 'mqtt' section in configuration")
@@ -64,6 +123,10 @@ def validate_config(config):
             errors.append("Missing 'port' in MQTT configuration")
         if 'topic' not in mqtt:
             errors.append("Missing 'topic' in MQTT configuration")
+        if mqtt.get('topic_layout', 'combined') not in ('combined', 'per_sensor'):
+            errors.append("Invalid 'topic_layout' in MQTT configuration (use 'combined' or 'per_sensor')")
+        elif mqtt.get('topic_layout') == 'per_sensor' and '{sensor}' not in mqtt.get('sensor_topic', '{site}/{sensor}'):
+            errors.append("MQTT 'sensor_topic' must contain a {sensor} level")
     
     # Validate email configuration
     if 'email' in config:
@@ -82,6 +145,8 @@ def validate_config(config):
 
 def connect_mqtt_with_retry(mqtt_config, max_retries=5, retry_delay=5):
     """Connect to MQTT broker with retry logic"""
+    # Imported here so components that only need config or database helpers do not load paho
+    import paho.mqtt.client as mqtt
     client = mqtt.Client()
     
     # Set up authentication if configured
@@ -106,26 +171,124 @@ def connect_mqtt_with_retry(mqtt_config, max_retries=5, retry_delay=5):
     
     raise ConnectionError(f"Failed to connect to MQTT broker after {max_retries} attempts")
 
-def db_execute_with_retry(db_name, query, params=(), max_retries=3, retry_delay=1):
-    """Execute a database query with retry logic"""
+def backoff_delay(attempt, base_delay=0.05, max_delay=5.0):
+    """Return a jittered exponential backoff delay for the given attempt (0-based)"""
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    # "Full jitter" spreads competing retries out instead of having them collide again
+    return random.uniform(0, delay)
+
+def is_lock_error(error):
+    """Check whether a SQLite error was caused by lock contention"""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+def get_db_connection(db_name):
+    """Return the calling thread's cached connection to db_name, opening it if needed"""
+    connections = getattr(_db_local, "connections", None)
+    if connections is None:
+        connections = _db_local.connections = {}
+
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = sqlite3.connect(db_name, timeout=DB_PRAGMAS["busy_timeout"] / 1000)
+        for pragma, value in DB_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        connections[db_name] = conn
+    return conn
+
+def close_db_connection(db_name=None):
+    """Close the calling thread's cached connection(s). Closes all of them if db_name is None"""
+    connections = getattr(_db_local, "connections", {})
+    names = list(connections) if db_name is None else [db_name]
+    for name in names:
+        conn = connections.pop(name, None)
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+def _run_with_retry(db_name, operation, max_retries, retry_delay):
+    """Run operation(conn) in a transaction, backing off on lock contention and retrying other errors"""
     retries = 0
+    lock_attempts = 0
     last_error = None
-    
+
     while retries < max_retries:
         try:
-            conn = sqlite3.connect(db_name)
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            conn.close()
-            return True
+            conn = get_db_connection(db_name)
+            with conn:
+                return True, operation(conn)
         except sqlite3.Error as e:
             last_error = e
+            if is_lock_error(e):
+                # Lock contention is expected with several writers: back off with jitter
+                # and do not count it against the retry budget until it persists
+                delay = backoff_delay(lock_attempts)
+                lock_attempts += 1
+                if lock_attempts < max_retries * 4:
+                    time.sleep(delay)
+                    continue
             retries += 1
             print(f"Database error: {str(e)}")
+            # Drop the cached connection in case it is the cause of the failure
+            close_db_connection(db_name)
             if retries < max_retries:
                 print(f"Retrying in {retry_delay} seconds... ({retries}/{max_retries})")
                 time.sleep(retry_delay)
-    
+
     print(f"Failed to execute query after {max_retries} attempts: {last_error}")
-    return False
+    return False, None
+
+def db_execute_with_retry(db_name, query, params=(), max_retries=3, retry_delay=1):
+    """Execute a database query with retry logic"""
+    def operation(conn):
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+
+    success, _ = _run_with_retry(db_name, operation, max_retries, retry_delay)
+    return success
+
+def db_executemany_with_retry(db_name, query, seq_of_params, max_retries=3, retry_delay=1):
+    """Execute one query for many parameter sets in a single transaction"""
+    seq_of_params = list(seq_of_params)
+    if not seq_of_params:
+        return True
+
+    def operation(conn):
+        cursor = conn.cursor()
+        cursor.executemany(query, seq_of_params)
+
+    success, _ = _run_with_retry(db_name, operation, max_retries, retry_delay)
+    return success
+
+def db_execute_batch(db_name, statements, max_retries=3, retry_delay=1):
+    """Execute a list of (query, params) pairs atomically in a single transaction"""
+    def operation(conn):
+        cursor = conn.cursor()
+        for query, params in statements:
+            cursor.execute(query, params)
+
+    success, _ = _run_with_retry(db_name, operation, max_retries, retry_delay)
+    return success
+
+def db_insert(db_name, query, params=(), max_retries=3, retry_delay=1):
+    """Execute an INSERT and return the new row's id, or None on failure"""
+    def operation(conn):
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.lastrowid
+
+    success, row_id = _run_with_retry(db_name, operation, max_retries, retry_delay)
+    return row_id if success else None
+
+def db_query(db_name, query, params=(), max_retries=3, retry_delay=1):
+    """Run a read query and return (column_names, rows), or None on failure"""
+    def operation(conn):
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        columns = [description[0] for description in cursor.description or []]
+        return columns, cursor.fetchall()
+
+    success, result = _run_with_retry(db_name, operation, max_retries, retry_delay)
+    return result if success else None
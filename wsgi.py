@@ -0,0 +1,24 @@
+# Copyright (C) 2024 Carbon Capture LLC
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# WSGI entry point for serving the dashboard with several worker processes:
+#     gunicorn -c gunicorn.conf.py wsgi:server
+# Workers do not subscribe to MQTT themselves; they read the shared memory
+# channel written by the monitor, or by dashboard_ingest.py (started by
+# gunicorn.conf.py) with dashboard.shared_memory.source set to "ingest".
+
+import os
+
+# Import utility functions
+from utils import load_config
+from settings import channel_settings
+import scada_dashboard
+
+config = load_config(os.getenv("CONFIG_PATH", "config.json")) or {}
+scada_dashboard.use_shared_channel(channel_settings(config)["name"])
+
+app = scada_dashboard.app
+server = app.server